@@ -0,0 +1,72 @@
+# FILE: benchmarks/harness.py
+# Boots mcp_client/api.py against the real server.py tools, fully in-process and offline.
+
+import logging
+import os
+import sys
+from contextlib import asynccontextmanager
+
+import anyio
+import httpx
+from mcp.shared.memory import create_client_server_memory_streams
+
+# server.py lives at the repository root, next to this package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402  (registers the MCP tools on server.mcp)
+from mcp_client import api  # noqa: E402
+from mcp_client.agent import WallabyAgent  # noqa: E402
+from mcp_client.client import MCPConnector, WalmartMCPClient  # noqa: E402
+
+from .stub_llm import ScriptedChatModel  # noqa: E402
+
+
+@asynccontextmanager
+async def in_process_transport():
+    """Yield (read_stream, write_stream) connected to server.mcp running in this process."""
+    low_level_server = server.mcp._mcp_server
+    async with create_client_server_memory_streams() as (client_streams, server_streams):
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(
+                lambda: low_level_server.run(
+                    server_streams[0], server_streams[1], low_level_server.create_initialization_options()
+                )
+            )
+            try:
+                yield client_streams
+            finally:
+                task_group.cancel_scope.cancel()
+
+
+class InProcessMCPClient(WalmartMCPClient):
+    """WalmartMCPClient that talks to the in-process server instead of SSE."""
+
+    def __init__(self):
+        super().__init__(server_url="in-process")
+
+    def _open_transport(self):
+        return in_process_transport()
+
+
+@asynccontextmanager
+async def booted_api(generation_delay: float = 0.0, quiet: bool = True):
+    """Start the API with the in-process MCP server and a scripted LLM; yield (http_client, stub_llm)."""
+    if quiet:
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger("mcp_client.client").setLevel(logging.WARNING)
+
+    MCPConnector.client_factory = InProcessMCPClient
+    connector = await MCPConnector.get_instance()
+    stub_llm = ScriptedChatModel(generation_delay=generation_delay)
+    agent = WallabyAgent(connector, llm=stub_llm)
+    if quiet:
+        agent.agent_executor.verbose = False
+    api.wallaby_agent = agent
+
+    transport = httpx.ASGITransport(app=api.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://wallaby.bench", timeout=120.0) as http_client:
+            yield http_client, stub_llm
+    finally:
+        api.wallaby_agent = None
+        await connector.cleanup()
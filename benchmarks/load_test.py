@@ -0,0 +1,140 @@
+# FILE: benchmarks/load_test.py
+# End-to-end /chat load test: concurrent shoppers against the in-process API, MCP server and stub LLM.
+#
+# Usage:
+#   python -m benchmarks.load_test --concurrency 16 --requests 400 --llm-delay 0.05
+#   python -m benchmarks.load_test --mix lookup=1 --json results.json
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import statistics
+import time
+from typing import Dict, Any, List
+
+from mcp_client.data import STORE_DATABASE
+
+from .harness import booted_api
+
+WORKLOADS = ("lookup", "list", "browse")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def make_message(workload: str, rng: random.Random, list_size: int) -> str:
+    item_names = list(STORE_DATABASE['products'].keys())
+    if workload == "lookup":
+        return f"Where is the {rng.choice(item_names)}?"
+    if workload == "list":
+        return "Here is my shopping list: " + ", ".join(rng.choice(item_names) for _ in range(list_size))
+    if workload == "browse":
+        return f"What can I get for under ${rng.choice([2, 3, 5, 10])}?"
+    raise ValueError(f"Unknown workload '{workload}'")
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in WORKLOADS:
+            raise argparse.ArgumentTypeError(f"workload must be one of {WORKLOADS}, got '{name}'")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def run_load(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    weights = parse_mix(args.mix)
+    plan = rng.choices(list(weights), weights=list(weights.values()), k=args.requests)
+    messages = [(workload, make_message(workload, rng, args.list_size)) for workload in plan]
+
+    latencies: Dict[str, List[float]] = {workload: [] for workload in weights}
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with booted_api(generation_delay=args.llm_delay) as (http_client, stub_llm):
+        # Warm up imports, the catalog matcher and the MCP session before timing.
+        await http_client.post("/chat", json={"message": "Where is the milk?"})
+
+        async def shopper(workload: str, message: str):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await http_client.post("/chat", json={"message": message})
+                elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                errors += 1
+            else:
+                latencies[workload].append(elapsed)
+
+        stdout = io.StringIO() if not args.verbose else None
+        with contextlib.redirect_stdout(stdout) if stdout else contextlib.nullcontext():
+            started = time.perf_counter()
+            await asyncio.gather(*(shopper(workload, message) for workload, message in messages))
+            wall_time = time.perf_counter() - started
+        llm_calls = stub_llm.calls
+
+    def summarize(values: List[float]) -> Dict[str, Any]:
+        values = sorted(values)
+        return {
+            "requests": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "mean_ms": round(statistics.fmean(values) * 1000, 2) if values else 0.0,
+        }
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "config": {
+            "concurrency": args.concurrency, "requests": args.requests, "mix": weights,
+            "llm_delay_s": args.llm_delay, "list_size": args.list_size, "seed": args.seed,
+        },
+        "overall": {**summarize(all_latencies), "errors": errors, "wall_time_s": round(wall_time, 3),
+                    "requests_per_s": round(len(all_latencies) / wall_time, 2) if wall_time else 0.0,
+                    "llm_calls": llm_calls},
+        "by_workload": {workload: summarize(values) for workload, values in latencies.items()},
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    config, overall = report["config"], report["overall"]
+    print(f"\n/chat load test: {config['requests']} requests, concurrency {config['concurrency']}, "
+          f"LLM delay {config['llm_delay_s']}s")
+    print(f"{'workload':<10}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for workload, stats in report["by_workload"].items():
+        print(f"{workload:<10}{stats['requests']:>7}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    print(f"{'all':<10}{overall['requests']:>7}{overall['p50_ms']:>10}{overall['p95_ms']:>10}{overall['p99_ms']:>10}")
+    print(f"throughput: {overall['requests_per_s']} req/s over {overall['wall_time_s']}s, "
+          f"{overall['errors']} errors, {overall['llm_calls']} LLM calls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline /chat load test with a stub LLM and in-process MCP server.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--mix", default="lookup=3,list=1,browse=1", help="workload weights, e.g. lookup=3,list=1,browse=1")
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="simulated generation time per LLM call (s)")
+    parser.add_argument("--list-size", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep agent/API console output")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
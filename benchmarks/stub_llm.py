@@ -0,0 +1,78 @@
+# FILE: benchmarks/stub_llm.py
+# Deterministic stand-in for ChatOllama that replays scripted ReAct turns.
+
+import asyncio
+import re
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+def scripted_react_turn(question: str, scratchpad: str) -> str:
+    """Pick the next ReAct step the way the real model usually does for our workloads.
+
+    First turn: one tool call chosen from the question. Any later turn: a final answer
+    built from the last observation.
+    """
+    if "Observation:" in scratchpad:
+        observation = scratchpad.rsplit("Observation:", 1)[1].strip()
+        return f"Thought: I now have all the information needed to answer the user's question.\nFinal Answer: Here is what I found: {observation[:200]}"
+
+    lowered = question.lower()
+    list_match = re.search(r"shopping list:\s*(.+)", question, re.IGNORECASE)
+    price_match = re.search(r"under \$(\d+(?:\.\d+)?)", lowered)
+    where_match = re.search(r"where (?:is|are) (?:the )?(.+?)\??$", lowered)
+    aisle_match = re.search(r"aisle (\d+)", lowered)
+
+    if list_match:
+        action, action_input = "process_shopping_list", list_match.group(1).strip()
+    elif price_match:
+        action, action_input = "browse_products", f"max_price: {price_match.group(1)}"
+    elif aisle_match:
+        action, action_input = "get_aisle_info", aisle_match.group(1)
+    elif where_match:
+        action, action_input = "find_item", where_match.group(1).strip()
+    else:
+        action, action_input = "no_op", "None"
+    return f"Thought: I should use {action}.\nAction: {action}\nAction Input: {action_input}"
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that answers with scripted_react_turn after `generation_delay` seconds."""
+
+    generation_delay: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-react-stub"
+
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        # Everything after the last "Question:" is the user input plus the agent scratchpad.
+        tail = prompt.rsplit("Question:", 1)[-1]
+        question, _, scratchpad = tail.partition("\nThought:")
+        text = scripted_react_turn(question.strip(), scratchpad)
+        self.calls += 1
+        message = AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": len(text) // 4,
+                "total_tokens": (len(prompt) + len(text)) // 4,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.generation_delay:
+            time.sleep(self.generation_delay)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.generation_delay:
+            await asyncio.sleep(self.generation_delay)
+        return self._reply(messages)
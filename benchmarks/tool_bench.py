@@ -0,0 +1,183 @@
+# FILE: benchmarks/tool_bench.py
+# Microbenchmarks for the server.py tool functions across synthetic catalog sizes.
+#
+# Usage:
+#   python -m benchmarks.tool_bench --sizes 1000,10000,100000 --json bench.json
+#   python -m benchmarks.tool_bench --baseline bench.json --threshold 1.25   # exit 1 on regression
+#   python -m benchmarks.tool_bench --mapped    # tools read a memory-mapped compiled snapshot
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Any, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+from store.catalog import Catalog, swap_catalog  # noqa: E402
+from store.snapshot import publish_snapshot  # noqa: E402
+from store.synthetic import generate_store  # noqa: E402
+
+
+def _fn(tool) -> Callable:
+    """Registered tools are wrapped by FastMCP; benchmark the underlying function."""
+    return getattr(tool, "fn", tool)
+
+
+def load_store(store: Dict[str, Any], mapped: bool = False):
+    """Swap the server's catalog for a generated one (optionally compiled and memory-mapped)."""
+    catalog = Catalog.from_store(store)
+    if mapped:
+        path = os.path.join(tempfile.gettempdir(), f"tool_bench-{os.getpid()}.wcat")
+        catalog = publish_snapshot(catalog, path)
+        os.remove(path)  # the mapping stays valid
+    swap_catalog(catalog)
+    if server.SUBSTITUTE_PRECOMPUTE is not None:
+        server.SUBSTITUTE_PRECOMPUTE.join()  # keep the background fill out of the timings
+    server.SHOPPING_LISTS = server.ShoppingListStore(store['meal_suggestions'], server._live_product)
+
+
+def build_cases(store: Dict[str, Any]) -> List[Tuple[str, Callable[[], Any]]]:
+    keys = list(store['products'])
+    hit_key = keys[len(keys) // 2]
+    list_items = [keys[(i * 7919) % len(keys)] for i in range(30)]
+    meal_items = ["pasta", "ground beef", "pasta sauce", "bread", "eggs"]
+    orders = [{"order_id": f"o{n}", "items": [keys[(n * 31 + i * 7919) % len(keys)] for i in range(3 + n % 10)]}
+              for n in range(300)]
+
+    return [
+        ("fuzzy_search_product[exact]", lambda: server.fuzzy_search_product(hit_key)),
+        ("fuzzy_search_product[miss]", lambda: server.fuzzy_search_product("zzz qqq")),
+        ("find_item", lambda: _fn(server.find_item)(hit_key)),
+        ("get_item_stock", lambda: _fn(server.get_item_stock)(hit_key)),
+        ("process_shopping_list[30]", lambda: _fn(server.process_shopping_list)(list_items)),
+        ("get_aisle_info", lambda: _fn(server.get_aisle_info)(3)),
+        ("browse_products[category]", lambda: _fn(server.browse_products)(category="Bakery")),
+        ("browse_products[max_price]", lambda: _fn(server.browse_products)(max_price=2.0)),
+        ("get_meal_suggestions[5]", lambda: _fn(server.get_meal_suggestions)(meal_items)),
+        ("get_shopping_suggestions[30]", lambda: server.get_shopping_suggestions(list_items)),
+        ("plan_pick_waves[300]", lambda: _fn(server.plan_pick_waves)(orders)),
+    ]
+
+
+def time_case(func: Callable[[], Any], min_time: float, max_reps: int) -> Dict[str, Any]:
+    """Run until min_time has elapsed (at least 3 reps unless one call exceeds min_time)."""
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_reps:
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time and (len(samples) >= 3 or elapsed >= 3 * min_time):
+            break
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "reps": len(samples),
+        "median_us": round(statistics.median(samples) * 1e6, 2),
+        "min_us": round(min(samples) * 1e6, 2),
+        "peak_alloc_kb": round(peak / 1024, 1),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for size in args.sizes:
+        gc.collect()
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        store = generate_store(size, num_rules=args.rules, seed=args.seed)
+        load_store(store, mapped=args.mapped)
+        build_s = time.perf_counter() - t0
+        catalog_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        cases = {}
+        for name, func in build_cases(store):
+            cases[name] = time_case(func, args.min_time, args.max_reps)
+            print(f"  {size:>9} SKUs  {name:<32} {cases[name]['median_us']:>14.1f} us  ({cases[name]['reps']} reps)")
+        results[str(size)] = {
+            "generate_s": round(build_s, 3),
+            "catalog_mb": round(catalog_bytes / 2**20, 1),
+            "cases": cases,
+        }
+        print(f"  {size:>9} SKUs  catalog {results[str(size)]['catalog_mb']} MB, generated in {build_s:.2f}s")
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_delta_us: float) -> List[str]:
+    """Return a line per (size, case) that got slower than threshold x baseline."""
+    regressions = []
+    for size, data in current["results"].items():
+        base_cases = baseline.get("results", {}).get(size, {}).get("cases", {})
+        for case, stats in data["cases"].items():
+            base = base_cases.get(case)
+            if not base:
+                continue
+            ratio = stats["median_us"] / base["median_us"] if base["median_us"] else 1.0
+            if ratio > threshold and stats["median_us"] - base["median_us"] > min_delta_us:
+                regressions.append(f"{size} SKUs {case}: {base['median_us']:.1f} -> {stats['median_us']:.1f} us ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time server tool functions across synthetic catalog sizes.")
+    parser.add_argument("--sizes", default="1000,10000,100000", type=lambda s: [int(x) for x in s.split(",")],
+                        help="comma-separated catalog sizes, up to 1000000")
+    parser.add_argument("--rules", type=int, default=2000, help="number of synthetic meal rules")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds spent timing each case")
+    parser.add_argument("--max-reps", type=int, default=10000)
+    parser.add_argument("--mapped", action="store_true", help="serve tools from a memory-mapped compiled snapshot")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier commit to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="fail when median time exceeds baseline by this factor")
+    parser.add_argument("--min-delta-us", type=float, default=5.0, help="ignore slowdowns smaller than this (noise floor)")
+    args = parser.parse_args()
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {"sizes": args.sizes, "rules": args.rules, "seed": args.seed, "mapped": args.mapped},
+        "results": run(args),
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_us)
+        print(f"\nCompared with {baseline.get('revision', 'baseline')} (threshold {args.threshold}x):")
+        for line in regressions:
+            print(f"  REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("  no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,7 @@ const backToHomeButton = document.getElementById("back-to-home-button")
 let isWaitingForResponse = false
 let currentView = "welcome" // 'welcome', 'chat', 'map'
 const messageHistory = []
+let sessionId = null // Conversation session from the backend, lets follow-ups reuse earlier results
 
 // Store Layout Configuration
 const aisleLayout = {
@@ -489,7 +490,7 @@ async function sendMessage() {
         "Content-Type": "application/json",
         Accept: "application/json",
       },
-      body: JSON.stringify({ message: message }),
+      body: JSON.stringify({ message: message, session_id: sessionId }),
     })
 
     removeTypingIndicator()
@@ -501,6 +502,7 @@ async function sendMessage() {
 
     const data = await response.json()
     console.log("📥 Received response:", data)
+    if (data.session_id) sessionId = data.session_id
 
     let responseContent = data.message || "I had trouble generating a response."
 
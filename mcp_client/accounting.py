@@ -0,0 +1,119 @@
+# FILE: mcp_client/accounting.py
+# Per-request prompt/token accounting for the ReAct agent.
+
+import time
+from typing import Dict, Any, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+def _estimate_tokens(chars: int) -> int:
+    """Rough token estimate used when the model does not report usage (~4 chars/token)."""
+    return max(1, chars // 4) if chars else 0
+
+
+class RequestAccounting:
+    """Collects LLM usage, agent steps and scratchpad growth for one request."""
+
+    def __init__(self, prompt_template_chars: int = 0):
+        self.prompt_template_chars = prompt_template_chars
+        self.started_at = time.monotonic()
+        self.llm_calls: List[Dict[str, Any]] = []
+        self.steps: List[Dict[str, Any]] = []
+        self.scratchpad_chars = 0
+        self.prefetcher = None  # set when speculative prefetch ran for this request
+
+    @property
+    def iterations(self) -> int:
+        return len(self.llm_calls)
+
+    def report(self) -> Dict[str, Any]:
+        prompt_tokens = sum(call["prompt_tokens"] for call in self.llm_calls)
+        completion_tokens = sum(call["completion_tokens"] for call in self.llm_calls)
+        return {
+            "iterations": self.iterations,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "prompt_template_chars": self.prompt_template_chars,
+            "scratchpad_chars": self.scratchpad_chars,
+            "llm_calls": self.llm_calls,
+            "steps": self.steps,
+            "prefetch": self.prefetcher.report() if self.prefetcher else None,
+            "elapsed_s": round(time.monotonic() - self.started_at, 3),
+        }
+
+
+class AccountingCallbackHandler(BaseCallbackHandler):
+    """LangChain callback that feeds a RequestAccounting.
+
+    Token counts come from the model's usage metadata (Ollama reports
+    prompt_eval_count/eval_count); when missing they are estimated from text length.
+    """
+
+    def __init__(self, accounting: RequestAccounting):
+        self.accounting = accounting
+        self._llm_started: Dict[UUID, tuple] = {}
+        self._tool_started: Dict[UUID, tuple] = {}
+
+    # --- LLM calls ---
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        prompt_chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._llm_started[run_id] = (time.monotonic(), prompt_chars)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._llm_started[run_id] = (time.monotonic(), sum(len(p) for p in prompts))
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        started, prompt_chars = self._llm_started.pop(run_id, (time.monotonic(), 0))
+        text = ""
+        prompt_tokens: Optional[int] = None
+        completion_tokens: Optional[int] = None
+
+        if response.generations and response.generations[0]:
+            generation = response.generations[0][0]
+            text = generation.text or ""
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None) if message is not None else None
+            if usage:
+                prompt_tokens = usage.get("input_tokens")
+                completion_tokens = usage.get("output_tokens")
+            info = generation.generation_info or {}
+            if prompt_tokens is None:
+                prompt_tokens = info.get("prompt_eval_count")
+            if completion_tokens is None:
+                completion_tokens = info.get("eval_count")
+
+        self.accounting.llm_calls.append({
+            "prompt_chars": prompt_chars,
+            "prompt_tokens": prompt_tokens if prompt_tokens is not None else _estimate_tokens(prompt_chars),
+            "completion_tokens": completion_tokens if completion_tokens is not None else _estimate_tokens(len(text)),
+            "estimated": prompt_tokens is None or completion_tokens is None,
+            "duration_s": round(time.monotonic() - started, 3),
+        })
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._llm_started.pop(run_id, None)
+
+    # --- Agent steps ---
+    def on_agent_action(self, action, *, run_id: UUID, **kwargs):
+        # The action log (Thought/Action/Action Input) is appended to the scratchpad verbatim.
+        self.accounting.scratchpad_chars += len(action.log)
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs):
+        name = (serialized or {}).get("name", "unknown")
+        self._tool_started[run_id] = (time.monotonic(), name)
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs):
+        started, name = self._tool_started.pop(run_id, (time.monotonic(), "unknown"))
+        observation_chars = len(str(output))
+        self.accounting.scratchpad_chars += observation_chars
+        self.accounting.steps.append({
+            "tool": name,
+            "duration_s": round(time.monotonic() - started, 3),
+            "observation_chars": observation_chars,
+            "scratchpad_chars": self.accounting.scratchpad_chars,
+        })
+
+    def on_tool_error(self, error, *, run_id: UUID, **kwargs):
+        self._tool_started.pop(run_id, None)
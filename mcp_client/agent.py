@@ -1,25 +1,236 @@
 # FILE: mcp_client/agent.py
 # FIXED: Switched back to ReAct agent since ChatOllama doesn't support tool calling
 
-from langchain_ollama import ChatOllama
-from langchain_core.tools import Tool
+from langchain_core.tools import Tool, render_text_description
 from langchain.agents import AgentExecutor, create_react_agent
 from langchain_core.prompts import PromptTemplate
+from langchain_core.callbacks import BaseCallbackHandler
 import json
 import asyncio
 import re
+import time
 from typing import Dict, Any, List, Optional
+from uuid import UUID
 
-from mcp_client.config import OLLAMA_MODEL, OLLAMA_BASE_URL
+from mcp_client.config import (
+    OLLAMA_MODEL, OLLAMA_BASE_URL, CHAT_DEADLINE_SECONDS, LLM_KEEP_ALIVE,
+    COMPACT_OBSERVATIONS, OBSERVATION_PRODUCT_FIELDS, OBSERVATION_MAX_LIST_ITEMS, OBSERVATION_FULL_LISTS,
+    MAX_FANOUT_ACTIONS, MAX_PARALLEL_TOOLS,
+    SPECULATIVE_PREFETCH, PREFETCH_MAX_ITEMS, PREFETCH_TIMEOUT, PREFETCH_MATCHER_MAX_AGE,
+    SESSION_MAX_SESSIONS, SESSION_TTL_SECONDS, SESSION_MAX_PRODUCTS,
+)
+from mcp_client.cache import PRODUCT_NAMES_URI
 from mcp_client.client import MCPConnector
+from mcp_client.deadline import Deadline, current_deadline
+from mcp_client.accounting import RequestAccounting, AccountingCallbackHandler
+from mcp_client.prefetch import CatalogMatcher, Prefetcher, current_prefetch
+from mcp_client.sessions import SessionStore, SessionState, current_session
+from mcp_client.metrics import LLM_CALL_SECONDS, TIMEOUTS, CACHE_LOOKUPS
+
+
+def compact_observation(value: Any, full: bool = False) -> Any:
+    """Trim a tool result down to what the model needs to answer.
+
+    Product dicts keep only OBSERVATION_PRODUCT_FIELDS and long lists are cut to
+    OBSERVATION_MAX_LIST_ITEMS (with a note of how many were left out), except the
+    OBSERVATION_FULL_LISTS: every item of a shopping-list route stays visible.
+    """
+    if isinstance(value, dict):
+        if "name" in value and "aisle" in value:
+            return {key: value[key] for key in OBSERVATION_PRODUCT_FIELDS if key in value}
+        return {key: compact_observation(item, key in OBSERVATION_FULL_LISTS) for key, item in value.items()}
+    if isinstance(value, list):
+        if full:
+            return [compact_observation(item) for item in value]
+        trimmed = [compact_observation(item) for item in value[:OBSERVATION_MAX_LIST_ITEMS]]
+        if len(value) > OBSERVATION_MAX_LIST_ITEMS:
+            trimmed.append(f"... and {len(value) - OBSERVATION_MAX_LIST_ITEMS} more")
+        return trimmed
+    return value
+
+
+def parse_aisle_number(aisle_input: Any) -> Optional[int]:
+    """Extract the aisle number from inputs like "3 (Dairy & Refrigerated)"."""
+    match = re.match(r'\d+', str(aisle_input).strip())
+    return int(match.group(0)) if match else None
+
+
+def parse_browse_query(query: str) -> Dict[str, Any]:
+    """Parse a browse query string, e.g. "category: Bakery, max_price: 5.0"."""
+    kwargs = {}
+    parts = [p.strip() for p in query.split(',')]
+    for part in parts:
+        try:
+            key, value = part.split(':', 1)
+            key = key.strip()
+            value = value.strip()
+            if key == 'max_price':
+                kwargs['max_price'] = float(value)
+            elif key == 'category':
+                kwargs['category'] = str(value)
+        except ValueError:
+            continue # Ignore malformed parts
+    return kwargs
+
+
+def parse_budget_basket(basket_input: str) -> Dict[str, Any]:
+    """Parse plan_budget_basket input into tool arguments.
+
+    Accepts a JSON object (the documented format) or
+    "budget: 30; required: pasta, ground beef; optional: bread; quantities: pasta=2".
+    """
+    text = basket_input.strip().strip('`')
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        parsed = {}
+        for part in text.split(';'):
+            if ':' not in part:
+                continue
+            key, value = part.split(':', 1)
+            key, value = key.strip().lower(), value.strip()
+            if key in ("required", "optional"):
+                parsed[key] = [item.strip() for item in value.split(',') if item.strip()]
+            elif key == "quantities":
+                parsed[key] = dict(pair.split('=', 1) for pair in value.split(',') if '=' in pair)
+            else:
+                parsed[key] = value
+    if not isinstance(parsed, dict):
+        return {}
+    kwargs: Dict[str, Any] = {}
+    try:
+        kwargs["budget"] = float(str(parsed.get("budget", "")).strip().lstrip('$'))
+    except ValueError:
+        return {}
+    for key in ("required", "optional"):
+        items = parsed.get(key) or []
+        kwargs[key] = [str(item).strip() for item in (items.split(',') if isinstance(items, str) else items) if str(item).strip()]
+    quantities = {}
+    for name, count in (parsed.get("quantities") or {}).items():
+        try:
+            quantities[str(name).strip()] = int(str(count).strip())
+        except ValueError:
+            continue
+    kwargs["quantities"] = quantities
+    return kwargs
+
+
+def parse_list_edit(edit_input: str) -> Dict[str, Any]:
+    """Parse edit_shopping_list input into {"add", "remove", "replace"}.
+
+    Accepts a JSON object (the documented format) or
+    "add: eggs, milk; remove: bread; replace: chips=pretzels". Empty if there is nothing to change.
+    """
+    text = edit_input.strip().strip('`')
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        parsed = {}
+        for part in text.split(';'):
+            if ':' not in part:
+                continue
+            key, value = part.split(':', 1)
+            key, value = key.strip().lower(), value.strip()
+            if key == "replace":
+                parsed[key] = dict(pair.split('=', 1) for pair in value.split(',') if '=' in pair)
+            else:
+                parsed[key] = value
+    if not isinstance(parsed, dict):
+        return {}
+    edit: Dict[str, Any] = {}
+    for key in ("add", "remove"):
+        items = parsed.get(key) or []
+        edit[key] = [str(item).strip() for item in (items.split(',') if isinstance(items, str) else items) if str(item).strip()]
+    replace = parsed.get("replace") or {}
+    edit["replace"] = {str(old).strip(): str(new).strip() for old, new in replace.items()} if isinstance(replace, dict) else {}
+    return edit if any(edit.values()) else {}
+
+
+def edited_items(items: List[str], edit: Dict[str, Any]) -> List[str]:
+    """The item names of a list after an edit, matched the way list handles match them."""
+    replace = edit.get("replace") or {}
+    removed = {name.lower().strip() for name in [*edit.get("remove", []), *replace]}
+    kept = [name for name in items if name.lower().strip() not in removed]
+    return kept + list(replace.values()) + list(edit.get("add", []))
+
+
+def parse_multi_action(actions_input: str) -> List[Dict[str, str]]:
+    """Parse the multi_action input into a list of {"tool", "input"} dicts.
+
+    Accepts a JSON list (the documented format) or one "tool: input" per line/semicolon,
+    which is what smaller models tend to produce instead.
+    """
+    text = actions_input.strip().strip('`')
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            parsed = [parsed]
+        if isinstance(parsed, list):
+            return [
+                {"tool": str(action.get("tool", "")).strip(), "input": str(action.get("input", "")).strip()}
+                for action in parsed if isinstance(action, dict)
+            ]
+    except json.JSONDecodeError:
+        pass
+
+    actions = []
+    for line in re.split(r'[\n;]', text):
+        if ':' not in line:
+            continue
+        tool, tool_input = line.split(':', 1)
+        actions.append({"tool": tool.strip(), "input": tool_input.strip().strip('"')})
+    return actions
+
+
+class DeadlineCallbackHandler(BaseCallbackHandler):
+    """Charges the wall-clock time of every LLM call to the request deadline."""
+
+    def __init__(self, deadline: Deadline):
+        self.deadline = deadline
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._started[run_id] = time.monotonic()
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._started[run_id] = time.monotonic()
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+
+    def _finish(self, run_id: UUID):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            elapsed = time.monotonic() - started
+            self.deadline.record("llm", elapsed)
+            LLM_CALL_SECONDS.observe(elapsed)
 
 class WallabyAgent:
-    def __init__(self, mcp_connector: MCPConnector):
+    def __init__(self, mcp_connector: MCPConnector, llm=None):
         self.mcp_connector = mcp_connector
-        self.llm = ChatOllama(model=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL, temperature=0)
+        self.owns_llm = llm is None
+        if llm is None:
+            # Imported here: langchain_ollama is the slowest import of the API and is not
+            # needed when a model is passed in.
+            from langchain_ollama import ChatOllama
+            llm = ChatOllama(model=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL, temperature=0, keep_alive=LLM_KEEP_ALIVE)
+        self.llm = llm
         self.agent_executor = None
+        self.warmup_prompt = ""
         self.last_processed_items: List[Dict[str, Any]] = []
+        self.prompt_template_chars = 0
+        self._matcher: Optional[CatalogMatcher] = None
+        self._matcher_built_at = 0.0
+        self._matcher_stale = False
+        self._matcher_task: Optional[asyncio.Task] = None
+        self.prefetch_totals = {"issued": 0, "hits": 0, "wasted": 0}
+        self.sessions = SessionStore(SESSION_MAX_SESSIONS, SESSION_TTL_SECONDS, SESSION_MAX_PRODUCTS)
         self._setup_agent()
+        mcp_connector.add_change_listener(self._on_catalog_change)
+        mcp_connector.add_change_listener(self.sessions.versions.on_change)
 
     def _setup_agent(self):
         """Set up the agent with MCP tools using the ReAct method."""
@@ -37,6 +248,16 @@ class WallabyAgent:
                     func=self._sync_process_shopping_list,
                     coroutine=self._async_process_shopping_list
                 ),
+                Tool(
+                    name="edit_shopping_list",
+                    description=(
+                        "Change the last shopping list in this conversation by sending only the changes. "
+                        'Input must be a JSON object, e.g. {"add": ["eggs"], "remove": ["bread"], "replace": {"chips": "pretzels"}}. '
+                        "Returns the changes and the updated totals."
+                    ),
+                    func=self._sync_edit_shopping_list,
+                    coroutine=self._async_edit_shopping_list
+                ),
                 Tool(
                     name="get_meal_suggestions",
                     description="Suggests meals or identifies missing ingredients for a desired meal. Use this to find ingredients for a meal.",
@@ -62,6 +283,28 @@ class WallabyAgent:
                     func=self._sync_browse_products,
                     coroutine=self._async_browse_products
                 ),
+                Tool(
+                    name="plan_budget_basket",
+                    description=(
+                        "Build the best basket within a budget in one call, with totals and the route. "
+                        'Input must be a JSON object, e.g. {"budget": 30, "required": ["pasta", "ground beef"], '
+                        '"optional": ["bread", "salad"], "quantities": {"pasta": 2}}. Items can also be categories '
+                        "like 'snacks'. Optional items are added most-wanted first as far as the budget allows."
+                    ),
+                    func=self._sync_plan_budget_basket,
+                    coroutine=self._async_plan_budget_basket
+                ),
+                Tool(
+                    name="multi_action",
+                    description=(
+                        "Run several independent lookups at the same time and get all results in one observation. "
+                        f"Input must be a JSON list of up to {MAX_FANOUT_ACTIONS} actions, e.g. "
+                        '[{"tool": "get_item_stock", "input": "milk"}, {"tool": "get_aisle_info", "input": "3"}]. '
+                        "Allowed tools: find_item, get_item_stock, get_aisle_info, browse_products, get_meal_suggestions."
+                    ),
+                    func=self._sync_multi_action,
+                    coroutine=self._async_multi_action
+                ),
                 Tool(
                     name="no_op",
                     description="Use this when no tool is needed.",
@@ -85,6 +328,10 @@ You have access to the following tools:
 - For shopping lists, always use `process_shopping_list`.
 - For meal suggestions or cooking advice, use `get_meal_suggestions` first.
 - For budget or category-specific browsing (e.g., "what's under $5?" or "what's in the bakery?"), use `browse_products`.
+- For budget questions ("feed four for under $30", "what can I get for $10?"), use `plan_budget_basket` ONCE instead of browsing and adding up prices yourself.
+- When an item is out of stock, offer the `substitutes` already included in the tool result instead of searching for alternatives.
+- When you need several independent facts (e.g. stock for several items plus an aisle listing), use `multi_action` ONCE instead of calling tools one after another.
+- For follow-ups about earlier results ("the second one", "that list"), use the conversation context below. To add, remove or swap items on the last list, use `edit_shopping_list` with only the changes.
 - Never ask the user for information you can retrieve with a tool.
 - Do not use a tool if you don't have all the required inputs.
 - If a tool response indicates "no items found" or provides no useful information, STOP using tools and use 'no_op' to give a direct answer.
@@ -109,6 +356,9 @@ Final Answer: Your final, conversational answer to the original question.
 - Do not repeat tool calls unnecessarily
 - Keep responses helpful and conversational
 
+**Conversation context:**
+{session_context}
+
 Begin!
 
 Question: {input}
@@ -117,6 +367,17 @@ Thought:{agent_scratchpad}
 
 
 
+            # Render the tool list into the template once, up front.
+            prompt = prompt.partial(tools=render_text_description(tools), tool_names=", ".join(tool.name for tool in tools))
+            # Fixed part of every prompt: template, decision guide and tool descriptions.
+            self.prompt_template_chars = len(prompt.template) + sum(
+                len(tool.name) + len(tool.description) for tool in tools
+            )
+            # What a first message in a new conversation sends; warm_up() primes the model with it.
+            self.warmup_prompt = prompt.format(
+                session_context=SessionState("warmup", 0).describe(), input="", agent_scratchpad=""
+            )
+
             agent = create_react_agent(self.llm, tools, prompt)
             
             self.agent_executor = AgentExecutor(
@@ -133,6 +394,17 @@ Thought:{agent_scratchpad}
             print(f"❌ Error setting up agent: {e}")
             raise e
 
+    async def warm_up(self) -> Dict[str, Any]:
+        """Load the model and prime its prompt cache with a one-token generation over the agent prompt.
+
+        Only the model this agent created is warmed up; a model passed in is left alone.
+        """
+        if not self.owns_llm:
+            return {"warmed": False, "reason": "model supplied by the caller"}
+        started = time.monotonic()
+        await self.llm.ainvoke(self.warmup_prompt, options={"num_predict": 1, "temperature": 0})
+        return {"warmed": True, "seconds": round(time.monotonic() - started, 3), "prompt_chars": len(self.warmup_prompt)}
+
     # --- Sync/Async Tool Wrappers ---
     def _sync_find_item(self, item_name: str) -> str:
         return asyncio.run(self._async_find_item(item_name))
@@ -140,18 +412,16 @@ Thought:{agent_scratchpad}
     def _sync_process_shopping_list(self, items_str: str) -> str:
         return asyncio.run(self._async_process_shopping_list(items_str))
     
+    def _sync_edit_shopping_list(self, edit_input: str) -> str:
+        return asyncio.run(self._async_edit_shopping_list(edit_input))
+
     # *** FIX ***: Made the input handling more robust. It now extracts the integer
     # from strings like "3 (Dairy & Refrigerated)", preventing validation errors.
     def _sync_get_aisle_info(self, aisle_input: str) -> str:
-        try:
-            # Use regex to find the first sequence of digits
-            match = re.match(r'\d+', str(aisle_input).strip())
-            if not match:
-                return "Error: A valid aisle number could not be found in the input."
-            aisle_number = int(match.group(0))
-            return asyncio.run(self._async_get_aisle_info(aisle_number))
-        except (ValueError, TypeError):
-            return "Error: Aisle number must be an integer."
+        aisle_number = parse_aisle_number(aisle_input)
+        if aisle_number is None:
+            return "Error: A valid aisle number could not be found in the input."
+        return asyncio.run(self._async_get_aisle_info(aisle_number))
     
     def _sync_get_store_layout(self, *args, **kwargs) -> str:
         return asyncio.run(self._async_get_store_layout())
@@ -166,86 +436,409 @@ Thought:{agent_scratchpad}
         return asyncio.run(self._async_get_item_stock(item_name))
         
     def _sync_browse_products(self, query: str) -> str:
-        # A simple parser for the query string, e.g., "category: Bakery, max_price: 5.0"
-        kwargs = {}
-        parts = [p.strip() for p in query.split(',')]
-        for part in parts:
-            try:
-                key, value = part.split(':', 1)
-                key = key.strip()
-                value = value.strip()
-                if key == 'max_price':
-                    kwargs['max_price'] = float(value)
-                elif key == 'category':
-                    kwargs['category'] = str(value)
-            except ValueError:
-                continue # Ignore malformed parts
-        return asyncio.run(self._async_browse_products(**kwargs))
+        return asyncio.run(self._async_browse_products(**parse_browse_query(query)))
+
+    def _sync_plan_budget_basket(self, basket_input: str) -> str:
+        return asyncio.run(self._async_plan_budget_basket(basket_input))
+
+    def _sync_multi_action(self, actions_input: str) -> str:
+        return asyncio.run(self._async_multi_action(actions_input))
 
+    def _observe(self, result: Dict[str, Any]) -> str:
+        """Serialize a tool result for the agent scratchpad."""
+        if not COMPACT_OBSERVATIONS:
+            return json.dumps(result)
+        return json.dumps(compact_observation(result), separators=(",", ":"))
+
+    async def _prefetched(self, tool: str, item_name: str) -> Optional[Dict[str, Any]]:
+        prefetcher = current_prefetch.get()
+        if prefetcher is None:
+            return None
+        result = await prefetcher.take(tool, item_name)
+        CACHE_LOOKUPS.inc(cache="prefetch", result="hit" if result is not None else "miss")
+        return result
 
     async def _async_find_item(self, item_name: str) -> str:
-        result = await self.mcp_connector.find_item(item_name.strip())
-        if result.get("found"): self.last_processed_items = [result.get("item", {})]
-        return json.dumps(result)
+        result = await self._prefetched("find_item", item_name) or await self.mcp_connector.find_item(item_name.strip())
+        if result.get("found"):
+            self.last_processed_items = [result.get("item", {})]
+            session = current_session.get()
+            if session is not None:
+                session.remember_product(item_name, result.get("item", {}))
+        return self._observe(result)
     
     async def _async_process_shopping_list(self, items_str: str) -> str:
         items = [item.strip() for item in items_str.split(',')]
-        result = await self.mcp_connector.process_shopping_list(items)
+        session = current_session.get()
+        if session is None:
+            result = await self.mcp_connector.process_shopping_list(items)
+        else:
+            result = await self._process_list_with_session(items, session)
         if result.get("optimized_path"): self.last_processed_items = result.get("optimized_path", [])
-        return json.dumps(result)
+        return self._observe(result)
+
+    async def _process_list_with_session(self, items: List[str], session: SessionState) -> Dict[str, Any]:
+        """Process a shopping list, only sending items this session has not resolved yet to the server.
+
+        Remembered products are only reused while change notifications keep them current.
+        """
+        live = self.mcp_connector.notifications_live
+        reused = {name: session.resolve(name) if live else None for name in items}
+        missing = [name for name in items if reused[name] is None]
+        CACHE_LOOKUPS.inc(len(items) - len(missing), cache="session", result="hit")
+        CACHE_LOOKUPS.inc(len(missing), cache="session", result="miss")
+        fetched: Dict[str, Dict[str, Any]] = {}
+        not_found: List[str] = []
+        substitutes: Dict[str, List[Dict[str, Any]]] = {}
+
+        if missing:
+            result = await self.mcp_connector.process_shopping_list(missing)
+            if "error" in result:
+                return result
+            by_id = {product.get("id"): product for product in result.get("optimized_path", [])}
+            for name, product_id in result.get("resolved", {}).items():
+                if product_id in by_id:
+                    fetched[name] = by_id[product_id]
+                    session.remember_product(name, by_id[product_id])
+            not_found = result.get("items_not_found", [])
+            substitutes = result.get("substitutes", {})
+            if len(missing) == len(items):
+                # Nothing reused, the server result is already complete.
+                session.remember_list(items, result.get("optimized_path", []), result.get("smart_suggestions", []))
+                return result
+
+        found = [reused[name] or fetched.get(name) for name in items]
+        found = [product for product in found if product]
+        optimized_path = sorted(found, key=lambda x: x['aisle'])
+        total_cost = sum(item['price'] for item in found)
+        unique_aisles = sorted(list(set(item['aisle'] for item in found)))
+
+        if sorted(p.get("id") for p in found) == sorted(p.get("id") for p in session.route):
+            suggestions = session.suggestions
+        else:
+            meal_result = await self.mcp_connector.get_meal_suggestions([item['name'] for item in found])
+            suggestions = meal_result.get("suggestions") or []
+        session.remember_list(items, optimized_path, suggestions)
+
+        merged = {
+            "optimized_path": optimized_path,
+            "items_found": len(found),
+            "items_not_found": not_found,
+            "items_reused": len(items) - len(missing),
+            "aisles_to_visit": unique_aisles,
+            "total_estimated_cost": round(total_cost, 2),
+            "smart_suggestions": suggestions,
+            "summary": f"Found {len(found)} items across {len(unique_aisles)} aisles. Estimated total: ${total_cost:.2f}"
+        }
+        if substitutes:
+            merged["substitutes"] = substitutes
+        return merged
     
+    async def _async_edit_shopping_list(self, edit_input: str) -> str:
+        edit = parse_list_edit(edit_input)
+        if not edit:
+            return self._observe({"error": 'Input must be a JSON object with "add" and/or "remove" item lists or a "replace" mapping.'})
+        session = current_session.get()
+        if session is None or not session.last_shopping_list:
+            return self._observe({"error": "There is no shopping list to edit yet; use process_shopping_list first."})
+        result = await self._edit_list_with_session(edit, session)
+        if session.route: self.last_processed_items = list(session.route)
+        return self._observe(result)
+
+    async def _edit_list_with_session(self, edit: Dict[str, Any], session: SessionState) -> Dict[str, Any]:
+        """Apply an edit to the session's list handle, sending only the changed items.
+
+        The first edit of a list (or one whose handle has expired) creates the handle
+        from the remembered list with the edit applied.
+        """
+        if session.list_id is not None:
+            result = await self._edit_list_handle(edit, session)
+            if "has expired" not in result.get("error", ""):
+                return result
+        items = edited_items(session.last_shopping_list, edit)
+        result = await self.mcp_connector.create_shopping_list(items)
+        if "error" in result:
+            return result
+        session.remember_list(items, result.get("optimized_path", []), result.get("smart_suggestions", []), result.get("list_id"))
+        return result
+
+    async def _edit_list_handle(self, edit: Dict[str, Any], session: SessionState) -> Dict[str, Any]:
+        items = list(session.last_shopping_list)
+        removed: List[Dict[str, Any]] = []
+        added: List[Dict[str, Any]] = []
+        errors: List[str] = []
+        totals: Dict[str, Any] = {}  # the latest successful change, with the list's updated totals
+        for old_item, new_item in edit["replace"].items():
+            result = await self.mcp_connector.replace_list_item(session.list_id, old_item, new_item)
+            if "has expired" in result.get("error", ""):
+                return result
+            if "error" in result:
+                errors.append(result["error"])
+                continue
+            items, totals = edited_items(items, {"remove": [old_item], "add": [new_item]}), result
+            removed += result.get("removed", [])
+            added += result.get("added", [])
+        if edit["remove"]:
+            result = await self.mcp_connector.remove_list_items(session.list_id, edit["remove"])
+            if "error" in result:
+                return result
+            items, totals = edited_items(items, {"remove": edit["remove"]}), result
+            removed += result.get("removed", [])
+        if edit["add"]:
+            result = await self.mcp_connector.add_list_items(session.list_id, edit["add"])
+            if "error" in result:
+                return result
+            items, totals = edited_items(items, {"add": edit["add"]}), result
+            added += result.get("added", [])
+        if not totals:
+            return {"error": " ".join(errors)}
+        session.update_list(items, removed, added, totals.get("smart_suggestions", []))
+        result = {**totals, "removed": removed, "added": added}
+        if errors:
+            result["errors"] = errors
+        return result
+
     async def _async_get_aisle_info(self, aisle_number: int) -> str:
-        return json.dumps(await self.mcp_connector.get_aisle_info(aisle_number))
+        return self._observe(await self.mcp_connector.get_aisle_info(aisle_number))
     
     async def _async_get_store_layout(self, *args, **kwargs) -> str:
-        return json.dumps(await self.mcp_connector.get_store_layout())
+        return self._observe(await self.mcp_connector.get_store_layout())
 
     async def _async_get_meal_suggestions(self, items_str: str) -> str:
         items = [item.strip() for item in items_str.split(',')]
-        return json.dumps(await self.mcp_connector.get_meal_suggestions(items))
+        return self._observe(await self.mcp_connector.get_meal_suggestions(items))
 
     async def _async_report_out_of_stock(self, item_name: str) -> str:
-        return json.dumps(await self.mcp_connector.report_out_of_stock(item_name.strip()))
+        return self._observe(await self.mcp_connector.report_out_of_stock(item_name.strip()))
 
     async def _async_get_item_stock(self, item_name: str) -> str:
-        return json.dumps(await self.mcp_connector.get_item_stock(item_name.strip()))
+        result = await self._prefetched("get_item_stock", item_name) or await self.mcp_connector.get_item_stock(item_name.strip())
+        return self._observe(result)
         
     async def _async_browse_products(self, category: Optional[str] = None, max_price: Optional[float] = None) -> str:
-        return json.dumps(await self.mcp_connector.browse_products(category, max_price))
+        return self._observe(await self.mcp_connector.browse_products(category, max_price))
+
+    async def _async_plan_budget_basket(self, basket_input: str) -> str:
+        kwargs = parse_budget_basket(basket_input)
+        if not kwargs:
+            return self._observe({"error": 'Input must be a JSON object with a "budget" and "required" and/or "optional" item lists.'})
+        result = await self.mcp_connector.plan_budget_basket(**kwargs)
+        if result.get("basket"): self.last_processed_items = result["basket"]
+        return self._observe(result)
+
+    # --- Parallel Fan-out ---
+    async def _run_text_action(self, tool: str, tool_input: str) -> str:
+        """Run one tool from its raw text input, as the ReAct agent would pass it."""
+        if tool == "find_item":
+            return await self._async_find_item(tool_input)
+        if tool == "get_item_stock":
+            return await self._async_get_item_stock(tool_input)
+        if tool == "get_meal_suggestions":
+            return await self._async_get_meal_suggestions(tool_input)
+        if tool == "get_aisle_info":
+            aisle_number = parse_aisle_number(tool_input)
+            if aisle_number is None:
+                raise ValueError("A valid aisle number could not be found in the input.")
+            return await self._async_get_aisle_info(aisle_number)
+        if tool == "browse_products":
+            return await self._async_browse_products(**parse_browse_query(tool_input))
+        raise ValueError(f"Tool '{tool}' cannot be used inside multi_action.")
+
+    async def _async_multi_action(self, actions_input: str) -> str:
+        """Run independent tool calls concurrently and merge them into one observation.
+
+        Fan-out is capped at MAX_FANOUT_ACTIONS with at most MAX_PARALLEL_TOOLS in
+        flight; a failing call is reported in its own slot without sinking the others.
+        """
+        actions = parse_multi_action(actions_input)
+        if not actions:
+            return self._observe({"error": "multi_action input must be a JSON list of {\"tool\": ..., \"input\": ...} objects."})
+
+        skipped = actions[MAX_FANOUT_ACTIONS:]
+        actions = actions[:MAX_FANOUT_ACTIONS]
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_TOOLS)
+        previous_items = list(self.last_processed_items)
+
+        async def run(action: Dict[str, str]) -> Any:
+            async with semaphore:
+                return json.loads(await self._run_text_action(action["tool"], action["input"]))
+
+        outcomes = await asyncio.gather(*(run(action) for action in actions), return_exceptions=True)
+
+        results, processed_items, failed = [], [], 0
+        for action, outcome in zip(actions, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, Exception):
+                failed += 1
+                results.append({"tool": action["tool"], "input": action["input"], "error": str(outcome)})
+                continue
+            if isinstance(outcome, dict) and "error" in outcome:
+                failed += 1
+            # Each find_item would overwrite last_processed_items; keep every found item instead.
+            if action["tool"] == "find_item" and isinstance(outcome, dict) and outcome.get("found"):
+                processed_items.append(outcome.get("item", {}))
+            results.append({"tool": action["tool"], "input": action["input"], "result": outcome})
+
+        self.last_processed_items = processed_items or previous_items
+        merged = {"results": results, "succeeded": len(results) - failed, "failed": failed}
+        if skipped:
+            merged["skipped"] = [f"{a['tool']}: {a['input']}" for a in skipped]
+            merged["message"] = f"Only the first {MAX_FANOUT_ACTIONS} actions were run."
+        # Observations were already compacted per action.
+        return json.dumps(merged, separators=(",", ":") if COMPACT_OBSERVATIONS else None)
+
+    # --- Speculative Prefetch ---
+    def _on_catalog_change(self, uri: Optional[str]):
+        """MCP change listener: products were added, removed or renamed, or updates may have been missed."""
+        if uri is None or uri == PRODUCT_NAMES_URI:
+            self._matcher_stale = True
+
+    def _current_matcher(self) -> Optional[CatalogMatcher]:
+        """The local product matcher as built so far.
+
+        A missing or outdated matcher is rebuilt from the product_names resource in
+        the background; requests never wait for it, they just skip prefetching.
+        """
+        outdated = self._matcher_stale or (
+            not self.mcp_connector.notifications_live
+            and time.monotonic() - self._matcher_built_at > PREFETCH_MATCHER_MAX_AGE
+        )
+        if (self._matcher is None or outdated) and (self._matcher_task is None or self._matcher_task.done()):
+            self._matcher_stale = False
+            self._matcher_task = asyncio.create_task(self._build_matcher())
+        return self._matcher
+
+    async def _build_matcher(self):
+        current_deadline.set(None) # not part of the request that triggered it
+        names = await self.mcp_connector.get_product_names()
+        if not names or "error" in names:
+            self._matcher_stale = True
+            return
+        self._matcher = await asyncio.to_thread(CatalogMatcher, names)
+        self._matcher_built_at = time.monotonic()
+
+    async def _start_prefetch(self, user_message: str) -> Optional[Prefetcher]:
+        """Fire find_item/get_item_stock for products named in the message, concurrently with the first LLM call."""
+        if not SPECULATIVE_PREFETCH:
+            return None
+        matcher = self._current_matcher()
+        if matcher is None:
+            return None
+        keys = matcher.extract(user_message, PREFETCH_MAX_ITEMS)
+        if not keys:
+            return None
+
+        prefetcher = Prefetcher(PREFETCH_TIMEOUT)
+        for key in keys:
+            aliases = [matcher.names[key]]
+            prefetcher.start("find_item", key, lambda key=key: self.mcp_connector.find_item(key), aliases)
+            prefetcher.start("get_item_stock", key, lambda key=key: self.mcp_connector.get_item_stock(key), aliases)
+        return prefetcher
+
+    def _finish_prefetch(self, prefetcher: Optional[Prefetcher], log: bool = False):
+        """Cancel leftover lookups and fold this request's hit/waste counts into the totals."""
+        if prefetcher is None:
+            return
+        prefetcher.cancel_pending()
+        report = prefetcher.report()
+        for key in self.prefetch_totals:
+            self.prefetch_totals[key] += report[key]
+        issued = self.prefetch_totals["issued"]
+        if log:
+            print(
+                f"🔮 Prefetch: {report['hits']}/{report['issued']} hits this request, "
+                f"{self.prefetch_totals['hits'] / issued:.0%} hit / {self.prefetch_totals['wasted'] / issued:.0%} waste overall"
+            )
 
     # --- Main Processing Logic ---
-    async def process_message(self, user_message: str) -> Dict[str, Any]:
+    async def process_message(self, user_message: str, deadline: Optional[Deadline] = None, session_id: Optional[str] = None,
+                              log: bool = False) -> Dict[str, Any]:
+        """Run the agent on one message within a deadline budget.
+
+        Every LLM call and tool call of the run draws from the same budget; when
+        it runs out the whole agent run is cancelled, including in-flight calls.
+        Turns sharing a session_id see the earlier list and reuse its resolved products.
+        `log` prints this run's usage and prefetch lines (the API samples which requests).
+        """
         if not self.agent_executor:
             return {"message": "Agent not initialized."}
         
+        deadline = deadline or Deadline(CHAT_DEADLINE_SECONDS)
+        session = self.sessions.get_or_create(session_id)
+        session.turns += 1
+        token = current_deadline.set(deadline)
+        session_token = current_session.set(session)
+        accounting = RequestAccounting(self.prompt_template_chars)
+        prefetcher: Optional[Prefetcher] = None
+        prefetch_token = None
         try:
             if user_message.strip().lower() in ["hi", "hello", "hey"]:
-                return {"message": "Hello! I'm Wallaby, your shopping assistant. How can I help you today?"}
+                return {"message": "Hello! I'm Wallaby, your shopping assistant. How can I help you today?", "session_id": session.session_id}
 
             self.last_processed_items.clear()
-            result = await self.agent_executor.ainvoke({"input": user_message})
+            prefetcher = await self._start_prefetch(user_message)
+            prefetch_token = current_prefetch.set(prefetcher)
+            accounting.prefetcher = prefetcher
+            async with asyncio.timeout(deadline.remaining()):
+                result = await self.agent_executor.ainvoke(
+                    {"input": user_message, "session_context": session.describe()},
+                    config={"callbacks": [DeadlineCallbackHandler(deadline), AccountingCallbackHandler(accounting)]},
+                )
             response_text = result.get("output", "I'm sorry, I couldn't process your request.")
             
             structured_data = self._extract_structured_data_from_last_run()
+            usage = self._log_usage(accounting, log)
 
-            return {"message": response_text, **structured_data}
+            return {"message": response_text, **structured_data, "usage": usage, "session_id": session.session_id}
             
+        except TimeoutError:
+            deadline.cancel("deadline exceeded")
+            TIMEOUTS.inc(kind="chat")
+            print(f"⏱️ Agent run cancelled after {deadline.elapsed():.1f}s: {deadline.report()['spent_s']}")
+            self.last_processed_items.clear()
+            return {
+                "message": "I'm sorry, that took longer than expected. Could you try asking again, perhaps a bit more simply?",
+                "usage": self._log_usage(accounting, log),
+                "session_id": session.session_id,
+            }
         except Exception as e:
             error_message = f"Error during agent execution: {e}"
             print(f"❌ {error_message}")
             import traceback
             traceback.print_exc()
             self.last_processed_items.clear()
-            return {"message": "I'm sorry, I ran into a technical problem while trying to answer. Could you please try rephrasing your request?"}
+            return {"message": "I'm sorry, I ran into a technical problem while trying to answer. Could you please try rephrasing your request?", "session_id": session.session_id}
+        finally:
+            self._finish_prefetch(prefetcher, log)
+            if prefetch_token is not None:
+                current_prefetch.reset(prefetch_token)
+            current_session.reset(session_token)
+            current_deadline.reset(token)
+
+    def _log_usage(self, accounting: RequestAccounting, log: bool = False) -> Dict[str, Any]:
+        """Return the run's usage report, logging a one-line summary of it if `log` is set."""
+        report = accounting.report()
+        if log:
+            print(
+                f"📊 Agent usage: {report['iterations']} LLM calls, "
+                f"{report['prompt_tokens']} prompt / {report['completion_tokens']} completion tokens, "
+                f"scratchpad {report['scratchpad_chars']} chars, {report['elapsed_s']}s"
+            )
+        return report
 
     def _extract_structured_data_from_last_run(self) -> Dict[str, Any]:
-        """Extracts structured data from the last tool call for the UI."""
+        """Extracts structured data from the last tool call for the UI.
+
+        Route items are one unit each; basket lines carry a quantity and line_total.
+        """
         if not self.last_processed_items: return {}
         
         data = {
             "aisles": sorted(list(set(item['aisle'] for item in self.last_processed_items if 'aisle' in item))),
-            "total_cost": round(sum(item['price'] for item in self.last_processed_items if 'price' in item), 2),
-            "items_found": len(self.last_processed_items),
+            "total_cost": round(sum(item.get('line_total', item['price'] * item.get('quantity', 1))
+                                    for item in self.last_processed_items if 'price' in item), 2),
+            "items_found": sum(item.get('quantity', 1) for item in self.last_processed_items),
             "individual_item_costs": {item['name']: item['price'] for item in self.last_processed_items if 'name' in item and 'price' in item},
         }
         return data
\ No newline at end of file
@@ -1,18 +1,33 @@
 # FILE: mcp_client/api.py
 # Updated API with proper agent integration
 
+import asyncio
+import importlib
+import random
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import Dict, List, Any, Optional
+from typing import TYPE_CHECKING, Dict, List, Any, Optional
 
-from .client import MCPConnector
-from .agent import WallabyAgent
+from .config import (
+    CHAT_DEADLINE_SECONDS, DISCONNECT_POLL_INTERVAL, CHAT_PAYLOAD_LOG_SAMPLE_RATE,
+    FAST_STARTUP, LLM_WARMUP, LLM_WARMUP_ATTEMPTS,
+)
+from .deadline import Deadline
+from .metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE, CHAT_REQUEST_SECONDS
+from .startup import DEGRADED, StartupTracker
+
+if TYPE_CHECKING:
+    # LangChain and the MCP SDK take most of the import time; lifespan() loads them.
+    from .agent import WallabyAgent
+    from .client import MCPConnector
 
 # --- Pydantic Models ---
 class ChatRequest(BaseModel):
     message: str
+    session_id: Optional[str] = None # Returned by the first reply; send it back for follow-ups
 
 class ChatResponse(BaseModel):
     message: str
@@ -21,38 +36,105 @@ class ChatResponse(BaseModel):
     items_found: int | None = None
     individual_item_costs: Dict[str, float] | None = None # New field for individual prices
     suggestions: List[str] | None = None # New field for meal suggestions
+    budget: Dict[str, Any] | None = None # Where the request deadline was spent
+    usage: Dict[str, Any] | None = None # Prompt/token accounting for the agent run
+    session_id: str | None = None # Conversation session to send with the next message
+
+class PickWavesRequest(BaseModel):
+    orders: List[Dict[str, Any]] # {"order_id": "...", "items": ["milk", {"item": "eggs", "quantity": 2}]}
+    totes_per_cart: Optional[int] = None
+    max_units_per_cart: Optional[int] = None
 
 # --- Global Agent Instance ---
-wallaby_agent: WallabyAgent = None
+wallaby_agent: Optional["WallabyAgent"] = None
+startup: Optional[StartupTracker] = None
+_warmup_task: Optional[asyncio.Task] = None
+
+STARTUP_PHASES = ("import_mcp", "mcp_connect", "import_agent", "agent_setup", "llm_warmup")
+
+async def _import(tracker: StartupTracker, phase: str, module: str):
+    """Import a package module in a worker thread, so the other startup phase keeps running."""
+    with tracker.phase(phase):
+        return await asyncio.to_thread(importlib.import_module, module, __package__)
+
+async def _connect_mcp(tracker: StartupTracker, connector: "MCPConnector"):
+    with tracker.phase("mcp_connect"):
+        return await connector.get_instance()
+
+async def _build_agent(tracker: StartupTracker, connector: "MCPConnector"):
+    agent = await _import(tracker, "import_agent", ".agent")
+    with tracker.phase("agent_setup"):
+        # The agent only keeps a reference to the connector; it may still be connecting.
+        return await asyncio.to_thread(agent.WallabyAgent, connector)
+
+async def _warm_up_llm(tracker: StartupTracker, agent: "WallabyAgent"):
+    """Warm the model up, retrying with backoff; giving up marks the phase degraded, not failed,
+    so a slow Ollama start does not keep /ready at 503 for the life of the process."""
+    with tracker.phase("llm_warmup") as phase:
+        for attempt in range(1, LLM_WARMUP_ATTEMPTS + 1):
+            phase["attempts"] = attempt
+            try:
+                phase.update(await agent.warm_up())
+                phase.pop("error", None)
+                print(f"🔥 LLM warmed up (attempt {attempt})")
+                return
+            except Exception as e:
+                phase["error"] = str(e) or type(e).__name__
+                print(f"⚠️ LLM warm-up attempt {attempt} failed: {phase['error']}")
+            if attempt < LLM_WARMUP_ATTEMPTS:
+                await asyncio.sleep(2 ** (attempt - 1))
+        phase["status"] = DEGRADED
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manages startup and shutdown events."""
-    global wallaby_agent
+    global wallaby_agent, startup, _warmup_task
     # Startup
     print("🚀 API Server starting up...")
+    required = [phase for phase in STARTUP_PHASES if phase != "llm_warmup" or LLM_WARMUP]
+    startup = StartupTracker(STARTUP_PHASES, required)
     
     try:
-        # Initialize MCP connector
-        mcp_connector = await MCPConnector.get_instance()
+        client = await _import(startup, "import_mcp", ".client")
+        # Created here, on the event loop, before anything else can race to create it.
+        connector = client.MCPConnector.instance()
+        if FAST_STARTUP:
+            # Build the agent while connecting to the MCP server. The connection stays in
+            # this task: its transport has to be closed by the task that opened it.
+            agent_task = asyncio.create_task(_build_agent(startup, connector))
+            try:
+                await _connect_mcp(startup, connector)
+            except BaseException:
+                agent_task.cancel()
+                raise
+            wallaby_agent = await agent_task
+        else:
+            await _connect_mcp(startup, connector)
+            wallaby_agent = await _build_agent(startup, connector)
         print("✅ MCP Connector initialized")
-        
-        # Initialize agent with MCP connector
-        wallaby_agent = WallabyAgent(mcp_connector)
         print("✅ Wallaby Agent initialized")
         
-        print("✅ API Server is ready.")
+        if LLM_WARMUP:
+            # Runs after startup; /ready reports ready once the model is loaded.
+            _warmup_task = asyncio.create_task(_warm_up_llm(startup, wallaby_agent))
+        else:
+            startup.skip("llm_warmup", "LLM_WARMUP is off")
+        
+        print(f"✅ API Server is ready. ⏱️ {startup.summary()}")
         
     except Exception as e:
-        print(f"❌ Failed to initialize server: {e}")
+        print(f"❌ Failed to initialize server: {e} ({startup.summary()})")
         raise e
     
     yield
     
     # Shutdown
     print("🛑 API Server shutting down...")
+    if _warmup_task is not None and not _warmup_task.done():
+        _warmup_task.cancel()
     try:
-        connector = await MCPConnector.get_instance()
+        client = importlib.import_module(".client", __package__)
+        connector = await client.MCPConnector.get_instance()
         await connector.cleanup()
         print("✅ Cleanup complete.")
     except Exception as e:
@@ -74,6 +156,19 @@ app.add_middleware(
 def health_check():
     return {"status": "Wallaby API is online"}
 
+@app.get("/ready")
+def readiness():
+    """Startup phases with their status and timings; 503 until every required phase is done."""
+    if startup is None:
+        return JSONResponse({"ready": False, "phases": {}}, status_code=503)
+    report = startup.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: tool/LLM/chat latency histograms, reconnects, timeouts and cache hits."""
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @app.get("/debug/tools")
 async def debug_tools():
     """Debug endpoint to test MCP tools directly."""
@@ -119,19 +214,65 @@ async def debug_tools():
         print(f"❌ Error in debug endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Debug error: {str(e)}")
 
+@app.post("/picking/waves")
+async def pick_waves(request: PickWavesRequest):
+    """Group online orders into cart-sized pick waves, each with one route and a tote per order."""
+    if not wallaby_agent or not wallaby_agent.mcp_connector:
+        raise HTTPException(status_code=503, detail="Agent is not initialized yet.")
+    result = await wallaby_agent.mcp_connector.plan_pick_waves(request.orders, request.totes_per_cart, request.max_units_per_cart)
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+async def _wait_for_disconnect(http_request: Request):
+    """Return once the client has gone away."""
+    while not await http_request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
 @app.post("/chat", response_model=ChatResponse)
-async def handle_chat(request: ChatRequest):
+async def handle_chat(request: ChatRequest, http_request: Request):
     if not wallaby_agent:
         raise HTTPException(status_code=503, detail="Agent is not initialized yet.")
     
+    # The deadline starts here and is shared by every LLM and tool call below.
+    deadline = Deadline(CHAT_DEADLINE_SECONDS)
+    # Per-request log lines only for a sample of requests; they cost more than the request at high rates.
+    sampled = bool(CHAT_PAYLOAD_LOG_SAMPLE_RATE) and random.random() < CHAT_PAYLOAD_LOG_SAMPLE_RATE
+    agent_task = asyncio.create_task(
+        wallaby_agent.process_message(request.message, deadline=deadline, session_id=request.session_id, log=sampled)
+    )
+    disconnect_task = asyncio.create_task(_wait_for_disconnect(http_request))
+    outcome = "error"
+    
     try:
-        print(f"📨 Received chat request: {request.message}")
-        response_data = await wallaby_agent.process_message(request.message)
-        print(f"📤 Sending response: {response_data}")
+        if sampled:
+            print(f"📨 Received chat request ({len(request.message)} chars)")
+        await asyncio.wait({agent_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        
+        if not agent_task.done():
+            # The browser gave up; stop the LLM and MCP work it was waiting for.
+            deadline.cancel("client disconnected")
+            agent_task.cancel()
+            outcome = "disconnected"
+            print(f"🔌 Client disconnected, cancelled chat request: {deadline.report()}")
+            raise HTTPException(status_code=499, detail="Client closed request.")
+        
+        response_data = agent_task.result()
+        response_data["budget"] = deadline.report()
+        outcome = "deadline" if deadline.cancelled_reason else "ok"
+        if sampled:
+            print(f"📤 Sending response: {response_data}")
         return ChatResponse(**response_data)
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error in chat endpoint: {e}")
         import traceback
         print(f"Full traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail="An internal error occurred.")
+    finally:
+        CHAT_REQUEST_SECONDS.observe(deadline.elapsed(), outcome=outcome)
+        disconnect_task.cancel()
+        if not agent_task.done():
+            agent_task.cancel()
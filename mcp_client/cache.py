@@ -0,0 +1,109 @@
+# FILE: mcp_client/cache.py
+# Client-side cache of read-only tool results, invalidated by the server's resource
+# update notifications instead of by a TTL.
+
+import copy
+import json
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Set, Tuple
+
+from .metrics import CACHE_LOOKUPS
+
+# Resource URIs the server sends notifications/resources/updated for (see server.py).
+CATALOG_URI = "http://localhost/product_catalog"
+PRODUCT_NAMES_URI = "http://localhost/product_names"
+LAYOUT_URI = "http://localhost/store_map_layout"
+PRODUCT_URI_PREFIX = "http://localhost/products/"
+SUBSCRIBED_URIS = (CATALOG_URI, PRODUCT_NAMES_URI, LAYOUT_URI)
+
+CACHEABLE_TOOLS = ("find_item", "get_item_stock", "get_aisle_info", "browse_products", "get_store_layout")
+
+CacheKey = Tuple[str, str]
+
+
+def result_dependencies(tool_name: str, result: Dict[str, Any]) -> Optional[Set[str]]:
+    """The resource URIs a tool result was derived from, or None if it must not be cached."""
+    if tool_name not in CACHEABLE_TOOLS or "error" in result:
+        return None
+    if tool_name in ("find_item", "get_item_stock"):
+        # Which product a name resolves to can change when products are added or renamed;
+        # the product itself changes with its stock and price.
+        product_id = (result.get("item") or {}).get("id") or result.get("product_id")
+        dependencies = {PRODUCT_NAMES_URI}
+        if product_id:
+            dependencies.add(PRODUCT_URI_PREFIX + str(product_id))
+        # Substitutes for an out-of-stock item carry their own stock and price.
+        dependencies.update(PRODUCT_URI_PREFIX + str(substitute["id"]) for substitute in result.get("substitutes", []))
+        return dependencies
+    if tool_name == "get_store_layout":
+        return {LAYOUT_URI}
+    return {CATALOG_URI}
+
+
+class ResultCache:
+    """LRU-bounded map of (tool, arguments) -> result, with a reverse index from resource URI to entries."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Dict[str, Any]]" = OrderedDict()
+        self._dependencies: Dict[CacheKey, Set[str]] = {}
+        self._by_uri: Dict[str, Set[CacheKey]] = {}
+        self.invalidated = 0
+        # Bumped on every invalidation; a result fetched across one may already be stale.
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(tool_name: str, arguments: Dict[str, Any]) -> CacheKey:
+        return tool_name, json.dumps(arguments, sort_keys=True)
+
+    def get(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        key = self.key(tool_name, arguments)
+        result = self._entries.get(key)
+        CACHE_LOOKUPS.inc(cache="tool_results", result="hit" if result is not None else "miss")
+        if result is None:
+            return None
+        self._entries.move_to_end(key)
+        # Callers are free to modify what they get back.
+        return copy.deepcopy(result)
+
+    def put(self, tool_name: str, arguments: Dict[str, Any], result: Dict[str, Any], generation: int):
+        """Cache `result`, unless an invalidation arrived since `generation` was read (before the call)."""
+        dependencies = result_dependencies(tool_name, result)
+        if dependencies is None or generation != self.generation:
+            return
+        key = self.key(tool_name, arguments)
+        self._discard(key)
+        self._entries[key] = copy.deepcopy(result)
+        self._dependencies[key] = dependencies
+        for uri in dependencies:
+            self._by_uri.setdefault(uri, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+
+    def invalidate(self, uri: str) -> int:
+        """Drop every entry derived from `uri`."""
+        self.generation += 1
+        keys = set(self._by_uri.get(uri, ()))
+        for key in keys:
+            self._discard(key)
+        self.invalidated += len(keys)
+        return len(keys)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._dependencies.clear()
+        self._by_uri.clear()
+
+    def _discard(self, key: CacheKey):
+        if self._entries.pop(key, None) is None:
+            return
+        for uri in self._dependencies.pop(key, ()):
+            dependents = self._by_uri.get(uri)
+            if dependents is not None:
+                dependents.discard(key)
+                if not dependents:
+                    del self._by_uri[uri]
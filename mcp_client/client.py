@@ -4,15 +4,25 @@
 import asyncio
 import json
 import logging
-from typing import Dict, Any, List, Optional
-from mcp import ClientSession
+import os
+import time
+from typing import Callable, Dict, Any, List, Optional
+from mcp import ClientSession, types
 from mcp.client.sse import sse_client
-from .config import MCP_SERVER_HTTP_URL
+from pydantic import AnyUrl
+from .cache import CACHEABLE_TOOLS, PRODUCT_NAMES_URI, ResultCache, SUBSCRIBED_URIS
+from .config import MCP_SERVER_HTTP_URL, CACHE_TOOL_RESULTS, TOOL_RESULT_CACHE_SIZE
+from .deadline import current_deadline
+from .metrics import MCP_TOOL_CALL_SECONDS, MCP_RECONNECTS, TIMEOUTS
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Called with the URI of each resource update; None means "anything may have changed"
+# (after (re)subscribing, since updates sent while disconnected are lost).
+ChangeListener = Callable[[Optional[str]], None]
+
 class WalmartMCPClient:
     """Enhanced MCP Client with better timeout and error handling."""
     
@@ -22,21 +32,31 @@ class WalmartMCPClient:
         self.connected = False
         self._sse_context = None
         self._connection_lock = asyncio.Lock()
+        # Read-only tool results, used only while subscribed to the server's change notifications
+        self.cache: Optional[ResultCache] = ResultCache(TOOL_RESULT_CACHE_SIZE) if CACHE_TOOL_RESULTS else None
+        self.cache_live = False
+        self.notifications_live = False
+        self.change_listeners: List[ChangeListener] = []
         
     async def connect(self, timeout: float = 10.0) -> bool:
         """Connect to the MCP server using SSE transport with timeout."""
         async with self._connection_lock:
             try:
                 await self._cleanup_on_error() 
+                # Notifications sent while disconnected are lost, so nothing cached can be trusted
+                self.cache_live = False
+                self.notifications_live = False
+                if self.cache is not None:
+                    self.cache.clear()
                 
                 logger.info(f"🔌 Connecting to MCP server at {self.server_url}")
                 
                 # Use timeout for connection
                 async with asyncio.timeout(timeout):
-                    self._sse_context = sse_client(self.server_url)
+                    self._sse_context = self._open_transport()
                     read_stream, write_stream = await self._sse_context.__aenter__()
                     
-                    self.session = ClientSession(read_stream, write_stream)
+                    self.session = ClientSession(read_stream, write_stream, message_handler=self._handle_message)
                     await self.session.__aenter__()
                 
                 self.connected = True
@@ -47,6 +67,7 @@ class WalmartMCPClient:
                         
             except asyncio.TimeoutError:
                 logger.error(f"❌ Connection timeout after {timeout}s")
+                TIMEOUTS.inc(kind="connect")
                 self.connected = False
                 await self._cleanup_on_error()
                 return False
@@ -56,6 +77,10 @@ class WalmartMCPClient:
                 await self._cleanup_on_error()
                 return False
     
+    def _open_transport(self):
+        """Return the async context manager that yields (read_stream, write_stream) for the session."""
+        return sse_client(self.server_url)
+
     async def _cleanup_on_error(self):
         """Clean up resources on connection error or before new connection."""
         try:
@@ -94,6 +119,8 @@ class WalmartMCPClient:
                     logger.info(f"📚 Available resources: {[resource.name for resource in resources_result.resources]}")
                 except Exception as e:
                     logger.warning(f"⚠️ No resources available or error listing resources: {e}")
+
+                await self._subscribe_to_changes()
                     
         except asyncio.TimeoutError:
             logger.error("❌ Session initialization timed out")
@@ -104,21 +131,92 @@ class WalmartMCPClient:
             logger.error(f"Full traceback: {traceback.format_exc()}")
             self.connected = False
     
+    async def _subscribe_to_changes(self):
+        """Subscribe to catalog change notifications; without them the result cache stays off."""
+        try:
+            for uri in SUBSCRIBED_URIS:
+                await self.session.subscribe_resource(AnyUrl(uri))
+            self.notifications_live = True
+            self.cache_live = self.cache is not None
+            logger.info("🔔 Subscribed to catalog change notifications")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not subscribe to catalog changes, tool results will not be cached: {e}")
+        self._notify_listeners(None)
+
+    async def _handle_message(self, message) -> None:
+        """ClientSession message handler: drop cached results when the server reports a resource changed."""
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ResourceUpdatedNotification):
+            uri = str(message.root.params.uri)
+            if self.cache is not None:
+                dropped = self.cache.invalidate(uri)
+                logger.debug(f"🔔 {uri} updated, {dropped} cached results dropped")
+            self._notify_listeners(uri)
+
+    def _notify_listeners(self, uri: Optional[str]):
+        for listener in self.change_listeners:
+            try:
+                listener(uri)
+            except Exception as e:
+                logger.warning(f"⚠️ Change listener failed for {uri}: {e}")
+
     async def call_tool(self, tool_name: str, arguments: Dict[str, Any], timeout: float = 15.0, retry: bool = True) -> Dict[str, Any]:
-        """Call a tool on the MCP server with configurable timeout and retry."""
+        """Call a tool on the MCP server with configurable timeout and retry.
+
+        When running inside a /chat request, the timeout is shrunk to whatever is
+        left of the request deadline and the time spent is recorded against it.
+        Read-only results are served from the cache while change notifications are on.
+        """
+        if not self.cache_live or tool_name not in CACHEABLE_TOOLS:
+            return await self._call_tool_timed(tool_name, arguments, timeout, retry)
+        cached = self.cache.get(tool_name, arguments)
+        if cached is not None:
+            return cached
+        generation = self.cache.generation
+        result = await self._call_tool_timed(tool_name, arguments, timeout, retry)
+        if self.cache_live:
+            self.cache.put(tool_name, arguments, result, generation)
+        return result
+
+    async def _call_tool_timed(self, tool_name: str, arguments: Dict[str, Any], timeout: float, retry: bool) -> Dict[str, Any]:
+        deadline = current_deadline.get()
+        if deadline is None:
+            with MCP_TOOL_CALL_SECONDS.time(tool=tool_name):
+                return await self._call_tool(tool_name, arguments, timeout, retry)
+
+        if deadline.expired:
+            logger.warning(f"⏱️ Skipping tool '{tool_name}': request deadline exceeded")
+            TIMEOUTS.inc(kind="deadline")
+            return {"error": "Request deadline exceeded before the tool could run"}
+
+        started = time.monotonic()
+        try:
+            with MCP_TOOL_CALL_SECONDS.time(tool=tool_name):
+                return await self._call_tool(tool_name, arguments, deadline.clamp(timeout), retry)
+        finally:
+            deadline.record(f"tool:{tool_name}", time.monotonic() - started)
+
+    def _budgeted(self, timeout: float) -> float:
+        """Clamp a timeout to the current request deadline, if there is one."""
+        deadline = current_deadline.get()
+        return deadline.clamp(timeout) if deadline else timeout
+
+    async def _call_tool(self, tool_name: str, arguments: Dict[str, Any], timeout: float, retry: bool) -> Dict[str, Any]:
+        """Call a tool on the MCP server, reconnecting once if the connection was lost."""
+        connect_timeout = self._budgeted(10.0)
+
         # Handle potential tool name typos
         if tool_name == "find_item" and not self.connected:
             # Try to reconnect first
-            if not await self.connect():
+            if not await self.connect(timeout=connect_timeout):
                 return {"error": "Failed to connect to server"}
         
         if not self.session or not self.connected:
             logger.error("❌ Not connected to MCP server. Attempting to reconnect...")
-            if not await self.connect():
+            if not await self.connect(timeout=connect_timeout):
                 return {"error": "Failed to connect to server"}
             
         try:
-            logger.info(f"🔧 Calling tool '{tool_name}' with args: {arguments}")
+            logger.debug(f"🔧 Calling tool '{tool_name}' with args: {arguments}")
             
             # Use timeout for tool calls
             async with asyncio.timeout(timeout):
@@ -138,29 +236,31 @@ class WalmartMCPClient:
                 if hasattr(content, 'text'):
                     try:
                         parsed_result = json.loads(content.text)
-                        logger.info(f"✅ Tool call successful")
+                        logger.debug(f"✅ Tool call successful")
                         return parsed_result
                     except json.JSONDecodeError:
-                        logger.info(f"✅ Tool call successful (plain text)")
+                        logger.debug(f"✅ Tool call successful (plain text)")
                         return {"result": content.text}
                 else:
-                    logger.info(f"✅ Tool call successful (raw content)")
+                    logger.debug(f"✅ Tool call successful (raw content)")
                     return {"result": str(content)}
             
-            logger.info(f"✅ Tool call successful (empty result)")
+            logger.debug(f"✅ Tool call successful (empty result)")
             return {"result": "Tool executed successfully"}
             
         except asyncio.TimeoutError:
             logger.error(f"❌ Tool call '{tool_name}' timed out after {timeout}s")
+            TIMEOUTS.inc(kind="tool")
             return {"error": f"Tool call timed out after {timeout} seconds"}
         except Exception as e:
             error_msg = str(e)
             if "ClosedResourceError" in error_msg and retry:
                 logger.warning(f"Connection lost while calling tool '{tool_name}'. Attempting to reconnect and retry...")
                 self.connected = False
-                if await self.connect():
+                MCP_RECONNECTS.inc()
+                if await self.connect(timeout=connect_timeout):
                     logger.info("Reconnection successful. Retrying tool call.")
-                    return await self.call_tool(tool_name, arguments, timeout=timeout, retry=False)
+                    return await self._call_tool(tool_name, arguments, self._budgeted(timeout), retry=False)
                 else:
                     logger.error("Failed to reconnect. Cannot retry tool call.")
                     return {"error": f"Connection lost and failed to reconnect: {error_msg}"}
@@ -215,6 +315,21 @@ class WalmartMCPClient:
     async def get_item_stock(self, item_name: str) -> Dict[str, Any]:
         return await self.call_tool("get_item_stock", {"item_name": item_name}, timeout=5.0)
     
+    async def create_shopping_list(self, items: List[str]) -> Dict[str, Any]:
+        return await self.call_tool("create_shopping_list", {"items": items}, timeout=20.0)
+
+    async def add_list_items(self, list_id: str, items: List[str]) -> Dict[str, Any]:
+        return await self.call_tool("add_list_items", {"list_id": list_id, "items": items}, timeout=10.0)
+
+    async def remove_list_items(self, list_id: str, items: List[str]) -> Dict[str, Any]:
+        return await self.call_tool("remove_list_items", {"list_id": list_id, "items": items}, timeout=5.0)
+
+    async def replace_list_item(self, list_id: str, old_item: str, new_item: str) -> Dict[str, Any]:
+        return await self.call_tool("replace_list_item", {"list_id": list_id, "old_item": old_item, "new_item": new_item}, timeout=10.0)
+
+    async def get_shopping_list(self, list_id: str) -> Dict[str, Any]:
+        return await self.call_tool("get_shopping_list", {"list_id": list_id}, timeout=10.0)
+
     async def browse_products(self, category: Optional[str] = None, max_price: Optional[float] = None) -> Dict[str, Any]:
         """Call the browse_products tool, handling optional arguments."""
         args = {}
@@ -224,15 +339,35 @@ class WalmartMCPClient:
             args["max_price"] = max_price
         return await self.call_tool("browse_products", args, timeout=10.0)
 
+    async def plan_budget_basket(self, budget: float, required: Optional[List[str]] = None, optional: Optional[List[str]] = None,
+                                 quantities: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        args: Dict[str, Any] = {"budget": budget}
+        if required:
+            args["required"] = required
+        if optional:
+            args["optional"] = optional
+        if quantities:
+            args["quantities"] = quantities
+        return await self.call_tool("plan_budget_basket", args, timeout=10.0)
+
+    async def plan_pick_waves(self, orders: List[Dict[str, Any]], totes_per_cart: Optional[int] = None,
+                              max_units_per_cart: Optional[int] = None) -> Dict[str, Any]:
+        args: Dict[str, Any] = {"orders": orders}
+        if totes_per_cart is not None:
+            args["totes_per_cart"] = totes_per_cart
+        if max_units_per_cart is not None:
+            args["max_units_per_cart"] = max_units_per_cart
+        return await self.call_tool("plan_pick_waves", args, timeout=30.0)
+
     # --- Resource Reading Methods ---
     async def get_product_catalog(self) -> Dict[str, Any]:
         """Get the complete product catalog resource."""
         if not self.session or not self.connected:
             return {"error": "Not connected to server"}
         try:
-            async with asyncio.timeout(10.0):
+            async with asyncio.timeout(self._budgeted(10.0)):
                 resource_name = "http://localhost/product_catalog"
-                logger.info(f"📚 Reading resource: {resource_name}")
+                logger.debug(f"📚 Reading resource: {resource_name}")
                 result = await self.session.read_resource(resource_name)
                 if result.contents and len(result.contents) > 0 and hasattr(result.contents[0], 'text'):
                     return json.loads(result.contents[0].text)
@@ -243,14 +378,31 @@ class WalmartMCPClient:
             logger.error(f"❌ Error reading product_catalog resource: {e}")
             return {"error": str(e)}
 
+    async def get_product_names(self) -> Dict[str, Any]:
+        """Get the product name of every catalog key (the product_names resource)."""
+        if not self.session or not self.connected:
+            return {"error": "Not connected to server"}
+        try:
+            async with asyncio.timeout(self._budgeted(10.0)):
+                logger.debug(f"📚 Reading resource: {PRODUCT_NAMES_URI}")
+                result = await self.session.read_resource(PRODUCT_NAMES_URI)
+                if result.contents and len(result.contents) > 0 and hasattr(result.contents[0], 'text'):
+                    return json.loads(result.contents[0].text)
+                return {"error": "Could not retrieve product names."}
+        except asyncio.TimeoutError:
+            return {"error": "Timeout reading product names"}
+        except Exception as e:
+            logger.error(f"❌ Error reading product_names resource: {e}")
+            return {"error": str(e)}
+
     async def get_store_map_layout(self) -> Dict[str, Any]:
         """Get the store map layout resource."""
         if not self.session or not self.connected:
             return {"error": "Not connected to server"}
         try:
-            async with asyncio.timeout(10.0):
+            async with asyncio.timeout(self._budgeted(10.0)):
                 resource_name = "http://localhost/store_map_layout"
-                logger.info(f"📚 Reading resource: {resource_name}")
+                logger.debug(f"📚 Reading resource: {resource_name}")
                 result = await self.session.read_resource(resource_name)
                 if result.contents and len(result.contents) > 0 and hasattr(result.contents[0], 'text'):
                     return json.loads(result.contents[0].text)
@@ -285,22 +437,31 @@ class MCPConnector:
     
     _instance: Optional['MCPConnector'] = None
     _client: Optional[WalmartMCPClient] = None
-    _connection_lock = asyncio.Lock()
+    # Created on first use, not at import: a worker forked after import must not share
+    # the parent's lock (or inherit it while held).
+    _connection_lock: Optional[asyncio.Lock] = None
+    # Swappable for alternative transports (e.g. the in-process server used by benchmarks/)
+    client_factory = WalmartMCPClient
     
     def __init__(self):
         if MCPConnector._instance is not None:
             raise Exception("MCPConnector is a singleton class")
         MCPConnector._instance = self
+        # Kept here, not on the client: they carry over to the client of every reconnect.
+        self.change_listeners: List[ChangeListener] = []
     
     @classmethod
     async def get_instance(cls) -> 'MCPConnector':
         """Get or create the singleton instance with connection retry."""
+        if cls._connection_lock is None:
+            cls._connection_lock = asyncio.Lock()
         async with cls._connection_lock:
             if cls._instance is None:
                 cls._instance = MCPConnector()
             
             if cls._client is None or not cls._client.connected:
-                cls._client = WalmartMCPClient()
+                cls._client = cls.client_factory()
+                cls._client.change_listeners = cls._instance.change_listeners
                 
                 # Try to connect with retries
                 max_retries = 3
@@ -319,6 +480,31 @@ class MCPConnector:
             
             return cls._instance
     
+    @classmethod
+    def instance(cls) -> 'MCPConnector':
+        """The singleton without connecting, so the agent can be built while get_instance() connects.
+
+        Call it on the event loop, like get_instance(): creation is not locked.
+        """
+        if cls._instance is None:
+            cls._instance = MCPConnector()
+        return cls._instance
+
+    @classmethod
+    def _reset_after_fork(cls):
+        """The parent's MCP session belongs to its event loop; a forked worker connects on its own."""
+        cls._instance = None
+        cls._client = None
+        cls._connection_lock = None
+
+    def add_change_listener(self, listener: ChangeListener):
+        """Call `listener(uri)` for every catalog change notification, and with None after each (re)subscribe."""
+        self.change_listeners.append(listener)
+
+    @property
+    def notifications_live(self) -> bool:
+        return self._client is not None and self._client.notifications_live
+
     async def health_check(self) -> Dict[str, Any]:
         """Check the health of the MCP connection."""
         if not self._client:
@@ -378,11 +564,53 @@ class MCPConnector:
             return {"error": "MCP client not initialized"}
         return await self._client.browse_products(category=category, max_price=max_price)
     
+    async def plan_budget_basket(self, budget: float, required: Optional[List[str]] = None, optional: Optional[List[str]] = None,
+                                 quantities: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        if not self._client: 
+            return {"error": "MCP client not initialized"}
+        return await self._client.plan_budget_basket(budget, required, optional, quantities)
+    
+    async def plan_pick_waves(self, orders: List[Dict[str, Any]], totes_per_cart: Optional[int] = None,
+                              max_units_per_cart: Optional[int] = None) -> Dict[str, Any]:
+        if not self._client: 
+            return {"error": "MCP client not initialized"}
+        return await self._client.plan_pick_waves(orders, totes_per_cart, max_units_per_cart)
+    
+    async def create_shopping_list(self, items: List[str]) -> Dict[str, Any]:
+        if not self._client: 
+            return {"error": "MCP client not initialized"}
+        return await self._client.create_shopping_list(items)
+
+    async def add_list_items(self, list_id: str, items: List[str]) -> Dict[str, Any]:
+        if not self._client: 
+            return {"error": "MCP client not initialized"}
+        return await self._client.add_list_items(list_id, items)
+
+    async def remove_list_items(self, list_id: str, items: List[str]) -> Dict[str, Any]:
+        if not self._client: 
+            return {"error": "MCP client not initialized"}
+        return await self._client.remove_list_items(list_id, items)
+
+    async def replace_list_item(self, list_id: str, old_item: str, new_item: str) -> Dict[str, Any]:
+        if not self._client: 
+            return {"error": "MCP client not initialized"}
+        return await self._client.replace_list_item(list_id, old_item, new_item)
+
+    async def get_shopping_list(self, list_id: str) -> Dict[str, Any]:
+        if not self._client: 
+            return {"error": "MCP client not initialized"}
+        return await self._client.get_shopping_list(list_id)
+
     async def get_product_catalog(self) -> Dict[str, Any]:
         if not self._client: 
             return {"error": "MCP client not initialized"}
         return await self._client.get_product_catalog()
 
+    async def get_product_names(self) -> Dict[str, Any]:
+        if not self._client: 
+            return {"error": "MCP client not initialized"}
+        return await self._client.get_product_names()
+
     async def get_store_map_layout(self) -> Dict[str, Any]:
         if not self._client: 
             return {"error": "MCP client not initialized"}
@@ -392,4 +620,6 @@ class MCPConnector:
         """Clean up the MCP connection."""
         if self._client:
             await self._client.disconnect()
-            self._client = None
\ No newline at end of file
+            self._client = None
+
+os.register_at_fork(after_in_child=MCPConnector._reset_after_fork)
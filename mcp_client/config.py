@@ -5,4 +5,80 @@ OLLAMA_MODEL = "llama3.1" # Your local model
 OLLAMA_BASE_URL = "http://localhost:11434"
 
 # The address of our standalone MCP server
-MCP_SERVER_HTTP_URL =  "http://localhost:5001/sse"
\ No newline at end of file
+MCP_SERVER_HTTP_URL =  "http://localhost:5001/sse"
+
+# Per-request deadline for /chat: shared by every LLM call and tool call of the request
+CHAT_DEADLINE_SECONDS = 45.0
+# How often /chat checks whether the browser has gone away
+DISCONNECT_POLL_INTERVAL = 0.5
+
+# Trim tool results to the fields the model needs before they go into the agent scratchpad
+COMPACT_OBSERVATIONS = True
+# Basket lines also carry how many to buy, what they cost and what they stand in for
+OBSERVATION_PRODUCT_FIELDS = ("name", "aisle", "section", "price", "stock",
+                              "requested", "quantity", "line_total", "required", "substitute_for")
+OBSERVATION_MAX_LIST_ITEMS = 15
+# Lists the model has to see in full (every stop of a route or basket) are never cut
+OBSERVATION_FULL_LISTS = ("optimized_path", "basket", "route")
+
+# Parallel fan-out of independent tool calls in one agent turn (multi_action tool)
+MAX_FANOUT_ACTIONS = 8
+MAX_PARALLEL_TOOLS = 4
+
+# Speculative find_item/get_item_stock lookups for products named in the message
+SPECULATIVE_PREFETCH = True
+PREFETCH_MAX_ITEMS = 5
+PREFETCH_TIMEOUT = 5.0
+# The prefetch matcher is rebuilt when product names change; if the server cannot send change
+# notifications, it is rebuilt when older than this
+PREFETCH_MATCHER_MAX_AGE = 300.0
+
+# Conversation sessions: follow-up turns reuse the last list, resolved products and route
+SESSION_MAX_SESSIONS = 1000
+SESSION_TTL_SECONDS = 30 * 60
+SESSION_MAX_PRODUCTS = 200
+
+# Fraction of /chat requests logged per request: receipt, agent usage, prefetch hits and
+# the full response payload (0 = never, 1 = always)
+CHAT_PAYLOAD_LOG_SAMPLE_RATE = 0.0
+
+# Inventory feeds: POST /admin/ingest on the MCP server only reads files from this directory
+INVENTORY_FEED_DIR = "feeds"
+INGEST_BATCH_SIZE = 1000
+
+# Multi-worker deployments: when set, the MCP server memory-maps this compiled catalog
+# snapshot (python -m store.snapshot compile <path>) instead of building its own, and
+# picks up newer published versions within CATALOG_SNAPSHOT_POLL_SECONDS
+CATALOG_SNAPSHOT_PATH = None
+CATALOG_SNAPSHOT_POLL_SECONDS = 1.0
+
+# Resource change notifications: the server coalesces catalog changes and notifies subscribers
+# once per interval; above CHANGE_NOTIFY_MAX_PRODUCTS changed products it sends one catch-all update
+CHANGE_NOTIFY_INTERVAL = 0.25
+CHANGE_NOTIFY_MAX_PRODUCTS = 500
+# Client-side cache of read-only tool results, kept fresh by those notifications
+CACHE_TOOL_RESULTS = True
+TOOL_RESULT_CACHE_SIZE = 2000
+
+# Out-of-stock substitutes: ranked alternatives kept per product, SUBSTITUTE_LIMIT in-stock
+# ones returned inline; catalogs up to SUBSTITUTE_PRECOMPUTE_MAX products are ranked at startup
+SUBSTITUTE_TABLE_SIZE = 8
+SUBSTITUTE_LIMIT = 3
+SUBSTITUTE_PRECOMPUTE_MAX = 20000
+
+# Order picking waves: one cart carries PICK_CART_TOTES orders (one tote each) and up to
+# PICK_CART_MAX_UNITS items; plan_pick_waves accepts up to PICK_MAX_ORDERS orders per call
+PICK_CART_TOTES = 8
+PICK_CART_MAX_UNITS = 120
+PICK_MAX_ORDERS = 1000
+
+# Cold start: the API imports the agent and MCP stacks on startup, not at import, and with
+# FAST_STARTUP connects to MCP while the agent is built. LLM_WARMUP then loads the model with a
+# one-token generation over the agent prompt; Ollama keeps it loaded for LLM_KEEP_ALIVE
+# after each request
+FAST_STARTUP = True
+LLM_WARMUP = True
+# Ollama may still be starting: retry with 1, 2, 4... second pauses, then report the warm-up
+# as degraded on /ready instead of holding readiness back
+LLM_WARMUP_ATTEMPTS = 5
+LLM_KEEP_ALIVE = "30m"
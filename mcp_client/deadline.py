@@ -0,0 +1,60 @@
+# FILE: mcp_client/deadline.py
+# Per-request deadline budget shared by the API, the agent and the MCP client.
+
+import time
+from contextvars import ContextVar
+from typing import Dict, Any, Optional
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request has used up its deadline budget."""
+
+
+class Deadline:
+    """A shrinking time budget for one /chat request, with a record of where it was spent."""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.started_at = time.monotonic()
+        self.spent: Dict[str, float] = {}
+        self.cancelled_reason: Optional[str] = None
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def remaining(self) -> float:
+        return max(0.0, self.budget - self.elapsed())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def clamp(self, timeout: float) -> float:
+        """Shrink a per-call timeout so it never outlives the request deadline."""
+        return max(0.0, min(timeout, self.remaining()))
+
+    def record(self, phase: str, seconds: float):
+        """Add time spent in a phase (e.g. 'llm', 'tool:find_item')."""
+        self.spent[phase] = self.spent.get(phase, 0.0) + seconds
+
+    def cancel(self, reason: str):
+        self.cancelled_reason = reason
+
+    def report(self) -> Dict[str, Any]:
+        """Summarize where the budget went, for logging and the /chat response."""
+        elapsed = self.elapsed()
+        accounted = sum(self.spent.values())
+        return {
+            "budget_s": round(self.budget, 3),
+            "elapsed_s": round(elapsed, 3),
+            "remaining_s": round(self.remaining(), 3),
+            "spent_s": {phase: round(seconds, 3) for phase, seconds in self.spent.items()},
+            "unaccounted_s": round(max(0.0, elapsed - accounted), 3),
+            "expired": self.expired,
+            "cancelled": self.cancelled_reason,
+        }
+
+
+# The deadline of the request currently being served. asyncio tasks copy the
+# context when created, so tool coroutines spawned by the agent see it too.
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
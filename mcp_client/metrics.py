@@ -0,0 +1,153 @@
+# FILE: mcp_client/metrics.py
+# Minimal in-process metrics (counters and latency histograms) rendered in Prometheus text format.
+# Shared by the API process and the MCP server process; each process has its own REGISTRY.
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, seconds: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] += seconds
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observe the wall-clock duration of the enclosed block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key in sorted(self._counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets, self._counts[key]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', f'{bound:g}'))} {cumulative}")
+                cumulative += self._counts[key][-1]
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', '+Inf'))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {self._sums[key]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Holds the metrics of one process. Declaring a metric twice returns the existing one."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, label_names)
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, label_names, buckets)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Metrics shared across the API process ---
+MCP_TOOL_CALL_SECONDS = REGISTRY.histogram("wallaby_mcp_tool_call_seconds", "Client-side latency of MCP tool calls.", ["tool"])
+MCP_RECONNECTS = REGISTRY.counter("wallaby_mcp_reconnects_total", "Reconnections to the MCP server after a lost connection.")
+TIMEOUTS = REGISTRY.counter("wallaby_timeouts_total", "Timeouts by kind (tool, connect, chat).", ["kind"])
+CACHE_LOOKUPS = REGISTRY.counter("wallaby_cache_lookups_total", "Cache lookups by cache and result (hit/miss).", ["cache", "result"])
+LLM_CALL_SECONDS = REGISTRY.histogram("wallaby_llm_call_seconds", "Latency of individual LLM calls.")
+CHAT_REQUEST_SECONDS = REGISTRY.histogram("wallaby_chat_request_seconds", "End-to-end latency of /chat requests.", ["outcome"])
+STARTUP_PHASE_SECONDS = REGISTRY.histogram("wallaby_startup_phase_seconds", "Duration of each API startup phase.", ["phase"])
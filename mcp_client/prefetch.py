@@ -0,0 +1,137 @@
+# FILE: mcp_client/prefetch.py
+# Speculative tool prefetch: look up obvious products while the LLM is still thinking.
+
+import asyncio
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple
+
+from .deadline import current_deadline
+
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "buy", "can", "do", "does", "find", "for", "get",
+    "have", "how", "i", "in", "is", "it", "me", "much", "my", "need", "of", "or",
+    "some", "the", "to", "what", "where", "which", "with", "you", "your",
+}
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def normalize_item_name(item_name: str) -> str:
+    """Normalize a tool argument so prefetched and requested lookups compare equal."""
+    return " ".join(_words(item_name))
+
+
+class CatalogMatcher:
+    """Fast local matcher that spots catalog products mentioned in a chat message.
+
+    Lookups are O(words in the message): phrases are matched longest-first against
+    catalog keys, and a single leftover word is accepted only when it names exactly
+    one product.
+    """
+
+    def __init__(self, names: Dict[str, str]):
+        self.names: Dict[str, str] = dict(names) # catalog key -> product name
+        self.phrases: Dict[str, str] = {}
+        self.word_index: Dict[str, set] = {}
+        for key, name in names.items():
+            self.phrases[normalize_item_name(key)] = key
+            for word in set(_words(key)) | set(_words(name)):
+                if word not in STOPWORDS and not word.isdigit() and len(word) > 2:
+                    self.word_index.setdefault(word, set()).add(key)
+
+    def _lookup(self, phrase: str, single_word: bool) -> Optional[str]:
+        variants = [phrase, phrase + "s"]
+        if phrase.endswith("s"):
+            variants.append(phrase[:-1])
+        for variant in variants:
+            if variant in self.phrases:
+                return self.phrases[variant]
+        if single_word and phrase not in STOPWORDS:
+            for variant in variants:
+                keys = self.word_index.get(variant)
+                if keys and len(keys) == 1:
+                    return next(iter(keys))
+        return None
+
+    def extract(self, message: str, limit: int) -> List[str]:
+        """Return up to `limit` catalog keys mentioned in the message, in order of mention."""
+        words = _words(message)
+        found: List[str] = []
+        i = 0
+        while i < len(words) and len(found) < limit:
+            for n in (3, 2, 1):
+                if i + n > len(words):
+                    continue
+                key = self._lookup(" ".join(words[i:i + n]), single_word=(n == 1))
+                if key:
+                    if key not in found:
+                        found.append(key)
+                    i += n
+                    break
+            else:
+                i += 1
+        return found
+
+
+class Prefetcher:
+    """Per-request table of speculative tool calls, keyed by (tool, normalized argument)."""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._hits: set = set()
+        self.started_at = time.monotonic()
+
+    def start(self, tool: str, item_name: str, coroutine_factory, aliases: List[str] = ()):
+        """Fire a lookup in the background; `aliases` are other names it should answer for."""
+        task = asyncio.create_task(self._run(coroutine_factory))
+        for name in [item_name, *aliases]:
+            self._tasks.setdefault((tool, normalize_item_name(name)), task)
+
+    async def _run(self, coroutine_factory) -> Dict[str, Any]:
+        # Speculative work must not be charged to (or clamped by) the request deadline;
+        # it is cancelled with the request instead.
+        current_deadline.set(None)
+        async with asyncio.timeout(self.timeout):
+            return await coroutine_factory()
+
+    async def take(self, tool: str, item_name: str) -> Optional[Dict[str, Any]]:
+        """Return the prefetched result for this call, or None if there is no usable one."""
+        key = (tool, normalize_item_name(item_name))
+        task = self._tasks.get(key)
+        if task is None:
+            return None
+        try:
+            result = await asyncio.shield(task)
+        except (Exception, asyncio.CancelledError) as e:
+            if isinstance(e, asyncio.CancelledError) and not task.cancelled():
+                raise  # our caller is being cancelled, not the prefetch
+            return None
+        if "error" in result:
+            return None
+        self._hits.add(id(task))
+        return result
+
+    def cancel_pending(self):
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+
+    def report(self) -> Dict[str, Any]:
+        tasks = {id(task): task for task in self._tasks.values()}
+        issued = len(tasks)
+        hits = len(self._hits)
+        return {
+            "issued": issued,
+            "hits": hits,
+            "wasted": issued - hits,
+            "hit_ratio": round(hits / issued, 3) if issued else None,
+        }
+
+
+# The prefetch table of the request currently being served.
+current_prefetch: ContextVar[Optional[Prefetcher]] = ContextVar("current_prefetch", default=None)
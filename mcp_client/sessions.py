@@ -0,0 +1,157 @@
+# FILE: mcp_client/sessions.py
+# Memory-bounded conversation session store so follow-up turns can reuse earlier tool results.
+
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple
+
+from .cache import PRODUCT_NAMES_URI, PRODUCT_URI_PREFIX
+from .prefetch import normalize_item_name
+
+# Only these product fields are kept per session; enough for the UI and follow-up questions.
+SESSION_PRODUCT_FIELDS = ("id", "name", "aisle", "section", "price", "stock")
+
+
+def compact_product(product: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: product[key] for key in SESSION_PRODUCT_FIELDS if key in product}
+
+
+class CatalogVersions:
+    """Catalog change notifications, counted so sessions can tell which remembered products are stale.
+
+    A product update bumps that product's version; a product_names update (products
+    added, removed or renamed, or too many changes to list) or a resubscribe bumps the
+    epoch, which makes every earlier product stale.
+    """
+
+    def __init__(self):
+        self.epoch = 0
+        self._products: Dict[str, int] = {}
+
+    def stamp(self, product_id: Any) -> Tuple[int, int]:
+        return self.epoch, self._products.get(str(product_id), 0)
+
+    def on_change(self, uri: Optional[str]):
+        """MCPConnector change listener."""
+        if uri is not None and uri.startswith(PRODUCT_URI_PREFIX):
+            product_id = uri[len(PRODUCT_URI_PREFIX):]
+            self._products[product_id] = self._products.get(product_id, 0) + 1
+        elif uri is None or uri == PRODUCT_NAMES_URI:
+            self.epoch += 1
+            self._products.clear()
+
+
+class SessionState:
+    """Compact per-conversation state: the last shopping list, resolved products and route."""
+
+    def __init__(self, session_id: str, max_products: int, versions: Optional[CatalogVersions] = None):
+        self.session_id = session_id
+        self.max_products = max_products
+        self.versions = versions
+        self.last_shopping_list: List[str] = []
+        self.list_id: Optional[str] = None  # server-side handle for the last list, once it has been edited
+        self.route: List[Dict[str, Any]] = []
+        self.suggestions: List[str] = []
+        # Normalized requested name -> product; oldest entries are dropped past max_products.
+        self.resolved_products: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._stamps: Dict[str, Tuple[int, int]] = {} # normalized name -> catalog version when remembered
+        self.turns = 0
+        self.touched_at = time.monotonic()
+
+    def resolve(self, item_name: str) -> Optional[Dict[str, Any]]:
+        """The product remembered for this name, unless the catalog has changed it since."""
+        key = normalize_item_name(item_name)
+        product = self.resolved_products.get(key)
+        if product is None:
+            return None
+        if self.versions is not None and self._stamps.get(key) != self.versions.stamp(product.get("id")):
+            del self.resolved_products[key]
+            self._stamps.pop(key, None)
+            return None
+        self.resolved_products.move_to_end(key)
+        return product
+
+    def remember_product(self, item_name: str, product: Dict[str, Any]):
+        key = normalize_item_name(item_name)
+        self.resolved_products[key] = compact_product(product)
+        self.resolved_products.move_to_end(key)
+        if self.versions is not None:
+            self._stamps[key] = self.versions.stamp(product.get("id"))
+        while len(self.resolved_products) > self.max_products:
+            dropped, _ = self.resolved_products.popitem(last=False)
+            self._stamps.pop(dropped, None)
+
+    def remember_list(self, items: List[str], route: List[Dict[str, Any]], suggestions: List[str],
+                      list_id: Optional[str] = None):
+        self.last_shopping_list = list(items)
+        self.route = [compact_product(product) for product in route]
+        self.suggestions = list(suggestions)
+        self.list_id = list_id
+
+    def update_list(self, items: List[str], removed: List[Dict[str, Any]], added: List[Dict[str, Any]],
+                    suggestions: List[str]):
+        """Patch the remembered route with the changes a list handle reported, one unit per quantity."""
+        route = list(self.route)
+        for change in removed:
+            if "product" in change:
+                product_id = change["product"].get("id")
+                for _ in range(change.get("quantity", 1)):
+                    position = next((i for i, product in enumerate(route) if product.get("id") == product_id), None)
+                    if position is not None:
+                        del route[position]
+        route.extend(compact_product(change["product"]) for change in added if "product" in change)
+        route.sort(key=lambda product: product['aisle'])
+        self.last_shopping_list = list(items)
+        self.route = route
+        self.suggestions = list(suggestions)
+
+    def describe(self) -> str:
+        """Short text summary of the conversation state for the agent prompt."""
+        if not self.route:
+            return "No earlier shopping list in this conversation."
+        lines = [f"Last shopping list: {', '.join(self.last_shopping_list)}", "Items found (in route order):"]
+        for position, product in enumerate(self.route, start=1):
+            lines.append(f"{position}. {product['name']} - ${product['price']:.2f}, Aisle {product['aisle']}")
+        return "\n".join(lines)
+
+
+class SessionStore:
+    """LRU + TTL bounded store of SessionState objects, keyed by session ID."""
+
+    def __init__(self, max_sessions: int, ttl_seconds: float, max_products_per_session: int):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_products_per_session = max_products_per_session
+        self.versions = CatalogVersions()
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get_or_create(self, session_id: Optional[str] = None) -> SessionState:
+        """Return the live session for this ID, or start a new one (with a fresh ID if none was given)."""
+        self._evict_expired()
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            session = SessionState(session_id or uuid.uuid4().hex, self.max_products_per_session, self.versions)
+            self._sessions[session.session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session.session_id)
+        session.touched_at = time.monotonic()
+        return session
+
+    def _evict_expired(self):
+        # Sessions are kept in last-used order, so expired ones are at the front.
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.touched_at >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+
+
+# The conversation session of the request currently being served.
+current_session: ContextVar[Optional[SessionState]] = ContextVar("current_session", default=None)
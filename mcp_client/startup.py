@@ -0,0 +1,72 @@
+# FILE: mcp_client/startup.py
+# Startup phase bookkeeping for the API lifespan: which phases have finished,
+# how long each took, and whether the server can take /chat traffic yet.
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, Optional
+
+from .metrics import STARTUP_PHASE_SECONDS
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+# Finished without doing its job, but not worth holding readiness back for (e.g. no LLM warm-up)
+SKIPPED, DEGRADED = "skipped", "degraded"
+FINISHED = (DONE, SKIPPED, DEGRADED)
+
+
+class StartupTracker:
+    """Status and timing of named startup phases; `ready` once every required phase has finished."""
+
+    def __init__(self, phases: Iterable[str], required: Iterable[str]):
+        self.started = time.monotonic()
+        self.required = set(required)
+        self.phases: Dict[str, Dict[str, Any]] = {name: {"status": PENDING} for name in phases}
+        self.ready_seconds: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as phase `name`; an exception marks it failed and propagates.
+
+        The block may set the yielded entry's status to DEGRADED instead of raising.
+        """
+        entry = self.phases.setdefault(name, {"status": PENDING})
+        began = time.monotonic()
+        entry.update(status=RUNNING, started_at=round(began - self.started, 3))
+        try:
+            yield entry
+        except BaseException as e:
+            entry.update(status=FAILED, error=str(e) or type(e).__name__)
+            raise
+        else:
+            if entry["status"] == RUNNING:
+                entry["status"] = DONE
+            self._check_ready()
+        finally:
+            entry["seconds"] = round(time.monotonic() - began, 3)
+            STARTUP_PHASE_SECONDS.observe(entry["seconds"], phase=name)
+
+    def skip(self, name: str, reason: str):
+        self.phases[name] = {"status": SKIPPED, "reason": reason}
+        self._check_ready()
+
+    def _check_ready(self):
+        if self.ready_seconds is None and self.ready:
+            self.ready_seconds = round(time.monotonic() - self.started, 3)
+
+    @property
+    def ready(self) -> bool:
+        return all(self.phases.get(name, {}).get("status") in FINISHED for name in self.required)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "ready_after_seconds": self.ready_seconds,
+            "degraded": [name for name, entry in self.phases.items() if entry["status"] == DEGRADED],
+            "uptime_seconds": round(time.monotonic() - self.started, 3),
+            "phases": self.phases,
+        }
+
+    def summary(self) -> str:
+        parts = [f"{name} {entry['seconds']:.2f}s" if "seconds" in entry else f"{name} {entry['status']}"
+                 for name, entry in self.phases.items()]
+        return ", ".join(parts)
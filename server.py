@@ -2,34 +2,147 @@
 # MCP Server using Anthropic's FastMCP SDK
 
 from fastmcp import FastMCP
-from typing import List, Dict, Any, Optional
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from typing import List, Dict, Any, Optional, Set, Tuple
+import asyncio
+import functools
 import json
+import os
+import threading
+import weakref
+from pydantic import AnyUrl
 
 # Import your store data
 from mcp_client.data import STORE_DATABASE
+from mcp_client.config import INVENTORY_FEED_DIR, INGEST_BATCH_SIZE, CATALOG_SNAPSHOT_PATH, CATALOG_SNAPSHOT_POLL_SECONDS
+from mcp_client.config import CHANGE_NOTIFY_INTERVAL, CHANGE_NOTIFY_MAX_PRODUCTS
+from mcp_client.config import SUBSTITUTE_TABLE_SIZE, SUBSTITUTE_LIMIT, SUBSTITUTE_PRECOMPUTE_MAX
+from mcp_client.config import PICK_CART_TOTES, PICK_CART_MAX_UNITS, PICK_MAX_ORDERS
+from mcp_client.metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE
+from store.basket import plan_basket
+from store.catalog import Catalog, CatalogReader, add_catalog_listener, current_catalog, refresh_catalog, swap_catalog
+from store.changes import ChangeFeed
+from store.ingest import ingest
+from store.snapshot import follow_snapshot, publish_snapshot
+from store.lists import ShoppingListStore
+from store.picking import PickOrder, StoreDistanceModel, plan_waves
+from store.substitutes import SubstituteTable
 
 # Create the MCP server instance
 mcp = FastMCP("Walmart Store Assistant")
 
-def fuzzy_search_product(item_name: str) -> Dict[str, Any] | None:
-    """Search for a product using fuzzy matching."""
-    item_lower = item_name.lower().strip()
-    
-    if item_lower in STORE_DATABASE['products']:
-        return STORE_DATABASE['products'][item_lower]
+# The live catalog starts from the bundled data; inventory feeds replace or update it (see /admin/ingest).
+# Tools call current_catalog() once per call so a concurrent snapshot swap never splits a result.
+# With CATALOG_SNAPSHOT_PATH set, every worker maps the same compiled snapshot file instead.
+if CATALOG_SNAPSHOT_PATH:
+    if not os.path.exists(CATALOG_SNAPSHOT_PATH):
+        publish_snapshot(Catalog.from_store(STORE_DATABASE), CATALOG_SNAPSHOT_PATH)
+    follow_snapshot(CATALOG_SNAPSHOT_PATH, CATALOG_SNAPSHOT_POLL_SECONDS)
+else:
+    swap_catalog(Catalog.from_store(STORE_DATABASE))
 
-    for key, product in STORE_DATABASE['products'].items():
-        product_name_lower = product['name'].lower()
-        if item_lower in product_name_lower or product_name_lower in item_lower:
-            return product
-        
-        query_words = set(item_lower.split())
-        product_words = set(product_name_lower.split())
-        
-        if query_words.intersection(product_words):
-            return product
+# Shopping list handles for incremental edits (see create_shopping_list)
+def _live_product(product: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The catalog's current version of a product on a list, so totals use today's prices."""
+    catalog = current_catalog()
+    key = catalog.key_for_id(product['id'])
+    return catalog.get(key) if key is not None else None
+
+SHOPPING_LISTS = ShoppingListStore(STORE_DATABASE['meal_suggestions'], _live_product)
+
+def _on_catalog_change_lists(key: Optional[str], old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+    SHOPPING_LISTS.on_catalog_change(key, old, new)
+
+add_catalog_listener(_on_catalog_change_lists)
+
+# Ranked alternatives for out-of-stock items, returned inline by find_item, get_item_stock
+# and process_shopping_list so the agent does not have to go browsing for them.
+SUBSTITUTES = SubstituteTable(SUBSTITUTE_TABLE_SIZE)
+SUBSTITUTE_PRECOMPUTE: Optional[threading.Thread] = None # the latest background fill, if any
+
+def _precompute_substitutes():
+    global SUBSTITUTE_PRECOMPUTE
+    catalog = current_catalog()
+    if len(catalog) <= SUBSTITUTE_PRECOMPUTE_MAX:
+        # Larger catalogs fill the table on demand instead.
+        SUBSTITUTE_PRECOMPUTE = threading.Thread(target=SUBSTITUTES.precompute, args=(catalog,), name="substitutes", daemon=True)
+        SUBSTITUTE_PRECOMPUTE.start()
+
+def _on_catalog_change_substitutes(key: Optional[str], old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+    SUBSTITUTES.on_catalog_change(current_catalog(), key, old, new)
+    if key is None:
+        _precompute_substitutes()
+
+add_catalog_listener(_on_catalog_change_substitutes)
+_precompute_substitutes()
+
+def substitutes_for(product: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """In-stock alternatives for an out-of-stock product (empty when it is in stock)."""
+    if product['stock'] > 0:
+        return []
+    return SUBSTITUTES.substitutes(current_catalog(), product, SUBSTITUTE_LIMIT)
+
+def _substitute_hint(substitutes: List[Dict[str, Any]]) -> str:
+    if not substitutes:
+        return ""
+    names = ", ".join(f"{s['name']} (Aisle {s['aisle']}, ${s['price']:.2f})" for s in substitutes)
+    return f" It is out of stock; in-stock alternatives: {names}."
+
+TOOL_SECONDS = REGISTRY.histogram("wallaby_server_tool_seconds", "Server-side execution time of MCP tools.", ["tool"])
+TOOL_ERRORS = REGISTRY.counter("wallaby_server_tool_errors_total", "MCP tool calls that raised.", ["tool"])
+
+def timed_tool(func):
+    """Record the tool's execution time in TOOL_SECONDS. Apply below @mcp.tool()."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with TOOL_SECONDS.time(tool=func.__name__):
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                TOOL_ERRORS.inc(tool=func.__name__)
+                raise
+    return wrapper
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> PlainTextResponse:
+    """Prometheus metrics for the MCP server."""
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
 
-    return None
+def _ingest_and_publish(kind: str, path: str):
+    stats = ingest(kind, path, INGEST_BATCH_SIZE)
+    if CATALOG_SNAPSHOT_PATH and stats.applied:
+        # Publish the new version for the other workers, and map it here too.
+        swap_catalog(publish_snapshot(current_catalog(), CATALOG_SNAPSHOT_PATH))
+    return stats
+
+@mcp.custom_route("/admin/ingest", methods=["POST"])
+async def admin_ingest(request: Request) -> JSONResponse:
+    """Ingest an inventory feed from INVENTORY_FEED_DIR. Body: {"kind": "snapshot"|"deltas", "file": "<name>"}."""
+    try:
+        body = await request.json()
+        kind, file_name = body["kind"], body["file"]
+    except (ValueError, KeyError, TypeError):
+        return JSONResponse({"error": "expected JSON body with 'kind' and 'file'"}, status_code=400)
+
+    feed_dir = os.path.realpath(INVENTORY_FEED_DIR)
+    path = os.path.realpath(os.path.join(feed_dir, str(file_name)))
+    if os.path.commonpath([feed_dir, path]) != feed_dir or not os.path.isfile(path):
+        return JSONResponse({"error": f"no feed '{file_name}' in the inventory feed directory"}, status_code=404)
+
+    try:
+        # Parsing and index updates are CPU-bound; keep the event loop serving tool calls.
+        stats = await asyncio.to_thread(_ingest_and_publish, kind, path)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    report = stats.report()
+    print(f"📦 Ingested {report['kind']} '{file_name}': {report['applied']} applied, "
+          f"{report['rejected']} rejected, {report['rows_per_s']} rows/s")
+    return JSONResponse(report)
+
+def fuzzy_search_product(item_name: str) -> Dict[str, Any] | None:
+    """Search for a product using fuzzy matching."""
+    return current_catalog().search(item_name)
 
 ### ENHANCEMENT: This function is now smarter.
 def get_shopping_suggestions(items: List[str]) -> Dict[str, Any]:
@@ -37,7 +150,7 @@ def get_shopping_suggestions(items: List[str]) -> Dict[str, Any]:
     results = {"suggestions": [], "missing_items": {}}
     item_names_lower = [item.lower() for item in items]
     
-    for suggestion_rule in STORE_DATABASE['meal_suggestions']:
+    for suggestion_rule in current_catalog().meal_suggestions:
         trigger_items = [t.lower() for t in suggestion_rule['trigger_items']]
         
         present_triggers = [t for t in trigger_items if any(t in user_item for user_item in item_names_lower)]
@@ -56,6 +169,7 @@ def get_shopping_suggestions(items: List[str]) -> Dict[str, Any]:
 
 ### CRITICAL FIX: The tool name typo is corrected here.
 @mcp.tool()
+@timed_tool
 def find_item(item_name: str) -> Dict[str, Any]:
     """Find a specific item in the store and return its location and details (price, stock)."""
     product = fuzzy_search_product(item_name)
@@ -63,23 +177,30 @@ def find_item(item_name: str) -> Dict[str, Any]:
     if not product:
         return { "found": False, "message": f"Sorry, I couldn't find '{item_name}' in our store inventory." }
     
-    aisle_name = STORE_DATABASE['aisle_layout'].get(str(product['aisle']), f"Aisle {product['aisle']}")
+    aisle_name = current_catalog().aisle_layout.get(str(product['aisle']), f"Aisle {product['aisle']}")
     stock_status = "Low stock" if product['stock'] < 10 else "In stock"
     if product['stock'] == 0:
         stock_status = "Out of stock"
+    substitutes = substitutes_for(product)
     
-    return {
+    result = {
         "found": True,
         "item": product,
         "location": f"Aisle {product['aisle']} ({aisle_name}), Section {product['section']}",
         "stock_status": stock_status,
-        "message": f"Found '{product['name']}' in {aisle_name} (Aisle {product['aisle']}), Section {product['section']}. Price: ${product['price']:.2f}"
+        "message": f"Found '{product['name']}' in {aisle_name} (Aisle {product['aisle']}), Section {product['section']}. Price: ${product['price']:.2f}" + _substitute_hint(substitutes)
     }
+    if substitutes:
+        result["substitutes"] = substitutes
+    return result
 
 @mcp.tool()
+@timed_tool
 def process_shopping_list(items: List[str]) -> Dict[str, Any]:
     """Process a shopping list and return optimized path through the store, estimated total cost, and suggestions."""
     found_items, not_found_items = [], []
+    resolved = {}
+    substitutes = {} # requested name -> in-stock alternatives, for items that are out of stock
     
     for item_name in items:
         # Prevent processing of instructional text from the agent
@@ -90,6 +211,10 @@ def process_shopping_list(items: List[str]) -> Dict[str, Any]:
         product = fuzzy_search_product(item_name)
         if product:
             found_items.append(product)
+            resolved[item_name] = product['id']
+            alternatives = substitutes_for(product)
+            if alternatives:
+                substitutes[item_name] = alternatives
         else:
             not_found_items.append(item_name)
     
@@ -99,75 +224,173 @@ def process_shopping_list(items: List[str]) -> Dict[str, Any]:
     
     suggestion_results = get_shopping_suggestions([item['name'] for item in found_items])
     
-    return {
+    result = {
         "optimized_path": optimized_path,
         "items_found": len(found_items),
         "items_not_found": not_found_items,
+        "resolved": resolved, # requested name -> product id, lets clients reuse matches
         "aisles_to_visit": unique_aisles,
         "total_estimated_cost": round(total_cost, 2),
         "smart_suggestions": suggestion_results.get("suggestions", []),
         "summary": f"Found {len(found_items)} items across {len(unique_aisles)} aisles. Estimated total: ${total_cost:.2f}"
     }
+    if substitutes:
+        result["substitutes"] = substitutes
+    return result
 
 @mcp.tool()
+@timed_tool
 def get_aisle_info(aisle_number: int) -> Dict[str, Any]:
     """Get information about what products are in a specific aisle."""
-    if str(aisle_number) not in STORE_DATABASE['aisle_layout']:
+    catalog = current_catalog()
+    if str(aisle_number) not in catalog.aisle_layout:
         return {"error": f"Aisle {aisle_number} does not exist."}
     
-    aisle_products = [p for p in STORE_DATABASE['products'].values() if p['aisle'] == aisle_number]
-    aisle_name = STORE_DATABASE['aisle_layout'][str(aisle_number)]
+    aisle_products = catalog.aisle_products(aisle_number) # already sorted by name
+    aisle_name = catalog.aisle_layout[str(aisle_number)]
     
     return {
         "aisle_number": aisle_number,
         "aisle_name": aisle_name,
-        "products": sorted(aisle_products, key=lambda x: x['name']),
+        "products": aisle_products,
         "total_products": len(aisle_products)
     }
 
 @mcp.tool()
+@timed_tool
 def get_store_layout() -> Dict[str, Any]:
     """Get the complete store layout and general information."""
+    catalog = current_catalog()
     return {
-        "store_id": STORE_DATABASE['store_id'],
-        "store_name": STORE_DATABASE['store_name'],
-        "aisle_layout": STORE_DATABASE['aisle_layout']
+        "store_id": catalog.store_id,
+        "store_name": catalog.store_name,
+        "aisle_layout": catalog.aisle_layout
     }
 
 ### *** NEW TOOL & FIX ***
 @mcp.tool()
+@timed_tool
 def browse_products(category: Optional[str] = None, max_price: Optional[float] = None) -> Dict[str, Any]:
     """Browse and filter all products by category (e.g., 'Fresh Produce') or a maximum price. Useful for budget or discovery queries."""
-    results = []
-    category_lower = category.lower() if category else None
-
-    for product in STORE_DATABASE['products'].values():
-        # Price filtering
-        if max_price is not None and product['price'] > max_price:
-            continue
-        
-        # Category filtering - ENHANCED LOGIC
-        if category_lower:
-            aisle_name = STORE_DATABASE['aisle_layout'].get(str(product['aisle']), "").lower()
-            product_name = product['name'].lower()
-            # Check if category is in the aisle OR in the product name
-            if category_lower not in aisle_name and category_lower not in product_name:
-                continue
-        
-        results.append(product)
-
-    # Sort results by price, cheapest first
-    sorted_results = sorted(results, key=lambda x: x['price'])
+    # Category matches the aisle name OR the product name; results are cheapest first
+    count, cheapest = current_catalog().browse(category, max_price, limit=20) # at most 20 items to avoid overload
     
     return {
-        "count": len(sorted_results),
-        "products": sorted_results[:20], # Return at most 20 items to avoid overload
-        "message": f"Found {len(sorted_results)} items matching the criteria."
+        "count": count,
+        "products": cheapest,
+        "message": f"Found {count} items matching the criteria."
     }
 
+def _basket_product(catalog: CatalogReader, entry: str, max_price: float) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """The product to budget for: the item `entry` names (or its best in-stock substitute),
+    else the cheapest in-stock product in that category. Returns (product, reason if none)."""
+    product = catalog.search(entry)
+    if product is not None:
+        if product['stock'] > 0:
+            return product, None
+        alternatives = SUBSTITUTES.substitutes(catalog, product, 1)
+        if not alternatives:
+            return None, f"{product['name']} is out of stock"
+        return {**catalog.get(catalog.key_for_id(alternatives[0]['id'])), "substitute_for": product['name']}, None
+    _, cheapest = catalog.browse(entry, max_price, limit=20)
+    in_stock = next((candidate for candidate in cheapest if candidate['stock'] > 0), None)
+    return (in_stock, None) if in_stock else (None, "no matching product in stock within the budget")
+
+@mcp.tool()
+@timed_tool
+def plan_budget_basket(budget: float, required: Optional[List[str]] = None, optional: Optional[List[str]] = None,
+                       quantities: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """Build the best basket within a budget in one call. `required` items or categories (e.g. 'pasta', 'snacks') are always included; `optional` ones, most wanted first, are added as far as the budget allows. `quantities` maps an item or category to how many to buy (default 1). Returns the basket in route order with totals."""
+    if budget <= 0:
+        return {"error": "The budget must be greater than zero."}
+    if not required and not optional:
+        return {"error": "Name at least one required or optional item or category."}
+    catalog = current_catalog()
+    wanted = {name.lower().strip(): count for name, count in (quantities or {}).items()}
+    skipped: List[Dict[str, str]] = []
+
+    def resolve(entries: Optional[List[str]]) -> List[Tuple[str, Dict[str, Any], int]]:
+        resolved = []
+        for entry in entries or []:
+            if not entry.strip():
+                continue
+            product, reason = _basket_product(catalog, entry, budget)
+            if product is None:
+                skipped.append({"item": entry, "reason": reason})
+            else:
+                resolved.append((entry, product, max(1, int(wanted.get(entry.lower().strip(), 1)))))
+        return resolved
+
+    return plan_basket(budget, resolve(required), resolve(optional), skipped)
+
+# --- Order Picking ---
+PICKING_MODEL = StoreDistanceModel()
+
+def _pick_line(item: Any) -> Tuple[str, int]:
+    """An order line is "milk" or {"item": "milk", "quantity": 2}."""
+    if isinstance(item, dict):
+        name = item.get("item") or item.get("name") or ""
+        try:
+            quantity = int(item.get("quantity", 1))
+        except (TypeError, ValueError):
+            quantity = 1
+        return str(name), max(1, quantity)
+    return str(item), 1
+
+@mcp.tool()
+@timed_tool
+def plan_pick_waves(orders: List[Dict[str, Any]], totes_per_cart: int = PICK_CART_TOTES,
+                    max_units_per_cart: int = PICK_CART_MAX_UNITS) -> Dict[str, Any]:
+    """Plan picking for many online orders at once. Each order is {"order_id": "...", "items": ["milk", {"item": "eggs", "quantity": 2}]}. Orders are grouped into waves that fit one cart (totes_per_cart orders, max_units_per_cart units); each wave gets one walking route with the tote for every order's items."""
+    if totes_per_cart < 1 or max_units_per_cart < 1:
+        return {"error": "totes_per_cart and max_units_per_cart must be at least 1."}
+    if len(orders) > PICK_MAX_ORDERS:
+        return {"error": f"At most {PICK_MAX_ORDERS} orders can be planned in one call."}
+    # Totes, routes and the unavailable report are keyed by order id, so ids must be unique.
+    order_ids = [str(raw.get("order_id") or f"order-{number}") for number, raw in enumerate(orders, start=1)]
+    seen: Set[str] = set()
+    duplicates: Set[str] = set()
+    for order_id in order_ids:
+        (duplicates if order_id in seen else seen).add(order_id)
+    if duplicates:
+        return {"error": f"Each order needs its own order_id; repeated: {', '.join(sorted(duplicates)[:10])}."}
+    # A string would otherwise be picked one character at a time.
+    malformed = [order_id for order_id, raw in zip(order_ids, orders) if not isinstance(raw.get("items") or [], list)]
+    if malformed:
+        return {"error": f"Each order's items must be a list; not a list in: {', '.join(malformed[:10])}."}
+    catalog = current_catalog()
+    matches: Dict[str, Optional[Dict[str, Any]]] = {} # each distinct item name is searched once
+    left: Dict[str, int] = {} # product id -> stock not yet allocated to an earlier order
+
+    pick_orders = []
+    for order_id, raw in zip(order_ids, orders):
+        order = PickOrder(order_id)
+        for item in raw.get("items") or []:
+            name, quantity = _pick_line(item)
+            query = name.lower().strip()
+            if not query:
+                continue
+            if query not in matches:
+                matches[query] = catalog.search(query)
+            product = matches[query]
+            if product is None:
+                order.unavailable.append({"item": name, "reason": "not found"})
+                continue
+            available = left.setdefault(product['id'], product['stock'])
+            count = min(quantity, available)
+            if count < quantity:
+                order.unavailable.append({"item": name, "reason": "out of stock" if not count else f"only {count} of {quantity} available"})
+            if count:
+                left[product['id']] = available - count
+                order.add(product['id'], product, count)
+        pick_orders.append(order)
+
+    return plan_waves(pick_orders, PICKING_MODEL, totes_per_cart, max_units_per_cart)
+
 
 ### ENHANCEMENT: This tool now returns missing items.
 @mcp.tool()
+@timed_tool
 def get_meal_suggestions(items: List[str]) -> Dict[str, Any]:
     """Get meal suggestions based on a list of items. Can also suggest missing ingredients for a meal."""
     suggestion_results = get_shopping_suggestions(items)
@@ -183,11 +406,13 @@ def get_meal_suggestions(items: List[str]) -> Dict[str, Any]:
     }
 
 @mcp.tool()
+@timed_tool
 def report_out_of_stock(item_name: str) -> Dict[str, Any]:
     """Report an item as being out of stock. This helps the store update its inventory."""
     return { "status": "success", "message": f"Thank you for reporting that '{item_name}' is out of stock." }
 
 @mcp.tool()
+@timed_tool
 def get_item_stock(item_name: str) -> Dict[str, Any]:
     """Get the current stock quantity for a specific item."""
     product = fuzzy_search_product(item_name)
@@ -198,18 +423,156 @@ def get_item_stock(item_name: str) -> Dict[str, Any]:
     if product['stock'] == 0: stock_status = "Out of stock"
     elif product['stock'] < 10: stock_status = "Low stock"
 
-    return { "item_name": product['name'], "stock": product['stock'], "stock_status": stock_status }
+    result = { "item_name": product['name'], "product_id": product['id'], "stock": product['stock'], "stock_status": stock_status }
+    substitutes = substitutes_for(product)
+    if substitutes:
+        result["substitutes"] = substitutes
+    return result
+
+# --- Shopping List Handles ---
+# Edits cost O(change): only the changed items are searched, totals and the route
+# are patched in place, and only meal rules touched by those items are re-evaluated.
+def _unknown_list(list_id: str) -> Dict[str, Any]:
+    return {"error": f"Shopping list '{list_id}' does not exist or has expired."}
+
+@mcp.tool()
+@timed_tool
+def create_shopping_list(items: List[str]) -> Dict[str, Any]:
+    """Create a shopping list handle. Returns a list_id to use with add_list_items, remove_list_items and replace_list_item."""
+    state = SHOPPING_LISTS.create()
+    for item_name in items:
+        state.add(item_name, fuzzy_search_product)
+    return {**state.totals(), "optimized_path": state.optimized_path()}
+
+@mcp.tool()
+@timed_tool
+def add_list_items(list_id: str, items: List[str]) -> Dict[str, Any]:
+    """Add items to an existing shopping list. Returns the added items and updated totals."""
+    state = SHOPPING_LISTS.get(list_id)
+    if state is None:
+        return _unknown_list(list_id)
+    added = [state.add(item_name, fuzzy_search_product) for item_name in items]
+    return {**state.totals(), "added": added}
+
+@mcp.tool()
+@timed_tool
+def remove_list_items(list_id: str, items: List[str]) -> Dict[str, Any]:
+    """Remove items from an existing shopping list. Returns the removed items and updated totals."""
+    state = SHOPPING_LISTS.get(list_id)
+    if state is None:
+        return _unknown_list(list_id)
+    removed = [change for change in (state.remove(item_name) for item_name in items) if change]
+    return {**state.totals(), "removed": removed}
+
+@mcp.tool()
+@timed_tool
+def replace_list_item(list_id: str, old_item: str, new_item: str) -> Dict[str, Any]:
+    """Replace one item on an existing shopping list with another. Returns the change and updated totals."""
+    state = SHOPPING_LISTS.get(list_id)
+    if state is None:
+        return _unknown_list(list_id)
+    removed = state.remove(old_item)
+    if removed is None:
+        return {"error": f"'{old_item}' is not on shopping list '{list_id}'; nothing was replaced."}
+    added = state.add(new_item, fuzzy_search_product)
+    return {**state.totals(), "removed": [removed], "added": [added]}
+
+@mcp.tool()
+@timed_tool
+def get_shopping_list(list_id: str) -> Dict[str, Any]:
+    """Get the full state of a shopping list, including the optimized path through the store."""
+    state = SHOPPING_LISTS.get(list_id)
+    if state is None:
+        return _unknown_list(list_id)
+    return {**state.totals(), "optimized_path": state.optimized_path()}
 
 # --- Resources ---
 @mcp.resource("http://localhost/product_catalog")
 def product_catalog() -> Dict[str, Any]:
     """Provides the complete list of products available in the store."""
-    return STORE_DATABASE['products']
+    return current_catalog().copy_products()
 
 @mcp.resource("http://localhost/store_map_layout")
 def store_map_layout() -> Dict[str, Any]:
     """Provides the complete aisle layout of the store."""
-    return STORE_DATABASE['aisle_layout']
+    return current_catalog().aisle_layout
+
+@mcp.resource("http://localhost/product_names")
+def product_names() -> Dict[str, str]:
+    """Provides the name of every product, by key. Changes only when products are added, removed or renamed."""
+    return {key: product['name'] for key, product in current_catalog().copy_products().items()}
+
+@mcp.resource("http://localhost/products/{product_id}")
+def product_by_id(product_id: str) -> Dict[str, Any]:
+    """Provides one product, including its current stock and price."""
+    catalog = current_catalog()
+    key = catalog.key_for_id(product_id)
+    product = catalog.get(key) if key else None
+    if product is None:
+        return {"error": f"No product with id '{product_id}'."}
+    return {**product, "key": key}
+
+# --- Change Notifications ---
+# Clients subscribe (resources/subscribe) to the URIs above and get notifications/resources/updated
+# when they change, instead of polling. Changes are coalesced and sent once per CHANGE_NOTIFY_INTERVAL:
+#   product_catalog   - any product changed
+#   product_names     - products were added, removed or renamed (or the whole catalog was reloaded)
+#   store_map_layout  - the whole catalog was reloaded
+#   products/{id}     - that product changed; also sent to product_catalog subscribers
+CATALOG_URI = "http://localhost/product_catalog"
+PRODUCT_NAMES_URI = "http://localhost/product_names"
+LAYOUT_URI = "http://localhost/store_map_layout"
+PRODUCT_URI_PREFIX = "http://localhost/products/"
+
+RESOURCE_UPDATES = REGISTRY.counter("wallaby_server_resource_updates_total", "notifications/resources/updated sent to subscribers.")
+
+# session -> subscribed URIs; sessions drop out when their connection goes away
+SUBSCRIPTIONS: "weakref.WeakKeyDictionary[Any, Set[str]]" = weakref.WeakKeyDictionary()
+
+async def _deliver_changes(uris: Set[str]):
+    product_uris = {uri for uri in uris if uri.startswith(PRODUCT_URI_PREFIX)}
+    if len(product_uris) > CHANGE_NOTIFY_MAX_PRODUCTS:
+        # Too many to list one by one: a product_names update tells clients that
+        # everything they resolved by product is stale.
+        uris = (uris - product_uris) | {PRODUCT_NAMES_URI}
+        product_uris = set()
+    for session, subscribed in list(SUBSCRIPTIONS.items()):
+        targets = uris & subscribed
+        if CATALOG_URI in subscribed:
+            targets |= product_uris
+        try:
+            for uri in sorted(targets):
+                await session.send_resource_updated(AnyUrl(uri))
+                RESOURCE_UPDATES.inc()
+        except Exception:
+            SUBSCRIPTIONS.pop(session, None)
+
+# The feed loop also checks for a newly published snapshot (at most every
+# CATALOG_SNAPSHOT_POLL_SECONDS): nothing else would, while clients serve lookups from cache.
+CHANGE_FEED = ChangeFeed(CHANGE_NOTIFY_INTERVAL, _deliver_changes, poll=refresh_catalog)
+
+def _on_catalog_change(key: Optional[str], old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+    """Catalog listener; runs on the writing thread, so it only queues URIs."""
+    if not SUBSCRIPTIONS:
+        return
+    if key is None:
+        CHANGE_FEED.publish([CATALOG_URI, PRODUCT_NAMES_URI, LAYOUT_URI])
+        return
+    uris = [CATALOG_URI] + [PRODUCT_URI_PREFIX + product['id'] for product in (old, new) if product]
+    if old is None or new is None or old['name'] != new['name']:
+        uris.append(PRODUCT_NAMES_URI)
+    CHANGE_FEED.publish(uris)
+
+add_catalog_listener(_on_catalog_change)
+
+@mcp._mcp_server.subscribe_resource()
+async def subscribe_resource(uri: AnyUrl):
+    SUBSCRIPTIONS.setdefault(mcp._mcp_server.request_context.session, set()).add(str(uri))
+    CHANGE_FEED.start()
+
+@mcp._mcp_server.unsubscribe_resource()
+async def unsubscribe_resource(uri: AnyUrl):
+    SUBSCRIPTIONS.get(mcp._mcp_server.request_context.session, set()).discard(str(uri))
 
 if __name__ == "__main__":
     print("🏪 Starting MCP Server with SSE transport...")
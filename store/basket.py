@@ -0,0 +1,100 @@
+# FILE: store/basket.py
+# Budget basket selection: required lines always go in, optional lines are added
+# in priority order as far as the remaining budget allows.
+
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+MAX_OPTIONAL_LINES = 20
+MAX_QUANTITY = 12
+
+# (requested item or category, product, quantity wanted)
+BasketRequest = Tuple[str, Dict[str, Any], int]
+
+
+def to_cents(price: float) -> int:
+    return int(round(price * 100))
+
+
+def fill_in_order(options: Sequence[Tuple[int, int]], capacity: int) -> List[int]:
+    """Units to take of each (unit cost in cents, max units) option within `capacity` cents.
+
+    Options are in priority order and a unit of an earlier one is worth more than
+    any number of units of later ones, so the best choice is to take as many of
+    each as still fit, in order; a later, cheaper option still uses what is left.
+    """
+    chosen = []
+    for cost, units in options:
+        count = min(units, capacity // cost) if cost > 0 else units
+        capacity -= count * cost
+        chosen.append(count)
+    return chosen
+
+
+def _line(entry: str, product: Dict[str, Any], quantity: int, required: bool) -> Dict[str, Any]:
+    return {**product, "requested": entry, "quantity": quantity, "required": required,
+            "line_total": round(product['price'] * quantity, 2)}
+
+
+def plan_basket(budget: float, required: List[BasketRequest], optional: List[BasketRequest],
+                skipped: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+    """Pick quantities for the requested products within `budget`.
+
+    Required lines are taken in full (up to the stock on hand). Optional lines
+    are listed in priority order: an earlier line is filled as far as the budget
+    allows before any later one, and later lines use whatever is left.
+    """
+    skipped = list(skipped or [])
+    lines = []
+    for entry, product, quantity in required:
+        count = min(quantity, product['stock'])
+        if count < quantity:
+            skipped.append({"item": entry, "reason": f"only {count} in stock"})
+        if count:
+            lines.append(_line(entry, product, count, required=True))
+
+    budget_cents = to_cents(budget)
+    required_cents = sum(to_cents(line['price']) * line['quantity'] for line in lines)
+    within_budget = required_cents <= budget_cents
+
+    for entry, _, _ in optional[MAX_OPTIONAL_LINES:]:
+        skipped.append({"item": entry, "reason": f"only the first {MAX_OPTIONAL_LINES} optional items are considered"})
+    optional = optional[:MAX_OPTIONAL_LINES]
+    available = [min(quantity, product['stock'], MAX_QUANTITY) for _, product, quantity in optional]
+    if within_budget and optional:
+        options = [(to_cents(product['price']), units) for (_, product, _), units in zip(optional, available)]
+        chosen = fill_in_order(options, budget_cents - required_cents)
+    else:
+        chosen = [0] * len(optional)
+    for (entry, product, quantity), units, count in zip(optional, available, chosen):
+        if count:
+            lines.append(_line(entry, product, count, required=False))
+        if count < quantity:
+            if not within_budget:
+                reason = "the required items use up the budget"
+            elif count < units:
+                reason = "over budget"
+            elif units == product['stock']:
+                reason = f"only {units} in stock"
+            else:
+                reason = f"at most {MAX_QUANTITY} per item"
+            skipped.append({"item": entry, "reason": f"{reason}; {count} of {quantity} added" if count else reason})
+
+    lines.sort(key=lambda line: (line['aisle'], line['section'], line['name']))
+    total_cents = sum(to_cents(line['price']) * line['quantity'] for line in lines)
+    aisles = sorted({line['aisle'] for line in lines})
+    total = total_cents / 100
+    summary = (f"{sum(line['quantity'] for line in lines)} items for ${total:.2f} of a ${budget:.2f} budget "
+               f"across {len(aisles)} aisles.")
+    if not within_budget:
+        summary = f"The required items alone cost ${required_cents / 100:.2f}, over the ${budget:.2f} budget. " + summary
+    return {
+        "within_budget": within_budget,
+        "budget": round(budget, 2),
+        "basket": lines, # in route order
+        "total_cost": round(total, 2),
+        "remaining_budget": round((budget_cents - total_cents) / 100, 2),
+        "required_cost": round(required_cents / 100, 2),
+        "aisles_to_visit": aisles,
+        "skipped": skipped,
+        "summary": summary,
+    }
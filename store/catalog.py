@@ -0,0 +1,527 @@
+# FILE: store/catalog.py
+# In-memory product catalog with search and secondary indexes, and the atomically swapped current snapshot.
+
+import bisect
+import contextlib
+import heapq
+import logging
+import os
+import threading
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Product = Dict[str, Any]
+PRODUCT_FIELDS = ("id", "name", "aisle", "price", "stock", "section")
+INFINITY = float('inf')
+
+
+class CatalogReader:
+    """Search and browse logic shared by the mutable Catalog and the memory-mapped
+    read-only snapshot (store/snapshot.py).
+
+    Subclasses expose their indexes through the small accessor methods below, in
+    terms of "handles": whatever identifies a product in that implementation.
+    The ordinal is the product's position in insertion order, so index-backed
+    lookups return exactly what a scan over the products in order would.
+    """
+
+    read_only = False
+    store_id: str
+    store_name: str
+    aisle_layout: Dict[str, str]
+    meal_suggestions: List[Dict[str, Any]]
+    version: int
+
+    # --- Accessors implemented by subclasses ---
+    def _reading(self) -> contextlib.AbstractContextManager:
+        return contextlib.nullcontext()
+
+    def _exact_handle(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def _first_handle(self) -> Any:
+        raise NotImplementedError
+
+    def _all_handles(self) -> Iterable[Any]:
+        raise NotImplementedError
+
+    def _product(self, handle: Any) -> Product:
+        raise NotImplementedError
+
+    def _lower_name(self, handle: Any) -> str:
+        raise NotImplementedError
+
+    def _ordinal_of(self, handle: Any) -> int:
+        raise NotImplementedError
+
+    def _price_and_aisle(self, handle: Any) -> Tuple[float, int]:
+        raise NotImplementedError
+
+    def _first_with_word(self, word: str) -> Any:
+        """The lowest-ordinal handle whose lowercase name has `word` as a whitespace token."""
+        raise NotImplementedError
+
+    def _word_handles(self, word: str, below: float = INFINITY) -> Iterable[Any]:
+        """Handles with ordinal < `below` whose lowercase name has `word` as a whitespace token."""
+        raise NotImplementedError
+
+    def _handles_with_word(self, kind: str, token: str, below: float = INFINITY) -> Set[Any]:
+        """Handles with ordinal < `below` and a name token that contains / endswith / startswith `token`."""
+        raise NotImplementedError
+
+    def _first_word_handles(self, word: str, count: int) -> Sequence[Any]:
+        """The first `count` handles (by ordinal) whose lowercase name has `word` as a whitespace token."""
+        return self._word_handles(word)[:count]
+
+    def _name_handles(self, name: str) -> Iterable[Any]:
+        """Handles whose full lowercase name equals `name`."""
+        raise NotImplementedError
+
+    def _aisle_name_handles(self, aisle: int) -> Iterable[Any]:
+        raise NotImplementedError
+
+    def _price_entries(self, aisle: Optional[int] = None) -> Sequence[Tuple[float, int, Any]]:
+        """(price, ordinal, handle) sorted ascending, for one aisle or the whole store."""
+        raise NotImplementedError
+
+    # --- Search ---
+    def _first(self, handles: Iterable[Any]) -> Any:
+        return min(handles, key=self._ordinal_of, default=None)
+
+    def _keys_with_substring(self, text: str, below: float = INFINITY) -> Set[Any]:
+        """Superset of the handles (with ordinal < `below`) whose lowercase name contains `text`,
+        built from the word postings."""
+        tokens = text.split()
+        if not tokens:
+            return {handle for handle in self._all_handles() if self._ordinal_of(handle) < below}
+        if len(tokens) >= 3:
+            # Every interior token of `text` must be a whole word of the name.
+            return set.intersection(*(set(self._word_handles(token, below)) for token in tokens[1:-1]))
+        if len(tokens) == 1:
+            return self._handles_with_word("contains", tokens[0], below)
+        # Two tokens: a word ending with the first, followed by a word starting with the second.
+        return (self._handles_with_word("endswith", tokens[0], below)
+                & self._handles_with_word("startswith", tokens[1], below))
+
+    def search(self, item_name: str) -> Optional[Product]:
+        """Same result as scanning products in order for the first one where the query
+        is in the name, the name is in the query, or they share a word."""
+        with self._reading():
+            query = item_name.lower().strip()
+            exact = self._exact_handle(query)
+            if exact is not None:
+                return self._product(exact)
+            if not query:
+                # An empty query is contained in every name, so the first product matches.
+                first = self._first_handle()
+                return self._product(first) if first is not None else None
+
+            # Postings are in ordinal order, so only each word's first product matters, and the
+            # substring checks below only need to look at products that come before it.
+            best = self._first(handle for handle in map(self._first_with_word, set(query.split())) if handle is not None)
+            best_ordinal = self._ordinal_of(best) if best is not None else INFINITY
+
+            candidates: Set[Any] = set()
+            # Names contained in the query: look up every substring of the query.
+            for start in range(len(query)):
+                for end in range(start + 1, len(query) + 1):
+                    candidates.update(self._name_handles(query[start:end]))
+            candidates.update(
+                handle for handle in self._keys_with_substring(query, below=best_ordinal)
+                if query in self._lower_name(handle)
+            )
+            better = self._first(handle for handle in candidates if self._ordinal_of(handle) < best_ordinal)
+            if better is not None:
+                best = better
+            return self._product(best) if best is not None else None
+
+    # --- Secondary index queries ---
+    def word_frequency(self, word: str) -> int:
+        """Number of products whose lowercase name has `word` as a whitespace token."""
+        with self._reading():
+            return len(self._word_handles(word))
+
+    def related_products(self, product: Product, per_aisle: int = 60, by_name: int = 200) -> List[Product]:
+        """Candidate alternatives for `product`: the `per_aisle` products in its aisle closest
+        in price, plus about `by_name` products sharing a word of its name, taken from its
+        rarest words first. Excludes the product itself."""
+        with self._reading():
+            entries = self._price_entries(product['aisle'])
+            middle = bisect.bisect_left(entries, (product['price'],))
+            start = max(0, min(middle - per_aisle // 2, len(entries) - per_aisle))
+            handles = {entries[i][2] for i in range(start, min(len(entries), start + per_aisle))}
+            named: Set[Any] = set()
+            for word in sorted(set(product['name'].lower().split()), key=self.word_frequency):
+                if len(named) >= by_name:
+                    break
+                named.update(self._first_word_handles(word, by_name - len(named)))
+            handles |= named
+            related = (self._product(handle) for handle in handles)
+            return [other for other in related if other['id'] != product['id']]
+
+    def aisle_products(self, aisle: int) -> List[Product]:
+        """Products in an aisle, sorted by name."""
+        with self._reading():
+            return [self._product(handle) for handle in self._aisle_name_handles(aisle)]
+
+    def browse(self, category: Optional[str] = None, max_price: Optional[float] = None,
+               limit: int = 20) -> Tuple[int, List[Product]]:
+        """Products whose aisle name or product name contains `category`, at or under max_price.
+
+        Returns (total matches, cheapest `limit` matches in price order).
+        """
+        with self._reading():
+            price_bound = (max_price, float('inf'), '') if max_price is not None else None
+
+            def under_price(entries: Sequence[Tuple[float, int, Any]]) -> int:
+                return len(entries) if price_bound is None else bisect.bisect_right(entries, price_bound)
+
+            if not category:
+                entries = self._price_entries()
+                count = under_price(entries)
+                return count, [self._product(entries[i][2]) for i in range(min(limit, count))]
+
+            category_lower = category.lower()
+            aisles = [int(number) for number, name in self.aisle_layout.items() if category_lower in name.lower()]
+            aisle_lists = [(entries, under_price(entries)) for entries in map(self._price_entries, aisles)]
+            aisle_set = set(aisles)
+            by_name = sorted(
+                (price, self._ordinal_of(handle), handle)
+                for handle in self._keys_with_substring(category_lower)
+                for price, aisle in (self._price_and_aisle(handle),)
+                if aisle not in aisle_set
+                and (max_price is None or price <= max_price)
+                and category_lower in self._lower_name(handle)
+            )
+            total = sum(count for _, count in aisle_lists) + len(by_name)
+            cheapest = heapq.merge(*(_prefix(entries, count) for entries, count in aisle_lists), by_name)
+            return total, [self._product(handle) for _, _, handle in (next(cheapest) for _ in range(min(limit, total)))]
+
+
+class Catalog(CatalogReader):
+    """Products of one store plus the indexes the server tools query.
+
+    Indexes (all kept up to date by upsert/delete):
+      - word postings: whitespace token of the lowercase name -> (ordinal, key) in ordinal order
+      - name postings: full lowercase name -> keys
+      - per-aisle lists sorted by (name, ordinal) and (price, ordinal)
+      - a global list sorted by (price, ordinal)
+      - product id -> key
+    Handles are the product keys.
+    """
+
+    def __init__(self, store_id: str, store_name: str, aisle_layout: Dict[str, str],
+                 meal_suggestions: List[Dict[str, Any]], version: int = 0):
+        self.store_id = store_id
+        self.store_name = store_name
+        self.aisle_layout = aisle_layout
+        self.meal_suggestions = meal_suggestions
+        self.version = version
+        self.products: Dict[str, Product] = {}
+        self._ordinal: Dict[str, int] = {}
+        self._ids: Dict[str, str] = {}
+        self._next_ordinal = 0
+        self._words: Dict[str, List[Tuple[int, str]]] = {}
+        self._names: Dict[str, Set[str]] = {}
+        self._aisle_by_name: Dict[int, List[Tuple[str, int, str]]] = {}
+        self._aisle_by_price: Dict[int, List[Tuple[float, int, str]]] = {}
+        self._by_price: List[Tuple[float, int, str]] = []
+        self._lock = threading.RLock()
+        self._bulk = False
+
+    @classmethod
+    def from_store(cls, store: Dict[str, Any], version: int = 0) -> 'Catalog':
+        """Build a catalog from a STORE_DATABASE-shaped dict."""
+        catalog = cls(store['store_id'], store['store_name'], store['aisle_layout'], store['meal_suggestions'], version)
+        catalog.begin_bulk()
+        for key, product in store['products'].items():
+            catalog.upsert(key, product)
+        catalog.end_bulk()
+        return catalog
+
+    def empty_copy(self, version: Optional[int] = None) -> 'Catalog':
+        """A new, empty catalog with the same store metadata (for loading a full snapshot)."""
+        return Catalog(self.store_id, self.store_name, self.aisle_layout, self.meal_suggestions,
+                       self.version + 1 if version is None else version)
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def items(self) -> Iterator[Tuple[str, Product]]:
+        """(key, product) in ordinal order."""
+        return iter(self.products.items())
+
+    def key_for_id(self, product_id: str) -> Optional[str]:
+        return self._ids.get(product_id)
+
+    def key_for_name(self, name: str) -> Optional[str]:
+        """Key of the first product (in ordinal order) with this name, ignoring case."""
+        with self._lock:
+            return self._first(self._name_handles(name.strip().lower()))
+
+    def get(self, key: str) -> Optional[Product]:
+        return self.products.get(key)
+
+    def copy_products(self) -> Dict[str, Product]:
+        """A point-in-time copy of the products dict, safe to serialize while writes continue."""
+        with self._lock:
+            return dict(self.products)
+
+    def transaction(self) -> threading.RLock:
+        """Hold this across several upserts so readers see the whole batch or none of it."""
+        return self._lock
+
+    # --- Writes ---
+    def begin_bulk(self):
+        """Defer the ordered (aisle and price) indexes until end_bulk(); for loading many rows at once."""
+        self._bulk = True
+
+    def end_bulk(self):
+        """Build the ordered indexes from the products as they are now, so rows that
+        replaced or deleted an earlier row leave nothing behind."""
+        with self._lock:
+            self._aisle_by_name.clear()
+            self._aisle_by_price.clear()
+            self._by_price = []
+            for key, product in self.products.items():
+                self._index_ordered(key, product, self._ordinal[key], sort=False)
+            for entries in self._aisle_by_name.values():
+                entries.sort()
+            for entries in self._aisle_by_price.values():
+                entries.sort()
+            self._by_price.sort()
+            self._bulk = False
+
+    def upsert(self, key: str, product: Product) -> Optional[Product]:
+        """Insert or replace a product, updating every index. Returns the previous product."""
+        with self._lock:
+            old = self.products.get(key)
+            # Stock and price updates keep the name, so the word and name postings stay as they are.
+            same_name = old is not None and old['name'] == product['name']
+            if old is not None:
+                self._unindex(key, old, same_name)
+            else:
+                self._ordinal[key] = self._next_ordinal
+                self._next_ordinal += 1
+            # Replace rather than mutate, so readers holding the old dict see a consistent product.
+            self.products[key] = product
+            self._index(key, product, same_name)
+            if self is _current:
+                _notify(key, old, product)
+            return old
+
+    def delete(self, key: str) -> Optional[Product]:
+        with self._lock:
+            old = self.products.pop(key, None)
+            if old is not None:
+                self._unindex(key, old)
+                del self._ordinal[key]
+                if self is _current:
+                    _notify(key, old, None)
+            return old
+
+    def _index(self, key: str, product: Product, keep_names: bool = False):
+        name = product['name'].lower()
+        ordinal = self._ordinal[key]
+        self._ids[product['id']] = key
+        if not keep_names:
+            entry = (ordinal, key)
+            for word in set(name.split()):
+                postings = self._words.setdefault(word, [])
+                if not postings or postings[-1] < entry:
+                    postings.append(entry)  # new products have the highest ordinal
+                else:
+                    bisect.insort(postings, entry)
+            self._names.setdefault(name, set()).add(key)
+        if not self._bulk:
+            self._index_ordered(key, product, ordinal, sort=True)
+
+    def _index_ordered(self, key: str, product: Product, ordinal: int, sort: bool):
+        by_name = self._aisle_by_name.setdefault(product['aisle'], [])
+        by_price = self._aisle_by_price.setdefault(product['aisle'], [])
+        name_entry = (product['name'], ordinal, key)  # aisle listings sort by the name as written
+        price_entry = (product['price'], ordinal, key)
+        if sort:
+            bisect.insort(by_name, name_entry)
+            bisect.insort(by_price, price_entry)
+            bisect.insort(self._by_price, price_entry)
+        else:
+            by_name.append(name_entry)
+            by_price.append(price_entry)
+            self._by_price.append(price_entry)
+
+    def _unindex(self, key: str, product: Product, keep_names: bool = False):
+        name = product['name'].lower()
+        ordinal = self._ordinal[key]
+        if self._ids.get(product['id']) == key:
+            del self._ids[product['id']]
+        if not keep_names:
+            for word in set(name.split()):
+                postings = self._words.get(word)
+                if postings is not None:
+                    _sorted_remove(postings, (ordinal, key))
+                    if not postings:
+                        del self._words[word]
+            names = self._names.get(name)
+            if names is not None:
+                names.discard(key)
+                if not names:
+                    del self._names[name]
+        if self._bulk:
+            return  # the ordered indexes are built by end_bulk()
+        _sorted_remove(self._aisle_by_name.get(product['aisle'], []), (product['name'], ordinal, key))
+        _sorted_remove(self._aisle_by_price.get(product['aisle'], []), (product['price'], ordinal, key))
+        _sorted_remove(self._by_price, (product['price'], ordinal, key))
+
+    # --- CatalogReader accessors ---
+    def _reading(self) -> threading.RLock:
+        return self._lock
+
+    def _exact_handle(self, key: str) -> Optional[str]:
+        return key if key in self.products else None
+
+    def _first_handle(self) -> Optional[str]:
+        return next(iter(self.products), None)
+
+    def _all_handles(self) -> Iterable[str]:
+        return self.products
+
+    def _product(self, handle: str) -> Product:
+        return self.products[handle]
+
+    def _lower_name(self, handle: str) -> str:
+        return self.products[handle]['name'].lower()
+
+    def _ordinal_of(self, handle: str) -> int:
+        return self._ordinal[handle]
+
+    def _price_and_aisle(self, handle: str) -> Tuple[float, int]:
+        product = self.products[handle]
+        return product['price'], product['aisle']
+
+    def word_frequency(self, word: str) -> int:
+        return len(self._words.get(word, ()))
+
+    def _first_with_word(self, word: str) -> Optional[str]:
+        postings = self._words.get(word)
+        return postings[0][1] if postings else None
+
+    def _word_handles(self, word: str, below: float = INFINITY) -> List[str]:
+        postings = self._words.get(word, [])
+        if below != INFINITY:
+            postings = postings[:bisect.bisect_left(postings, (below,))]
+        return [key for _, key in postings]
+
+    def _first_word_handles(self, word: str, count: int) -> List[str]:
+        return [key for _, key in self._words.get(word, [])[:count]]
+
+    def _handles_with_word(self, kind: str, token: str, below: float = INFINITY) -> Set[str]:
+        if kind == "contains":
+            words = [word for word in self._words if token in word]
+        elif kind == "endswith":
+            words = [word for word in self._words if word.endswith(token)]
+        else:
+            words = [word for word in self._words if word.startswith(token)]
+        return set().union(*(self._word_handles(word, below) for word in words))
+
+    def _name_handles(self, name: str) -> Iterable[str]:
+        return self._names.get(name, ())
+
+    def _aisle_name_handles(self, aisle: int) -> Iterable[str]:
+        return [key for _, _, key in self._aisle_by_name.get(aisle, [])]
+
+    def _price_entries(self, aisle: Optional[int] = None) -> List[Tuple[float, int, str]]:
+        return self._by_price if aisle is None else self._aisle_by_price.get(aisle, [])
+
+
+def _prefix(entries: Sequence[tuple], count: int) -> Iterator[tuple]:
+    return (entries[i] for i in range(count))
+
+def _sorted_remove(entries: List[tuple], entry: tuple):
+    position = bisect.bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
+
+
+# --- The live snapshot ---
+# Tool calls read current_catalog() once and use that object for the whole call.
+# A full reload builds a new Catalog off to the side and swaps it in with one
+# assignment, so readers see either the old or the new catalog, never a mix.
+_current: Optional[CatalogReader] = None
+_swap_lock = threading.Lock()
+# Optional hook run by current_catalog(), e.g. to pick up a newly published snapshot file
+_refresh: Optional[Callable[[], None]] = None
+# Called with (key, old product, new product) for every write to the live catalog, and
+# with (None, None, None) when a whole new catalog is swapped in. Listeners run on the
+# writer's thread while it holds the catalog lock, so they must be quick and thread-safe.
+CatalogListener = Callable[[Optional[str], Optional[Product], Optional[Product]], None]
+_listeners: List[CatalogListener] = []
+
+
+def _reset_swap_lock():
+    # A lock held by another thread at fork time would never be released in the child.
+    global _swap_lock
+    _swap_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_reset_swap_lock)
+
+
+def current_catalog() -> CatalogReader:
+    if _refresh is not None:
+        _refresh()
+    if _current is None:
+        raise RuntimeError("No catalog loaded; call swap_catalog() first")
+    return _current
+
+
+def refresh_catalog():
+    """Run the refresh hook without a tool call, so a newer snapshot is picked up (and its
+    swap reported to listeners) even while clients answer everything from their caches."""
+    if _refresh is not None:
+        _refresh()
+
+
+def swap_catalog(catalog: CatalogReader) -> Optional[CatalogReader]:
+    """Make `catalog` the live snapshot and return the one it replaced."""
+    global _current
+    with _swap_lock:
+        previous, _current = _current, catalog
+    if previous is not catalog:
+        _notify(None, None, None)
+    return previous
+
+
+def swap_catalog_if_newer(catalog: CatalogReader) -> bool:
+    """Swap in `catalog` only if its version is newer than the live one's."""
+    global _current
+    with _swap_lock:
+        if _current is not None and catalog.version <= _current.version:
+            return False
+        _current = catalog
+    _notify(None, None, None)
+    return True
+
+
+def set_catalog_refresh(refresh: Optional[Callable[[], None]]):
+    """Install (or remove, with None) the hook current_catalog() calls before returning."""
+    global _refresh
+    _refresh = refresh
+
+
+def add_catalog_listener(listener: CatalogListener):
+    _listeners.append(listener)
+
+
+def remove_catalog_listener(listener: CatalogListener):
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def _notify(key: Optional[str], old: Optional[Product], new: Optional[Product]):
+    for listener in list(_listeners):
+        try:
+            listener(key, old, new)
+        except Exception:
+            # A broken listener must not fail the write that triggered it.
+            logger.exception("Catalog listener failed")
@@ -0,0 +1,89 @@
+# FILE: store/changes.py
+# Coalescing change feed: catalog writers publish changed resource URIs from any
+# thread, and an asyncio task delivers each distinct URI at most once per interval.
+
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeed:
+    """Collects changed URIs and hands them to `deliver` in batches.
+
+    publish() is cheap and thread-safe (ingestion runs in worker threads), so it
+    can be called from catalog listeners. Repeated changes to the same URI within
+    one interval are delivered once.
+
+    `poll`, if given, runs in a worker thread before each flush. It is for changes no
+    writer in this process reports, such as a snapshot published by another worker.
+    """
+
+    def __init__(self, interval: float, deliver: Callable[[Set[str]], Awaitable[None]],
+                 poll: Optional[Callable[[], None]] = None):
+        self.interval = interval
+        self._deliver = deliver
+        self._poll = poll
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.delivered = 0
+        self.batches = 0
+
+    def publish(self, uris: Iterable[str]):
+        with self._lock:
+            for uri in uris:
+                self._pending.add(uri)
+                self.published += 1
+
+    def start(self):
+        """Start the flush loop on the running event loop (idempotent)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _drain(self) -> Set[str]:
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        return pending
+
+    async def flush(self):
+        batch = self._drain()
+        if not batch:
+            return
+        self.batches += 1
+        self.delivered += len(batch)
+        try:
+            await self._deliver(batch)
+        except Exception:
+            logger.exception("Delivering change notifications failed")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._poll is not None:
+                try:
+                    await asyncio.to_thread(self._poll)
+                except Exception:
+                    logger.exception("Polling for catalog changes failed")
+            await self.flush()
+
+    def report(self) -> Dict[str, int]:
+        return {
+            "published": self.published,
+            "delivered": self.delivered,
+            "coalesced": self.published - self.delivered - len(self._pending),
+            "batches": self.batches,
+            "pending": len(self._pending),
+        }
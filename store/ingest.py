@@ -0,0 +1,328 @@
+# FILE: store/ingest.py
+# Streaming ingestion of inventory feeds (CSV or JSONL, optionally gzipped) into the catalog.
+#
+# Two feed kinds:
+#   snapshot - the nightly full dump. Loaded into a new Catalog off to the side and
+#              swapped in at the end, so readers never see a half-loaded catalog.
+#   deltas   - intra-day changes applied to the live catalog in batches. Each batch
+#              is applied under the catalog's write lock and updates every index.
+#
+# Usage:
+#   python -m store.ingest snapshot feeds/inventory-2024-06-01.csv.gz
+#   python -m store.ingest deltas feeds/stock-0930.jsonl --batch-size 500
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from .catalog import PRODUCT_FIELDS, Catalog, CatalogReader, Product, current_catalog, swap_catalog
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+
+# Snapshots and deltas are serialized: deltas applied to the live catalog while a
+# snapshot is being built would be lost when the snapshot is swapped in.
+_ingest_lock = threading.Lock()
+
+
+class RowError(ValueError):
+    """A feed row that failed validation."""
+
+
+class IngestStats:
+    """Counts for one ingestion run."""
+
+    def __init__(self, kind: str, source: str):
+        self.kind = kind
+        self.source = source
+        self.rows_read = 0
+        self.applied = 0
+        self.rejected = 0
+        self.duplicates = 0 # snapshot rows whose key an earlier row already had; the later row wins
+        self.batches = 0
+        self.errors: List[str] = []
+        self.catalog_version: Optional[int] = None
+        self.catalog_size: Optional[int] = None
+        self._started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def reject(self, line: int, error: Exception):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"row {line}: {error}")
+
+    def duplicate(self, line: int, key: str):
+        self.duplicates += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"row {line}: duplicate key {key!r} replaced an earlier row")
+
+    def finish(self, catalog: CatalogReader):
+        self.elapsed = time.perf_counter() - self._started
+        self.catalog_version = catalog.version
+        self.catalog_size = len(catalog)
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "source": self.source,
+            "rows_read": self.rows_read,
+            "applied": self.applied,
+            "rejected": self.rejected,
+            "duplicates": self.duplicates,
+            "batches": self.batches,
+            "elapsed_s": round(self.elapsed, 3),
+            "rows_per_s": round(self.rows_per_s, 1),
+            "catalog_version": self.catalog_version,
+            "catalog_size": self.catalog_size,
+            "errors": self.errors,
+        }
+
+
+# --- Readers ---
+def _open_text(path: str) -> io.TextIOBase:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+def _feed_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".jsonl") or name.endswith(".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Unsupported feed '{path}': expected .csv or .jsonl (optionally .gz)")
+
+def iter_rows(path: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (line number, row) one at a time; memory use does not grow with the feed size.
+
+    A JSONL line that is not valid JSON is yielded as a RowError so it is counted
+    as rejected instead of aborting the run.
+    """
+    feed_format = _feed_format(path)
+    with _open_text(path) as f:
+        if feed_format == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, RowError(f"invalid JSON ({e.msg})")
+
+def batched(rows: Iterator[Tuple[int, Any]], batch_size: int) -> Iterator[List[Tuple[int, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# --- Validation ---
+def _blank(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+def _as_int(row: Dict[str, Any], field: str, minimum: Optional[int] = 0) -> int:
+    value = row.get(field)
+    try:
+        number = int(value) if not isinstance(value, float) or value.is_integer() else None
+    except (TypeError, ValueError):
+        number = None
+    if number is None or (minimum is not None and number < minimum):
+        raise RowError(f"'{field}' must be an integer{'' if minimum is None else f' >= {minimum}'}, got {value!r}")
+    return number
+
+def _as_price(row: Dict[str, Any]) -> float:
+    value = row.get("price")
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f"'price' must be a number, got {value!r}")
+    if not price >= 0:
+        raise RowError(f"'price' must be >= 0, got {value!r}")
+    return round(price, 2)
+
+def validate_product(row: Any, catalog: Optional[Catalog] = None) -> Tuple[str, Product]:
+    """Turn a feed row into (catalog key, product) or raise RowError.
+
+    Without a `key` field, a product already in `catalog` with the same id, or
+    else the same name, keeps its key; a new product is keyed by its name.
+    """
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError("expected an object")
+    missing = [field for field in PRODUCT_FIELDS if _blank(row.get(field))]
+    if missing:
+        raise RowError(f"missing {', '.join(missing)}")
+    name = str(row["name"]).strip()
+    product = {
+        "id": str(row["id"]).strip(),
+        "name": name,
+        "aisle": _as_int(row, "aisle", minimum=1),
+        "price": _as_price(row),
+        "stock": _as_int(row, "stock"),
+        "section": str(row["section"]).strip(),
+    }
+    if not _blank(row.get("key")):
+        key = str(row["key"]).strip().lower()
+    else:
+        existing = (catalog.key_for_id(product["id"]) or catalog.key_for_name(name)) if catalog is not None else None
+        key = existing or name.lower()
+    return key, product
+
+def apply_delta(catalog: Catalog, row: Any) -> Tuple[str, Optional[Product]]:
+    """Apply one delta row to `catalog`. Returns (key, new product or None if deleted).
+
+    A row with every product field is a full upsert (new or changed product).
+    Otherwise it names an existing product by `key`, `id` or `name` and carries
+    `stock`, `stock_delta` and/or `price`. `"op": "delete"` removes the product.
+    """
+    if isinstance(row, RowError):
+        raise row
+    if not isinstance(row, dict):
+        raise RowError("expected an object")
+    op = str(row.get("op") or "upsert").strip().lower()
+    if op not in ("upsert", "delete"):
+        raise RowError(f"unknown op {op!r}")
+    if op == "upsert" and all(not _blank(row.get(field)) for field in PRODUCT_FIELDS):
+        key, product = validate_product(row, catalog)
+        catalog.upsert(key, product)
+        return key, product
+
+    key = None
+    if not _blank(row.get("key")):
+        key = str(row["key"]).strip().lower()
+    elif not _blank(row.get("id")):
+        key = catalog.key_for_id(str(row["id"]).strip())
+    elif not _blank(row.get("name")):
+        key = catalog.key_for_name(str(row["name"]))
+    current = catalog.get(key) if key else None
+    if current is None:
+        raise RowError("no product with that key, id or name")
+
+    if op == "delete":
+        catalog.delete(key)
+        return key, None
+
+    changes: Dict[str, Any] = {}
+    if not _blank(row.get("stock")):
+        changes["stock"] = _as_int(row, "stock")
+    if not _blank(row.get("stock_delta")):
+        changes["stock"] = max(0, changes.get("stock", current["stock"]) + _as_int(row, "stock_delta", minimum=None))
+    if not _blank(row.get("price")):
+        changes["price"] = _as_price(row)
+    if not changes:
+        raise RowError("delta has no stock, stock_delta or price")
+    # New dict rather than an in-place edit, so the price/stock indexes are rebuilt for it.
+    product = {**current, **changes}
+    catalog.upsert(key, product)
+    return key, product
+
+
+# --- Pipelines ---
+def load_snapshot(path: str, batch_size: int = DEFAULT_BATCH_SIZE, base: Optional[CatalogReader] = None) -> IngestStats:
+    """Build a new catalog from a full dump and swap it in. The live catalog is untouched until the swap.
+
+    Store metadata (name, aisle layout, meal rules) is carried over from `base`
+    (default: the current catalog). A feed where every row is rejected is not swapped in.
+    Rows without a `key` are keyed by name, so products sharing a name collapse into
+    one; a row that replaces an earlier one is counted as a duplicate, not as applied.
+    """
+    stats = IngestStats("snapshot", path)
+    with _ingest_lock:
+        base = base or current_catalog()
+        catalog = base.empty_copy()
+        catalog.begin_bulk()
+        for batch in batched(iter_rows(path), batch_size):
+            for line, row in batch:
+                stats.rows_read += 1
+                try:
+                    key, product = validate_product(row)
+                except RowError as e:
+                    stats.reject(line, e)
+                    continue
+                if catalog.upsert(key, product) is None:
+                    stats.applied += 1
+                else:
+                    stats.duplicate(line, key)
+            stats.batches += 1
+        catalog.end_bulk()
+        if stats.applied:
+            swap_catalog(catalog)
+        else:
+            stats.errors.append("no valid rows; the current catalog was kept")
+            catalog = base
+    stats.finish(catalog)
+    return stats
+
+def apply_deltas(path: str, batch_size: int = DEFAULT_BATCH_SIZE, catalog: Optional[CatalogReader] = None) -> IngestStats:
+    """Apply a delta feed to the live catalog, one batch per write-lock hold.
+
+    A read-only (memory-mapped) catalog is first copied into a mutable one, which
+    is swapped in once the feed is applied, unless no row applied.
+    """
+    stats = IngestStats("deltas", path)
+    with _ingest_lock:
+        catalog = catalog or current_catalog()
+        copied = catalog.read_only
+        if copied:
+            catalog = catalog.to_catalog()
+        for batch in batched(iter_rows(path), batch_size):
+            with catalog.transaction():
+                for line, row in batch:
+                    stats.rows_read += 1
+                    try:
+                        apply_delta(catalog, row)
+                    except RowError as e:
+                        stats.reject(line, e)
+                        continue
+                    stats.applied += 1
+            stats.batches += 1
+        if stats.applied:
+            catalog.version += 1
+        if copied and stats.applied:
+            swap_catalog(catalog)
+    stats.finish(catalog)
+    return stats
+
+def ingest(kind: str, path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> IngestStats:
+    if kind == "snapshot":
+        return load_snapshot(path, batch_size)
+    if kind == "deltas":
+        return apply_deltas(path, batch_size)
+    raise ValueError(f"Unknown feed kind '{kind}': expected 'snapshot' or 'deltas'")
+
+
+def main():
+    """Validate and time a feed against the bundled store data (does not touch a running server)."""
+    from mcp_client.data import STORE_DATABASE
+
+    parser = argparse.ArgumentParser(description="Ingest a CSV/JSONL inventory feed and report rows per second.")
+    parser.add_argument("kind", choices=["snapshot", "deltas"])
+    parser.add_argument("path")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    swap_catalog(Catalog.from_store(STORE_DATABASE))
+    stats = ingest(args.kind, args.path, args.batch_size)
+    print(json.dumps(stats.report(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# FILE: store/lists.py
+# Server-side shopping list handles with incremental totals, route and meal-rule state.
+
+import bisect
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Any, List, Optional, Set, Tuple
+
+ProductResolver = Callable[[str], Optional[Dict[str, Any]]]
+# Product as stored on the list -> the same product as it is in the catalog now (None if gone)
+ProductLookup = Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+class MealRuleIndex:
+    """Maps product names to the (rule, trigger) pairs they satisfy.
+
+    A trigger is satisfied when it is a substring of the product name, the same
+    test get_shopping_suggestions uses. Results are cached per product name, so
+    each product pays the trigger scan once.
+    """
+
+    def __init__(self, meal_suggestions: List[Dict[str, Any]]):
+        self.rules = meal_suggestions
+        self.rule_triggers: List[List[str]] = [[t.lower() for t in rule['trigger_items']] for rule in meal_suggestions]
+        self.trigger_rules: Dict[str, List[int]] = {}
+        for rule_idx, triggers in enumerate(self.rule_triggers):
+            for trigger in triggers:
+                self.trigger_rules.setdefault(trigger, []).append(rule_idx)
+        self._cache: Dict[str, List[Tuple[int, str]]] = {}
+
+    def matches(self, product_name: str) -> List[Tuple[int, str]]:
+        name = product_name.lower()
+        if name not in self._cache:
+            self._cache[name] = [
+                (rule_idx, trigger)
+                for trigger, rule_indices in self.trigger_rules.items() if trigger in name
+                for rule_idx in rule_indices
+            ]
+        return self._cache[name]
+
+
+class ShoppingListState:
+    """One shopping list with running totals, an aisle-sorted route and per-rule trigger counts.
+
+    Each entry keeps the product it was added as (for the route) and its live
+    catalog version (for prices); ShoppingListStore moves the running total when
+    a listed product's price changes.
+    """
+
+    def __init__(self, list_id: str, rule_index: MealRuleIndex, holders: Optional[Dict[str, Set[str]]] = None):
+        self.list_id = list_id
+        self.rule_index = rule_index
+        # Product id -> ids of the lists holding it, shared with the owning store
+        self.holders = holders if holders is not None else {}
+        self.synced_swap = 0
+        # Normalized requested name -> {"requested", "quantity", "product", "live"}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.product_entries: Dict[str, Set[str]] = {}  # product id -> entry keys
+        self.not_found: Dict[str, str] = {}
+        self.route: List[Tuple[int, str, str, str]] = []  # (aisle, section, product name, entry key)
+        self.aisle_counts: Dict[int, int] = {}
+        self.total_cost = 0.0
+        self.items_found = 0
+        # rule index -> trigger -> number of list entries satisfying it
+        self.rule_counts: Dict[int, Dict[str, int]] = {}
+        self.touched_at = time.monotonic()
+
+    # --- Incremental updates ---
+    def add(self, item_name: str, resolve: ProductResolver) -> Dict[str, Any]:
+        key = item_name.lower().strip()
+        if key in self.entries:
+            entry = self.entries[key]
+            entry["quantity"] += 1
+            self.total_cost += entry["live"]['price']
+            self.items_found += 1
+            return {"item": item_name, "quantity": entry["quantity"], "product": entry["product"]}
+        if key in self.not_found:
+            return {"item": item_name, "found": False}
+
+        product = resolve(item_name) if "input should be" not in key else None
+        if product is None:
+            self.not_found[key] = item_name
+            return {"item": item_name, "found": False}
+
+        self.entries[key] = {"requested": item_name, "quantity": 1, "product": product, "live": product}
+        self.product_entries.setdefault(product['id'], set()).add(key)
+        self.holders.setdefault(product['id'], set()).add(self.list_id)
+        bisect.insort(self.route, self._route_key(key, product))
+        self.aisle_counts[product['aisle']] = self.aisle_counts.get(product['aisle'], 0) + 1
+        self.total_cost += product['price']
+        self.items_found += 1
+        self._apply_rules(product, +1)
+        return {"item": item_name, "quantity": 1, "product": product}
+
+    def remove(self, item_name: str) -> Optional[Dict[str, Any]]:
+        key = item_name.lower().strip()
+        if self.not_found.pop(key, None) is not None:
+            return {"item": item_name, "found": False}
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+
+        product = entry["product"]
+        route_key = self._route_key(key, product)
+        position = bisect.bisect_left(self.route, route_key)
+        if position < len(self.route) and self.route[position] == route_key:
+            del self.route[position]
+        self.aisle_counts[product['aisle']] -= 1
+        if not self.aisle_counts[product['aisle']]:
+            del self.aisle_counts[product['aisle']]
+        self.total_cost -= entry["live"]['price'] * entry["quantity"]
+        self.items_found -= entry["quantity"]
+        self._apply_rules(product, -1)
+        keys = self.product_entries[product['id']]
+        keys.discard(key)
+        if not keys:
+            del self.product_entries[product['id']]
+            self._release(product['id'])
+        return {"item": item_name, "quantity": entry["quantity"], "product": product}
+
+    def reprice(self, old: Dict[str, Any], new: Dict[str, Any]):
+        """Move every entry for `old` onto its new catalog version, adjusting the total by the price change."""
+        for key in self.product_entries.get(old['id'], ()):
+            entry = self.entries[key]
+            self.total_cost += (new['price'] - entry["live"]['price']) * entry["quantity"]
+            entry["live"] = new
+
+    def resync(self, lookup: ProductLookup):
+        """Re-read every entry from the catalog after a full swap."""
+        self.total_cost = 0.0
+        for entry in self.entries.values():
+            live = lookup(entry["product"])
+            if live is not None:
+                entry["live"] = live
+            self.total_cost += entry["live"]['price'] * entry["quantity"]
+
+    def release_all(self):
+        for product_id in self.product_entries:
+            self._release(product_id)
+
+    def _release(self, product_id: str):
+        lists = self.holders.get(product_id)
+        if lists is not None:
+            lists.discard(self.list_id)
+            if not lists:
+                del self.holders[product_id]
+
+    def _route_key(self, key: str, product: Dict[str, Any]) -> Tuple[int, str, str, str]:
+        return (product['aisle'], product.get('section', ''), product['name'], key)
+
+    def _apply_rules(self, product: Dict[str, Any], delta: int):
+        """Update trigger counts for the rules this product touches; no other rule is looked at."""
+        for rule_idx, trigger in self.rule_index.matches(product['name']):
+            counts = self.rule_counts.setdefault(rule_idx, {})
+            counts[trigger] = counts.get(trigger, 0) + delta
+            if counts[trigger] <= 0:
+                del counts[trigger]
+            if not counts:
+                del self.rule_counts[rule_idx]
+
+    # --- Views ---
+    def meal_state(self) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Complete and partially satisfied meal rules, in rule order."""
+        suggestions, missing_items = [], {}
+        for rule_idx in sorted(self.rule_counts):
+            rule = self.rule_index.rules[rule_idx]
+            triggers = self.rule_index.rule_triggers[rule_idx]
+            missing = [t for t in triggers if t not in self.rule_counts[rule_idx]]
+            if not missing:
+                suggestions.append(rule['suggestion'])
+            else:
+                missing_items[rule['suggestion']] = missing
+        return suggestions, missing_items
+
+    def totals(self) -> Dict[str, Any]:
+        suggestions, missing_items = self.meal_state()
+        aisles = sorted(self.aisle_counts)
+        total_cost = max(self.total_cost, 0.0)
+        return {
+            "list_id": self.list_id,
+            "items_found": self.items_found,
+            "items_not_found": list(self.not_found.values()),
+            "aisles_to_visit": aisles,
+            "total_estimated_cost": round(total_cost, 2),
+            "smart_suggestions": suggestions,
+            "missing_for_meal": missing_items,
+            "summary": f"Found {self.items_found} items across {len(aisles)} aisles. Estimated total: ${total_cost:.2f}",
+        }
+
+    def optimized_path(self) -> List[Dict[str, Any]]:
+        path = []
+        for *_, key in self.route:
+            entry = self.entries[key]
+            path.extend([entry["live"]] * entry["quantity"])
+        return path
+
+
+class ShoppingListStore:
+    """LRU + TTL bounded store of shopping list handles.
+
+    on_catalog_change is a catalog listener. It only queues changes to listed
+    products, since it runs on the writer thread; create() and get() apply them to
+    the lists holding that product, and a full swap resyncs each list on its next get().
+    """
+
+    def __init__(self, meal_suggestions: List[Dict[str, Any]], lookup: Optional[ProductLookup] = None,
+                 max_lists: int = 10000, ttl_seconds: float = 4 * 3600, max_pending: int = 10000):
+        self.rule_index = MealRuleIndex(meal_suggestions)
+        self.lookup = lookup
+        self.max_lists = max_lists
+        self.ttl_seconds = ttl_seconds
+        self.max_pending = max_pending
+        self._lists: "OrderedDict[str, ShoppingListState]" = OrderedDict()
+        self._holders: Dict[str, Set[str]] = {}
+        self._pending: "deque[Tuple[Dict[str, Any], Dict[str, Any]]]" = deque()
+        self._swaps = 0
+
+    def on_catalog_change(self, key: Optional[str], old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        if key is None or len(self._pending) >= self.max_pending:
+            self._swaps += 1  # every list resyncs, so queued changes are moot
+            self._pending.clear()
+        elif old is not None and new is not None and old['id'] in self._holders:
+            self._pending.append((old, new))
+
+    def create(self) -> ShoppingListState:
+        self._evict_expired()
+        self._apply_pending()
+        state = ShoppingListState(uuid.uuid4().hex, self.rule_index, self._holders)
+        state.synced_swap = self._swaps
+        self._lists[state.list_id] = state
+        while len(self._lists) > self.max_lists:
+            self._lists.popitem(last=False)[1].release_all()
+        return state
+
+    def get(self, list_id: str) -> Optional[ShoppingListState]:
+        self._evict_expired()
+        self._apply_pending()
+        state = self._lists.get(list_id)
+        if state is not None:
+            self._lists.move_to_end(list_id)
+            state.touched_at = time.monotonic()
+            if state.synced_swap != self._swaps:
+                if self.lookup is not None:
+                    state.resync(self.lookup)
+                state.synced_swap = self._swaps
+        return state
+
+    def _apply_pending(self):
+        while self._pending:
+            try:
+                old, new = self._pending.popleft()
+            except IndexError:  # cleared by a swap on the writer thread
+                break
+            for list_id in self._holders.get(old['id'], ()):
+                state = self._lists[list_id]
+                if state.synced_swap == self._swaps:
+                    state.reprice(old, new)
+
+    def _evict_expired(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._lists:
+            oldest = next(iter(self._lists.values()))
+            if oldest.touched_at >= cutoff:
+                break
+            self._lists.popitem(last=False)[1].release_all()
@@ -0,0 +1,189 @@
+# FILE: store/picking.py
+# Pick-wave planning for online grocery orders: group orders into cart-sized waves
+# and route each wave through the store once, with one tote per order.
+#
+# Store model: numbered aisles side by side, each AISLE_LENGTH_M long, joined by a
+# front and a back cross aisle. Sections run from the front (A1) to the back (D4).
+# The picker starts and ends at the front of aisle 0 (the pick-up area).
+
+import re
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+AISLE_SPACING_M = 3.0
+AISLE_LENGTH_M = 30.0
+SECTION = re.compile(r"^([A-Za-z])(\d+)$")
+SECTION_ROWS = "ABCD"
+SECTION_COLUMNS = 4
+
+
+class StoreDistanceModel:
+    """Walking distances between shelf positions, shared by every wave of a plan."""
+
+    def __init__(self, aisle_spacing: float = AISLE_SPACING_M, aisle_length: float = AISLE_LENGTH_M):
+        self.aisle_spacing = aisle_spacing
+        self.aisle_length = aisle_length
+        self._depth: Dict[str, float] = {}
+
+    def x(self, aisle: int) -> float:
+        return aisle * self.aisle_spacing
+
+    def depth(self, section: str) -> float:
+        """Distance from the front cross aisle to a section; unknown sections sit mid-aisle."""
+        depth = self._depth.get(section)
+        if depth is None:
+            match = SECTION.match(section.strip())
+            slots = len(SECTION_ROWS) * SECTION_COLUMNS
+            if match and match.group(1).upper() in SECTION_ROWS and 1 <= int(match.group(2)) <= SECTION_COLUMNS:
+                slot = SECTION_ROWS.index(match.group(1).upper()) * SECTION_COLUMNS + int(match.group(2)) - 1
+            else:
+                slot = (slots - 1) / 2
+            depth = self.aisle_length * (slot + 0.5) / slots
+            self._depth[section] = depth
+        return depth
+
+    def route(self, stops: Sequence[Tuple[int, float, Any]]) -> Tuple[float, List[Any]]:
+        """Shortest walk over (aisle, depth, stop) positions that sweeps the aisles left to right.
+
+        Each aisle is either walked end to end (switching between the front and
+        back cross aisles) or entered and left from the same side; a two-state
+        DP over the aisles picks the cheapest combination. Returns (meters, stops
+        in walking order).
+        """
+        by_aisle: Dict[int, List[Tuple[float, Any]]] = {}
+        for aisle, depth, stop in stops:
+            by_aisle.setdefault(aisle, []).append((depth, stop))
+        if not by_aisle:
+            return 0.0, []
+        aisles = sorted(by_aisle)
+        length = self.aisle_length
+        # cost[side] and back-pointers; side 0 = front cross aisle, 1 = back cross aisle
+        cost = [0.0, float('inf')]
+        x_prev = 0.0
+        steps: List[Tuple[Tuple[int, bool], Tuple[int, bool]]] = []
+        for aisle in aisles:
+            depths = [depth for depth, _ in by_aisle[aisle]]
+            shift = abs(self.x(aisle) - x_prev)
+            returns = (2 * max(depths), 2 * (length - min(depths)))
+            # (previous side, traversed) that reaches each side most cheaply
+            options = [[], []]
+            for side in (0, 1):
+                if cost[side] == float('inf'):
+                    continue
+                options[side].append((cost[side] + shift + returns[side], side, False))
+                options[1 - side].append((cost[side] + shift + length, side, True))
+            best = [min(choices) if choices else (float('inf'), 0, False) for choices in options]
+            cost = [best[0][0], best[1][0]]
+            steps.append(((best[0][1], best[0][2]), (best[1][1], best[1][2])))
+            x_prev = self.x(aisle)
+
+        finish = (cost[0] + x_prev, cost[1] + length + x_prev)
+        side = 0 if finish[0] <= finish[1] else 1
+        entered_from: List[int] = []
+        for step in reversed(steps):
+            previous, _ = step[side]
+            entered_from.append(previous)
+            side = previous
+        entered_from.reverse()
+
+        ordered = []
+        for aisle, entry_side in zip(aisles, entered_from):
+            ordered.extend(stop for _, stop in sorted(by_aisle[aisle], key=lambda item: item[0], reverse=entry_side == 1))
+        return round(min(finish), 1), ordered
+
+
+class PickOrder:
+    """One order's resolved lines: product key -> (product, quantity)."""
+
+    def __init__(self, order_id: str):
+        self.order_id = order_id
+        self.lines: Dict[str, Tuple[Dict[str, Any], int]] = {}
+        self.unavailable: List[Dict[str, Any]] = []
+        self.units = 0
+        self.aisle_mask = 0
+
+    def add(self, key: str, product: Dict[str, Any], quantity: int):
+        current = self.lines.get(key)
+        self.lines[key] = (product, quantity + (current[1] if current else 0))
+        self.units += quantity
+        self.aisle_mask |= 1 << product['aisle']
+
+
+def batch_orders(orders: List[PickOrder], totes: int, max_units: int) -> List[List[PickOrder]]:
+    """Seed-based batching: start each wave with the remaining order that spans the most
+    aisles, then keep adding the order that adds the fewest new aisles, until the cart
+    runs out of totes or unit capacity. An order over max_units gets a wave of its own."""
+    remaining = sorted(orders, key=lambda order: (-order.aisle_mask.bit_count(), -order.units))
+    waves = []
+    while remaining:
+        seed = remaining.pop(0)
+        wave, mask, units = [seed], seed.aisle_mask, seed.units
+        while len(wave) < totes and remaining:
+            best_index, best_key = None, None
+            for index, order in enumerate(remaining):
+                if units + order.units > max_units:
+                    continue
+                key = ((order.aisle_mask & ~mask).bit_count(), -(order.aisle_mask & mask).bit_count())
+                if best_key is None or key < best_key:
+                    best_index, best_key = index, key
+                    if key[0] == 0 and -key[1] == order.aisle_mask.bit_count():
+                        break  # every aisle it needs is already on the route
+            if best_index is None:
+                break
+            order = remaining.pop(best_index)
+            wave.append(order)
+            mask |= order.aisle_mask
+            units += order.units
+        waves.append(wave)
+    return waves
+
+
+def plan_wave(number: int, wave: List[PickOrder], model: StoreDistanceModel) -> Dict[str, Any]:
+    """The combined route for one wave: one stop per product, with per-tote quantities."""
+    totes = {order.order_id: tote for tote, order in enumerate(wave, start=1)}
+    stops: Dict[str, Dict[str, Any]] = {}
+    for order in wave:
+        for key, (product, quantity) in order.lines.items():
+            stop = stops.get(key)
+            if stop is None:
+                stop = stops[key] = {
+                    "product": product['name'], "product_id": product['id'],
+                    "aisle": product['aisle'], "section": product['section'],
+                    "total_quantity": 0, "picks": [],
+                }
+            stop["total_quantity"] += quantity
+            stop["picks"].append({"order_id": order.order_id, "tote": totes[order.order_id], "quantity": quantity})
+    distance, route = model.route([(stop['aisle'], model.depth(stop['section']), stop) for stop in stops.values()])
+    return {
+        "wave": number,
+        "orders": [order.order_id for order in wave],
+        "totes": totes,
+        "units": sum(order.units for order in wave),
+        "stops": len(route),
+        "distance_m": distance,
+        "route": route,
+    }
+
+
+def single_order_distance(order: PickOrder, model: StoreDistanceModel) -> float:
+    distance, _ = model.route([(product['aisle'], model.depth(product['section']), key)
+                               for key, (product, _) in order.lines.items()])
+    return distance
+
+
+def plan_waves(orders: List[PickOrder], model: StoreDistanceModel, totes: int, max_units: int) -> Dict[str, Any]:
+    pickable = [order for order in orders if order.lines]
+    waves = [plan_wave(number, wave, model) for number, wave in enumerate(batch_orders(pickable, totes, max_units), start=1)]
+    batched = round(sum(wave['distance_m'] for wave in waves), 1)
+    one_by_one = round(sum(single_order_distance(order, model) for order in pickable), 1)
+    unavailable = {order.order_id: order.unavailable for order in orders if order.unavailable}
+    return {
+        "waves": waves,
+        "total_waves": len(waves),
+        "orders_planned": len(pickable),
+        "orders_without_items": [order.order_id for order in orders if not order.lines],
+        "unavailable": unavailable, # order id -> items that could not be picked
+        "total_distance_m": batched,
+        "single_order_distance_m": one_by_one,
+        "summary": (f"{len(pickable)} orders in {len(waves)} waves, {batched:.0f} m of walking "
+                    f"({one_by_one:.0f} m if picked one order at a time).")
+    }
@@ -0,0 +1,507 @@
+# FILE: store/snapshot.py
+# Compiled, read-only catalog snapshots that worker processes memory-map.
+#
+# A snapshot file holds the products and every index the server tools use, laid
+# out as flat arrays. Workers mmap it read-only, so N workers share one copy in the
+# OS page cache instead of each building its own dicts and index lists. Lookups
+# decode only the products they return.
+#
+# Publishing writes a new file next to the old one and os.replace()s it into place.
+# Workers notice the new file (see follow_snapshot) and swap it in if its version is
+# newer; mappings of the old file stay valid until the last reader drops them.
+#
+# Usage:
+#   python -m store.snapshot compile catalog.wcat                     # from mcp_client/data.py
+#   python -m store.snapshot compile catalog.wcat --feed nightly.csv.gz
+#   python -m store.snapshot info catalog.wcat
+
+import argparse
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .catalog import (INFINITY, Catalog, CatalogReader, Product, current_catalog, set_catalog_refresh, swap_catalog,
+                      swap_catalog_if_newer)
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WALCAT\0\0"
+FORMAT_VERSION = 1
+FLAG_LITTLE_ENDIAN = 1
+
+# Sections, in file order. U32 arrays are stored in native byte order (checked on open).
+(META, RECORDS, STRINGS, KEY_TABLE, ID_TABLE, NAME_ORDER, NAME_TABLE, VOCAB,
+ WORD_STARTS, WORD_LENS, WORD_POSTINGS_AT, WORD_POSTINGS_LEN, POSTINGS,
+ PRICE_ORDER, AISLE_DIR, AISLE_ORDER) = range(16)
+SECTION_COUNT = 16
+
+HEADER = struct.Struct(f"<8sIIQQ{SECTION_COUNT * 2}Q")
+# key, id, name, lowercase name, section as (offset, length) into STRINGS; then aisle, stock, price
+RECORD = struct.Struct("<10Iiid")
+PRICE = struct.Struct("<d")
+PRICE_AT = RECORD.size - PRICE.size
+
+
+class SnapshotError(ValueError):
+    """The file is not a catalog snapshot this code can read."""
+
+
+# --- Compiling ---
+def _u32(values: Iterable[int]) -> bytes:
+    return array("I", values).tobytes()
+
+def _hash_table(entries: List[Tuple[bytes, int]]) -> bytes:
+    """Open-addressing table of crc32(bytes) -> value + 1 (0 marks an empty slot)."""
+    size = 8
+    while size < 2 * len(entries):
+        size *= 2
+    mask = size - 1
+    table = array("I", bytes(4 * size))
+    for data, value in entries:
+        slot = zlib.crc32(data) & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = value + 1
+    return table.tobytes()
+
+def compile_snapshot(catalog: CatalogReader, path: str) -> int:
+    """Write `catalog` to `path` in the snapshot format. Returns the file size in bytes."""
+    items = list(catalog.items())
+    count = len(items)
+    strings = bytearray()
+
+    def add_string(text: str) -> Tuple[int, int]:
+        data = text.encode("utf-8")
+        strings.extend(data)
+        return len(strings) - len(data), len(data)
+
+    records = bytearray(RECORD.size * count)
+    lower_names: List[str] = []
+    words: Dict[str, List[int]] = {}
+    for ordinal, (key, product) in enumerate(items):
+        lower_name = product['name'].lower()
+        lower_names.append(lower_name)
+        RECORD.pack_into(records, ordinal * RECORD.size,
+                         *add_string(key), *add_string(product['id']), *add_string(product['name']),
+                         *add_string(lower_name), *add_string(product['section']),
+                         product['aisle'], product['stock'], float(product['price']))
+        for word in set(lower_name.split()):
+            words.setdefault(word, []).append(ordinal)
+
+    ids = {product['id']: ordinal for ordinal, (_, product) in enumerate(items)}  # last one wins, like Catalog
+    name_order = sorted(range(count), key=lambda i: (lower_names[i], i))
+    name_groups = [(lower_names[i].encode("utf-8"), position) for position, i in enumerate(name_order)
+                   if position == 0 or lower_names[name_order[position - 1]] != lower_names[i]]
+    price_order = sorted(range(count), key=lambda i: (float(items[i][1]['price']), i))
+
+    # Vocabulary blob "\nword\nword\n...": substring, prefix and suffix matches are single find() scans.
+    vocabulary = sorted(words, key=lambda word: word.encode("utf-8"))
+    vocab = bytearray(b"\n")
+    word_starts, word_lens, postings_at, postings_len, postings = [], [], [], [], []
+    for word in vocabulary:
+        data = word.encode("utf-8")
+        word_starts.append(len(vocab))
+        word_lens.append(len(data))
+        vocab.extend(data + b"\n")
+        postings_at.append(len(postings))
+        postings_len.append(len(words[word]))
+        postings.extend(words[word])  # already in ordinal order
+
+    aisles_by_name: Dict[int, List[int]] = {}
+    aisles_by_price: Dict[int, List[int]] = {}
+    for i in sorted(range(count), key=lambda i: (items[i][1]['name'], i)):  # aisle listings sort by the name as written
+        aisles_by_name.setdefault(items[i][1]['aisle'], []).append(i)
+    for i in price_order:
+        aisles_by_price.setdefault(items[i][1]['aisle'], []).append(i)
+    aisle_dir, aisle_order = [], []
+    for aisle in sorted(aisles_by_name):
+        by_name, by_price = aisles_by_name[aisle], aisles_by_price[aisle]
+        aisle_dir.extend([aisle, len(by_name), len(aisle_order), len(aisle_order) + len(by_name)])
+        aisle_order.extend(by_name + by_price)
+
+    meta = {
+        "store_id": catalog.store_id, "store_name": catalog.store_name,
+        "aisle_layout": catalog.aisle_layout, "meal_suggestions": catalog.meal_suggestions,
+    }
+    sections = [
+        json.dumps(meta).encode("utf-8"),
+        bytes(records),
+        bytes(strings),
+        _hash_table([(key.encode("utf-8"), ordinal) for ordinal, (key, _) in enumerate(items)]),
+        _hash_table([(product_id.encode("utf-8"), ordinal) for product_id, ordinal in ids.items()]),
+        _u32(name_order),
+        _hash_table(name_groups),
+        bytes(vocab),
+        _u32(word_starts), _u32(word_lens), _u32(postings_at), _u32(postings_len), _u32(postings),
+        _u32(price_order),
+        _u32(aisle_dir),
+        _u32(aisle_order),
+    ]
+
+    table, offset = [], HEADER.size
+    for data in sections:
+        offset += -offset % 8
+        table.extend([offset, len(data)])
+        offset += len(data)
+    flags = FLAG_LITTLE_ENDIAN if sys.byteorder == "little" else 0
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, flags, catalog.version, count, *table))
+        for (start, _), data in zip(zip(table[::2], table[1::2]), sections):
+            f.write(bytes(start - f.tell()))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return offset
+
+def publish_snapshot(catalog: CatalogReader, path: str) -> 'MappedCatalog':
+    """Compile `catalog` and atomically replace the snapshot at `path`. Returns the new mapping."""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        compile_snapshot(catalog, temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return MappedCatalog.open(path)
+
+
+# --- Reading ---
+class _PriceEntries:
+    """(price, ordinal, ordinal) view over a U32 array of ordinals sorted by price, for bisect."""
+
+    def __init__(self, catalog: 'MappedCatalog', ordinals: Sequence[int]):
+        self._catalog = catalog
+        self._ordinals = ordinals
+
+    def __len__(self) -> int:
+        return len(self._ordinals)
+
+    def __getitem__(self, index: int) -> Tuple[float, int, int]:
+        ordinal = self._ordinals[index]
+        return self._catalog._price(ordinal), ordinal, ordinal
+
+
+class _Words:
+    """Sorted vocabulary as a sequence of bytes, for bisect."""
+
+    def __init__(self, catalog: 'MappedCatalog'):
+        self._catalog = catalog
+
+    def __len__(self) -> int:
+        return len(self._catalog._word_starts)
+
+    def __getitem__(self, index: int) -> bytes:
+        return self._catalog._word_bytes(index)
+
+
+class MappedCatalog(CatalogReader):
+    """A read-only catalog backed by a memory-mapped snapshot file. Handles are ordinals."""
+
+    read_only = True
+
+    def __init__(self, path: str, buffer: mmap.mmap):
+        self.path = path
+        self._mm = buffer
+        magic, format_version, flags, self.version, self._count, *table = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a catalog snapshot")
+        if format_version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} has snapshot format {format_version}, expected {FORMAT_VERSION}")
+        if bool(flags & FLAG_LITTLE_ENDIAN) != (sys.byteorder == "little"):
+            raise SnapshotError(f"{path} was compiled on a machine with a different byte order")
+        self._sections = list(zip(table[::2], table[1::2]))
+
+        meta = json.loads(self._bytes(META).decode("utf-8"))
+        self.store_id = meta["store_id"]
+        self.store_name = meta["store_name"]
+        self.aisle_layout = meta["aisle_layout"]
+        self.meal_suggestions = meta["meal_suggestions"]
+
+        view = memoryview(buffer)
+        self._records_at = self._sections[RECORDS][0]
+        self._strings_at = self._sections[STRINGS][0]
+        self._vocab_at, vocab_size = self._sections[VOCAB]
+        self._vocab_end = self._vocab_at + vocab_size
+        u32 = {index: view[start:start + size].cast("I") for index, (start, size) in enumerate(self._sections)
+               if index not in (META, RECORDS, STRINGS, VOCAB)}
+        self._key_table, self._id_table = u32[KEY_TABLE], u32[ID_TABLE]
+        self._name_order, self._name_table = u32[NAME_ORDER], u32[NAME_TABLE]
+        self._word_starts, self._word_lens = u32[WORD_STARTS], u32[WORD_LENS]
+        self._postings_at, self._postings_len, self._postings = u32[WORD_POSTINGS_AT], u32[WORD_POSTINGS_LEN], u32[POSTINGS]
+        self._price_order = u32[PRICE_ORDER]
+        self._aisle_order = u32[AISLE_ORDER]
+        directory = u32[AISLE_DIR]
+        # aisle -> (by-name ordinals, by-price ordinals); a handful of small views per process
+        self._aisles = {
+            directory[i]: (self._aisle_order[directory[i + 2]:directory[i + 2] + directory[i + 1]],
+                           self._aisle_order[directory[i + 3]:directory[i + 3] + directory[i + 1]])
+            for i in range(0, len(directory), 4)
+        }
+        self._words = _Words(self)
+
+    @classmethod
+    def open(cls, path: str) -> 'MappedCatalog':
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(path, buffer)
+
+    def __len__(self) -> int:
+        return self._count
+
+    # --- Raw access ---
+    def _bytes(self, section: int) -> bytes:
+        start, size = self._sections[section]
+        return self._mm[start:start + size]
+
+    def _record(self, ordinal: int) -> tuple:
+        return RECORD.unpack_from(self._mm, self._records_at + ordinal * RECORD.size)
+
+    def _string(self, offset: int, length: int) -> bytes:
+        start = self._strings_at + offset
+        return self._mm[start:start + length]
+
+    def _price(self, ordinal: int) -> float:
+        return PRICE.unpack_from(self._mm, self._records_at + ordinal * RECORD.size + PRICE_AT)[0]
+
+    def _field(self, ordinal: int, field: int) -> bytes:
+        """Field 0..4 = key, id, name, lowercase name, section."""
+        record = self._record(ordinal)
+        return self._string(record[2 * field], record[2 * field + 1])
+
+    def _word_bytes(self, index: int) -> bytes:
+        start = self._vocab_at + self._word_starts[index]
+        return self._mm[start:start + self._word_lens[index]]
+
+    def _probe(self, table: Sequence[int], data: bytes, matches) -> Optional[int]:
+        mask = len(table) - 1
+        slot = zlib.crc32(data) & mask
+        while table[slot]:
+            value = table[slot] - 1
+            if matches(value):
+                return value
+            slot = (slot + 1) & mask
+        return None
+
+    # --- Catalog-compatible reads ---
+    def get(self, key: str) -> Optional[Product]:
+        ordinal = self._exact_handle(key)
+        return self._product(ordinal) if ordinal is not None else None
+
+    def key_for_id(self, product_id: str) -> Optional[str]:
+        data = product_id.encode("utf-8")
+        ordinal = self._probe(self._id_table, data, lambda ordinal: self._field(ordinal, 1) == data)
+        return self._field(ordinal, 0).decode("utf-8") if ordinal is not None else None
+
+    def items(self) -> Iterator[Tuple[str, Product]]:
+        for ordinal in range(self._count):
+            yield self._field(ordinal, 0).decode("utf-8"), self._product(ordinal)
+
+    def copy_products(self) -> Dict[str, Product]:
+        return dict(self.items())
+
+    def to_catalog(self, version: Optional[int] = None) -> Catalog:
+        """A mutable in-memory copy, e.g. to apply deltas before publishing the next version."""
+        catalog = Catalog(self.store_id, self.store_name, self.aisle_layout, self.meal_suggestions,
+                          self.version if version is None else version)
+        catalog.begin_bulk()
+        for key, product in self.items():
+            catalog.upsert(key, product)
+        catalog.end_bulk()
+        return catalog
+
+    def empty_copy(self, version: Optional[int] = None) -> Catalog:
+        return Catalog(self.store_id, self.store_name, self.aisle_layout, self.meal_suggestions,
+                       self.version + 1 if version is None else version)
+
+    # --- CatalogReader accessors ---
+    def _exact_handle(self, key: str) -> Optional[int]:
+        data = key.encode("utf-8")
+        return self._probe(self._key_table, data, lambda ordinal: self._field(ordinal, 0) == data)
+
+    def _first_handle(self) -> Optional[int]:
+        return 0 if self._count else None
+
+    def _all_handles(self) -> Iterable[int]:
+        return range(self._count)
+
+    def _product(self, ordinal: int) -> Product:
+        r = self._record(ordinal)
+        return {
+            "id": self._string(r[2], r[3]).decode("utf-8"),
+            "name": self._string(r[4], r[5]).decode("utf-8"),
+            "aisle": r[10],
+            "price": r[12],
+            "stock": r[11],
+            "section": self._string(r[8], r[9]).decode("utf-8"),
+        }
+
+    def _lower_name(self, ordinal: int) -> str:
+        return self._field(ordinal, 3).decode("utf-8")
+
+    def _ordinal_of(self, ordinal: int) -> int:
+        return ordinal
+
+    def _first(self, handles: Iterable[int]) -> Optional[int]:
+        return min(handles, default=None)
+
+    def _word_postings(self, index: int, below: float = INFINITY) -> Sequence[int]:
+        start = self._postings_at[index]
+        postings = self._postings[start:start + self._postings_len[index]]
+        return postings if below == INFINITY else postings[:bisect.bisect_left(postings, below)]
+
+    def _price_and_aisle(self, ordinal: int) -> Tuple[float, int]:
+        record = self._record(ordinal)
+        return record[12], record[10]
+
+    def _word_index(self, word: str) -> Optional[int]:
+        data = word.encode("utf-8")
+        index = bisect.bisect_left(self._words, data)
+        return index if index < len(self._words) and self._words[index] == data else None
+
+    def _first_with_word(self, word: str) -> Optional[int]:
+        index = self._word_index(word)
+        return self._word_postings(index)[0] if index is not None else None
+
+    def _word_handles(self, word: str, below: float = INFINITY) -> Sequence[int]:
+        index = self._word_index(word)
+        return self._word_postings(index, below) if index is not None else ()
+
+    def _handles_with_word(self, kind: str, token: str, below: float = INFINITY) -> Set[int]:
+        data = token.encode("utf-8")
+        pattern = {"contains": data, "endswith": data + b"\n", "startswith": b"\n" + data}[kind]
+        skip = 1 if kind == "startswith" else 0
+        indexes = []
+        position = self._mm.find(pattern, self._vocab_at, self._vocab_end)
+        while position != -1:
+            index = bisect.bisect_right(self._word_starts, position + skip - self._vocab_at) - 1
+            indexes.append(index)
+            # Continue after this word; one match per word is enough.
+            next_word = self._vocab_at + self._word_starts[index] + self._word_lens[index]
+            position = self._mm.find(pattern, next_word, self._vocab_end)
+        return set().union(*(self._word_postings(index, below) for index in indexes))
+
+    def _name_handles(self, name: str) -> List[int]:
+        data = name.encode("utf-8")
+        position = self._probe(self._name_table, data,
+                               lambda position: self._field(self._name_order[position], 3) == data)
+        if position is None:
+            return []
+        handles = []
+        while position < len(self._name_order) and self._field(self._name_order[position], 3) == data:
+            handles.append(self._name_order[position])
+            position += 1
+        return handles
+
+    def _aisle_name_handles(self, aisle: int) -> Sequence[int]:
+        return self._aisles[aisle][0] if aisle in self._aisles else ()
+
+    def _price_entries(self, aisle: Optional[int] = None) -> _PriceEntries:
+        if aisle is None:
+            return _PriceEntries(self, self._price_order)
+        return _PriceEntries(self, self._aisles[aisle][1] if aisle in self._aisles else ())
+
+
+# --- Following a published snapshot ---
+class SnapshotFollower:
+    """Swaps in the snapshot at `path` whenever a newer version is published there.
+
+    Installed as the current_catalog() refresh hook; checks the file at most once
+    per poll interval, so the cost on the tool-call path is one monotonic clock read.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._identity: Optional[Tuple[int, int, int]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A lock held by another thread at fork time would never be released in the child.
+        self._lock = threading.Lock()
+
+    def _stat(self) -> Tuple[int, int, int]:
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> MappedCatalog:
+        identity = self._stat()
+        catalog = MappedCatalog.open(self.path)
+        self._identity = identity
+        swap_catalog(catalog)
+        return catalog
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.poll_interval or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            try:
+                identity = self._stat()
+                if identity == self._identity:
+                    return
+                catalog = MappedCatalog.open(self.path)
+            except (OSError, SnapshotError) as e:
+                logger.warning(f"Could not reload catalog snapshot {self.path}: {e}")
+                return
+            self._identity = identity
+            if swap_catalog_if_newer(catalog):
+                logger.info(f"Catalog snapshot v{catalog.version} mapped from {self.path} ({len(catalog)} products)")
+        finally:
+            self._lock.release()
+
+def follow_snapshot(path: str, poll_interval: float = 1.0) -> MappedCatalog:
+    """Map the snapshot at `path`, make it current, and keep following newer versions."""
+    follower = SnapshotFollower(path, poll_interval)
+    catalog = follower.load()
+    set_catalog_refresh(follower.refresh)
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile or inspect memory-mapped catalog snapshots.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_parser = commands.add_parser("compile", help="compile a snapshot from mcp_client/data.py or a feed")
+    compile_parser.add_argument("path")
+    compile_parser.add_argument("--feed", help="snapshot feed (CSV/JSONL, optionally .gz) to compile instead")
+    compile_parser.add_argument("--version", type=int, help="snapshot version (default: one more than the existing file)")
+    info_parser = commands.add_parser("info", help="print a snapshot's header")
+    info_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        catalog = MappedCatalog.open(args.path)
+        print(json.dumps({"path": args.path, "version": catalog.version, "products": len(catalog),
+                          "store_id": catalog.store_id, "bytes": os.path.getsize(args.path)}, indent=2))
+        return
+
+    from mcp_client.data import STORE_DATABASE
+    from .ingest import load_snapshot
+
+    version = args.version
+    if version is None:
+        version = MappedCatalog.open(args.path).version + 1 if os.path.exists(args.path) else 0
+    catalog = Catalog.from_store(STORE_DATABASE, version=version)
+    if args.feed:
+        stats = load_snapshot(args.feed, base=catalog)
+        print(json.dumps(stats.report(), indent=2))
+        catalog = current_catalog()
+        catalog.version = version
+    started = time.perf_counter()
+    publish_snapshot(catalog, args.path)
+    print(f"Compiled {len(catalog)} products to {args.path} (v{version}) in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# FILE: store/substitutes.py
+# Ranked substitutes for out-of-stock products, kept in a table so a tool call
+# answers "what else is there?" with a lookup instead of a scan.
+#
+# Each product's entry lists up to `size` alternatives, best first, ranked by
+#   - name similarity: shared name words, weighted so rare words ("almond") count
+#     more than common ones ("great", "value")
+#   - same aisle, and same section within it
+#   - price proximity
+# Entries ignore stock; stock is checked against the live catalog at lookup, so
+# stock-only changes cost nothing. Other changes (new, removed, renamed, moved or
+# repriced products) drop just the entries they can affect, which are rebuilt on
+# their next lookup.
+
+import math
+import re
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+from .catalog import CatalogReader, Product
+
+# Size and packaging words say nothing about what a product is.
+UNIT_WORDS = frozenset({"oz", "lb", "lbs", "pack", "count", "gallon", "half", "bag", "ct", "pk"})
+WORD = re.compile(r"[a-z]+")
+
+NAME_WEIGHT = 3.0
+AISLE_WEIGHT = 1.0
+SECTION_WEIGHT = 0.5
+PRICE_WEIGHT = 1.0
+SUBSTITUTE_FIELDS = ("id", "name", "aisle", "section", "price", "stock")
+
+
+def name_words(name: str) -> Set[str]:
+    return {word for word in WORD.findall(name.lower()) if len(word) > 1 and word not in UNIT_WORDS}
+
+
+class SubstituteTable:
+    """Per-product ranked alternatives for the live catalog, filled on first lookup
+    (or up front with precompute()) and invalidated by catalog listener events."""
+
+    def __init__(self, size: int = 8):
+        self.size = size
+        self._ranked: Dict[str, List[str]] = {}       # product id -> alternative ids, best first
+        self._listed_in: Dict[str, Set[str]] = {}     # product id -> ids whose entry lists it
+        self._weights: Dict[str, float] = {}          # name word -> rarity weight
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; an entry ranked across one is not stored.
+        self._generation = 0
+        self._resets = 0
+        self.builds = 0
+
+    def __len__(self) -> int:
+        return len(self._ranked)
+
+    # --- Ranking ---
+    def _weight(self, catalog: CatalogReader, word: str) -> float:
+        weight = self._weights.get(word)
+        if weight is None:
+            weight = math.log(1 + len(catalog) / (1 + catalog.word_frequency(word)))
+            self._weights[word] = weight
+        return weight
+
+    def _score(self, catalog: CatalogReader, product: Product, words: Set[str], other: Product) -> float:
+        other_words = name_words(other['name'])
+        shared = words & other_words
+        if not shared:
+            return 0.0
+        similarity = (sum(self._weight(catalog, word) for word in shared)
+                      / sum(self._weight(catalog, word) for word in words | other_words))
+        score = NAME_WEIGHT * similarity
+        if other['aisle'] == product['aisle']:
+            score += AISLE_WEIGHT + (SECTION_WEIGHT if other['section'] == product['section'] else 0.0)
+        high = max(product['price'], other['price'])
+        score += PRICE_WEIGHT * (min(product['price'], other['price']) / high if high else 1.0)
+        return score
+
+    def _rank(self, catalog: CatalogReader, product: Product) -> List[str]:
+        """Alternative ids for `product`, best first. Only products sharing a name word qualify."""
+        words = name_words(product['name'])
+        scored: List[Tuple[float, str, str]] = []
+        for other in catalog.related_products(product):
+            score = self._score(catalog, product, words, other)
+            if score > 0:
+                scored.append((-score, other['name'], other['id']))
+        scored.sort()
+        return [product_id for _, _, product_id in scored[:self.size]]
+
+    def _store(self, product_id: str, ranked: List[str]):
+        self._drop(product_id)
+        self._ranked[product_id] = ranked
+        for other in ranked:
+            self._listed_in.setdefault(other, set()).add(product_id)
+
+    def _drop(self, product_id: str):
+        for other in self._ranked.pop(product_id, ()):
+            listers = self._listed_in.get(other)
+            if listers is not None:
+                listers.discard(product_id)
+                if not listers:
+                    del self._listed_in[other]
+
+    # --- Lookups ---
+    def ranked(self, catalog: CatalogReader, product: Product) -> List[str]:
+        with self._lock:
+            ranked = self._ranked.get(product['id'])
+            generation = self._generation
+        if ranked is None:
+            ranked = self._rank(catalog, product)
+            with self._lock:
+                if generation == self._generation:
+                    self._store(product['id'], ranked)
+                self.builds += 1
+        return ranked
+
+    def substitutes(self, catalog: CatalogReader, product: Product, limit: int = 3) -> List[Dict[str, Any]]:
+        """Up to `limit` in-stock alternatives for `product`, with their current stock and price."""
+        found = []
+        for product_id in self.ranked(catalog, product):
+            key = catalog.key_for_id(product_id)
+            other = catalog.get(key) if key is not None else None
+            if other is not None and other['stock'] > 0:
+                found.append({field: other[field] for field in SUBSTITUTE_FIELDS})
+                if len(found) == limit:
+                    break
+        return found
+
+    def precompute(self, catalog: CatalogReader, products: Optional[Iterable[Product]] = None):
+        """Fill the entry of every product (or of `products`) that does not have one yet."""
+        resets = self._resets
+        if products is None:
+            products = catalog.copy_products().values()
+        for product in products:
+            if self._resets != resets:
+                return  # the catalog was replaced; its successor gets its own pass
+            if product['id'] not in self._ranked:
+                self.ranked(catalog, product)
+
+    # --- Maintenance ---
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._resets += 1
+            self._ranked.clear()
+            self._listed_in.clear()
+            self._weights.clear()
+
+    def on_catalog_change(self, catalog: CatalogReader, key: Optional[str], old: Optional[Product], new: Optional[Product]):
+        """Catalog listener body: drop the entries a write can change."""
+        if key is None:
+            self.clear()
+            return
+        if old is not None and new is not None and all(old[field] == new[field] for field in SUBSTITUTE_FIELDS if field != "stock"):
+            return  # stock is read live at lookup
+        stale: Set[str] = set()
+        for product in (old, new):
+            if product is None:
+                continue
+            stale.add(product['id'])
+            with self._lock:
+                stale.update(self._listed_in.get(product['id'], ()))
+        if new is not None and (old is None or old['name'] != new['name'] or old['aisle'] != new['aisle']):
+            # It may now belong in the entries of products it is related to.
+            stale.update(other['id'] for other in catalog.related_products(new))
+        with self._lock:
+            self._generation += 1
+            for product_id in stale:
+                self._drop(product_id)
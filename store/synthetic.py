@@ -0,0 +1,105 @@
+# FILE: store/synthetic.py
+# Seeded generator for realistic synthetic stores (1k - 1M SKUs, thousands of meal rules).
+# Output has the same shape as STORE_DATABASE in mcp_client/data.py.
+
+import random
+from typing import Dict, Any, List
+
+AISLE_LAYOUT = {
+    "1": "Fresh Produce", "2": "Fresh Produce", "3": "Dairy & Refrigerated",
+    "4": "Frozen Foods", "5": "Frozen Foods", "6": "Bakery", "7": "Bakery & Bread",
+    "8": "Pantry & Dry Goods", "9": "Breakfast & Cereal", "10": "Snacks & Candy",
+    "11": "Beverages", "12": "Health & Beauty", "13": "Household Items",
+    "14": "Electronics", "15": "Meat & Seafood", "16": "Deli"
+}
+
+# aisle -> (base product nouns, typical price range)
+VOCABULARY = {
+    1: (["bananas", "apples", "oranges", "grapes", "strawberries", "lettuce", "spinach", "tomatoes", "avocados", "onions", "potatoes", "carrots"], (0.5, 6.0)),
+    2: (["broccoli", "peppers", "cucumbers", "lemons", "limes", "mushrooms", "celery", "garlic", "kale", "blueberries", "pears", "peaches"], (0.5, 6.0)),
+    3: (["milk", "almond milk", "oat milk", "eggs", "butter", "cheddar cheese", "yogurt", "cream cheese", "sour cream", "heavy cream", "mozzarella", "orange juice"], (1.0, 8.0)),
+    4: (["frozen pizza", "ice cream", "frozen peas", "frozen corn", "waffles", "fish sticks", "frozen berries", "tater tots"], (2.0, 9.0)),
+    5: (["frozen dinner", "frozen burritos", "frozen chicken nuggets", "popsicles", "frozen lasagna", "frozen dumplings"], (2.0, 10.0)),
+    6: (["croissants", "muffins", "bagels", "donuts", "cake", "cookies", "pie", "brownies"], (2.0, 15.0)),
+    7: (["bread", "whole wheat bread", "sourdough bread", "tortillas", "hamburger buns", "hot dog buns", "pita bread", "rolls"], (1.5, 6.0)),
+    8: (["pasta", "pasta sauce", "rice", "beans", "flour", "sugar", "olive oil", "canned tomatoes", "peanut butter", "soup", "tuna", "spices"], (1.0, 12.0)),
+    9: (["cereal", "oatmeal", "granola", "pancake mix", "maple syrup", "coffee", "tea", "breakfast bars"], (2.0, 14.0)),
+    10: (["chips", "pretzels", "popcorn", "crackers", "chocolate", "candy", "trail mix", "nuts"], (1.0, 8.0)),
+    11: (["water", "soda", "sparkling water", "sports drink", "apple juice", "energy drink", "iced tea", "lemonade"], (1.0, 10.0)),
+    12: (["shampoo", "conditioner", "toothpaste", "soap", "deodorant", "lotion", "vitamins", "sunscreen"], (2.0, 20.0)),
+    13: (["toilet paper", "paper towels", "detergent", "dish soap", "trash bags", "sponges", "bleach", "aluminum foil"], (2.0, 25.0)),
+    14: (["headphones", "phone charger", "batteries", "usb cable", "light bulbs", "speaker"], (5.0, 120.0)),
+    15: (["ground beef", "chicken", "chicken breast", "pork chops", "salmon", "shrimp", "bacon", "steak", "turkey"], (4.0, 25.0)),
+    16: (["ham", "salami", "turkey slices", "rotisserie chicken", "potato salad", "hummus", "swiss cheese"], (3.0, 15.0)),
+}
+
+BRANDS = ["Great Value", "Marketside", "Freshness Guaranteed", "Sam's Choice", "Equate", "Mainstays", "Parent's Choice", "Bettergoods", "Member's Mark", "Clear American"]
+MODIFIERS = ["Organic", "Classic", "Family Size", "Low Fat", "Reduced Sodium", "Original", "Extra Large", "Mini", "Spicy", "Honey", "Vanilla", "Gluten Free", "Whole", "Value Pack", "Premium"]
+SIZES = ["(8 oz)", "(12 oz)", "(16 oz)", "(1 lb)", "(2 lb)", "(1 Gallon)", "(Half Gallon)", "(6 pack)", "(12 pack)", "(24 count)", "(32 oz)", "(3 lb bag)"]
+SECTIONS = [f"{row}{col}" for row in "ABCD" for col in range(1, 5)]
+DISHES = ["Bowl", "Salad", "Stir Fry", "Casserole", "Sandwiches", "Tacos", "Soup", "Skillet", "Bake", "Smoothie", "Pasta", "Wraps"]
+
+
+def _product_name(rng: random.Random, noun: str, variant: int) -> str:
+    """Base names first, then increasingly decorated variants as the catalog grows."""
+    title = noun.title()
+    if variant == 0:
+        return title
+    parts = [rng.choice(BRANDS)]
+    if variant % 2 == 0 or variant > 20:
+        parts.append(rng.choice(MODIFIERS))
+    parts.append(title)
+    parts.append(rng.choice(SIZES))
+    return " ".join(parts)
+
+
+def generate_products(num_products: int, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """Generate `num_products` products keyed by lowercase name, like STORE_DATABASE['products']."""
+    rng = random.Random(seed)
+    slots = [(aisle, noun, price_range) for aisle, (nouns, price_range) in VOCABULARY.items() for noun in nouns]
+    products: Dict[str, Dict[str, Any]] = {}
+    variant = 0
+    while len(products) < num_products:
+        for aisle, noun, (low, high) in slots:
+            if len(products) >= num_products:
+                break
+            name = _product_name(rng, noun, variant)
+            key = name.lower()
+            if key in products:
+                name = f"{name} #{variant}"
+                key = name.lower()
+            products[key] = {
+                "id": f"s{len(products) + 1}",
+                "name": name,
+                "aisle": aisle,
+                "price": round(rng.uniform(low, high), 2),
+                "stock": 0 if rng.random() < 0.05 else rng.randint(1, 120),
+                "section": rng.choice(SECTIONS),
+            }
+        variant += 1
+    return products
+
+
+def generate_meal_rules(num_rules: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Generate meal rules whose triggers are base product nouns, like STORE_DATABASE['meal_suggestions']."""
+    rng = random.Random(seed + 1)
+    food_nouns = [noun for aisle, (nouns, _) in VOCABULARY.items() if aisle not in (12, 13, 14) for noun in nouns]
+    rules = []
+    for i in range(num_rules):
+        triggers = rng.sample(food_nouns, rng.randint(2, 4))
+        rules.append({
+            "trigger_items": triggers,
+            "suggestion": f"{triggers[0].title()} {rng.choice(DISHES)} #{i + 1}",
+        })
+    return rules
+
+
+def generate_store(num_products: int, num_rules: int = 1000, seed: int = 0) -> Dict[str, Any]:
+    """Generate a complete store database with the same shape as STORE_DATABASE."""
+    return {
+        "store_id": f"synthetic-{num_products}-{seed}",
+        "store_name": f"Synthetic Supercenter ({num_products} SKUs)",
+        "products": generate_products(num_products, seed),
+        "aisle_layout": dict(AISLE_LAYOUT),
+        "meal_suggestions": generate_meal_rules(num_rules, seed),
+    }
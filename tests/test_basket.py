@@ -0,0 +1,30 @@
+# FILE: tests/test_basket.py
+# Budget basket selection.
+#
+#   python -m unittest discover tests
+
+import unittest
+
+from store.basket import plan_basket
+
+BEEF = {"id": "beef", "name": "Ground Beef", "aisle": 4, "section": "A", "price": 8.0, "stock": 10}
+BANANAS = {"id": "bananas", "name": "Bananas", "aisle": 1, "section": "A", "price": 1.25, "stock": 50}
+
+
+class PlanBasketTest(unittest.TestCase):
+    def test_earlier_optional_line_wins_over_many_units_of_a_later_one(self):
+        result = plan_basket(12, [], [("ground beef", BEEF, 1), ("bananas", BANANAS, 12)])
+
+        quantities = {line['requested']: line['quantity'] for line in result['basket']}
+        self.assertEqual(quantities, {"ground beef": 1, "bananas": 3})
+        self.assertEqual(result['total_cost'], 11.75)
+
+    def test_later_optional_line_uses_what_an_earlier_one_leaves(self):
+        result = plan_basket(5, [], [("ground beef", BEEF, 1), ("bananas", BANANAS, 2)])
+
+        self.assertEqual([(line['requested'], line['quantity']) for line in result['basket']], [("bananas", 2)])
+        self.assertEqual(result['skipped'], [{"item": "ground beef", "reason": "over budget"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+# FILE: tests/test_ingest.py
+# Snapshot and delta feeds against the bundled store data.
+#
+#   python -m unittest discover tests
+
+import csv
+import os
+import tempfile
+import unittest
+
+from mcp_client.data import STORE_DATABASE
+from store.catalog import Catalog, current_catalog, swap_catalog
+from store.ingest import apply_delta, load_snapshot
+
+FIELDS = ["id", "name", "aisle", "price", "stock", "section"]
+
+
+class IngestTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = swap_catalog(Catalog.from_store(STORE_DATABASE))
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        if self.previous is not None:
+            swap_catalog(self.previous)
+
+    def write_csv(self, rows):
+        path = os.path.join(self.directory.name, "snapshot.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def test_snapshot_with_duplicate_key_keeps_one_product(self):
+        path = self.write_csv([
+            {"id": "1", "name": "Bananas", "aisle": 1, "price": 0.25, "stock": 10, "section": "A1"},
+            {"id": "2", "name": "Apples", "aisle": 1, "price": 0.5, "stock": 5, "section": "A1"},
+            {"id": "3", "name": "Bananas", "aisle": 1, "price": 0.3, "stock": 8, "section": "A2"},
+        ])
+        stats = load_snapshot(path)
+        catalog = current_catalog()
+
+        self.assertEqual(stats.applied, 2)
+        self.assertEqual(stats.duplicates, 1)
+        self.assertEqual(stats.catalog_size, 2)
+        self.assertEqual([product['name'] for product in catalog.aisle_products(1)], ["Apples", "Bananas"])
+        # The later row wins, in every index.
+        self.assertEqual(catalog.get("bananas")['id'], "3")
+        self.assertEqual([product['price'] for product in catalog.browse(limit=10)[1]], [0.3, 0.5])
+        self.assertIsNone(catalog.key_for_id("1"))
+
+    def test_delta_by_name_finds_product_with_a_different_key(self):
+        catalog = current_catalog()
+        key, product = next((key, product) for key, product in catalog.items() if key != product['name'].lower())
+
+        _, updated = apply_delta(catalog, {"name": product['name'], "stock": 5})
+
+        self.assertEqual(updated['stock'], 5)
+        self.assertEqual(catalog.get(key)['stock'], 5)
+
+    def test_full_row_delta_without_key_updates_the_existing_product(self):
+        catalog = current_catalog()
+        key, product = next((key, product) for key, product in catalog.items() if key != product['name'].lower())
+        size = len(catalog)
+
+        updated_key, _ = apply_delta(catalog, {**product, "stock": 7})
+        renamed_key, _ = apply_delta(catalog, {**product, "name": "Renamed " + product['name'], "stock": 9})
+
+        self.assertEqual((updated_key, renamed_key), (key, key))
+        self.assertEqual(len(catalog), size)
+        self.assertEqual(catalog.get(key)['stock'], 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# FILE: tests/test_lists.py
+# Shopping list handles against the bundled store data.
+#
+#   python -m unittest discover tests
+
+import unittest
+
+import server
+from mcp_client.data import STORE_DATABASE
+from store.catalog import Catalog, current_catalog, swap_catalog
+
+
+def call(tool, *args):
+    """Registered tools are wrapped by FastMCP; call the underlying function."""
+    return getattr(tool, "fn", tool)(*args)
+
+
+class ShoppingListTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = swap_catalog(Catalog.from_store(STORE_DATABASE))
+
+    def tearDown(self):
+        if self.previous is not None:
+            swap_catalog(self.previous)
+
+    def reprice(self, name, price):
+        catalog = current_catalog()
+        key = catalog.key_for_name(name)
+        catalog.upsert(key, {**catalog.get(key), "price": price})
+
+    def test_price_change_moves_the_running_total(self):
+        created = call(server.create_shopping_list, ["milk", "bread", "milk"])
+        list_id = created['list_id']
+        milk = next(p for p in created['optimized_path'] if "milk" in p['name'].lower())
+        bread = next(p for p in created['optimized_path'] if "bread" in p['name'].lower())
+
+        self.reprice(milk['name'], 10.0)
+        updated = call(server.get_shopping_list, list_id)
+
+        self.assertEqual(updated['total_estimated_cost'], round(2 * 10.0 + bread['price'], 2))
+        self.assertEqual([p['price'] for p in updated['optimized_path'] if p['name'] == milk['name']], [10.0, 10.0])
+
+    def test_swap_resyncs_the_running_total(self):
+        list_id = call(server.create_shopping_list, ["eggs"])['list_id']
+        store = {**STORE_DATABASE, "products": {key: {**product, "price": 1.0} for key, product in STORE_DATABASE['products'].items()}}
+        swap_catalog(Catalog.from_store(store))
+
+        self.assertEqual(call(server.get_shopping_list, list_id)['total_estimated_cost'], 1.0)
+
+    def test_replace_missing_item_leaves_the_list_unchanged(self):
+        created = call(server.create_shopping_list, ["milk"])
+
+        result = call(server.replace_list_item, created['list_id'], "caviar", "bread")
+
+        self.assertIn("error", result)
+        unchanged = call(server.get_shopping_list, created['list_id'])
+        self.assertEqual(unchanged['optimized_path'], created['optimized_path'])
+        self.assertEqual(unchanged['total_estimated_cost'], created['total_estimated_cost'])
+
+
+if __name__ == "__main__":
+    unittest.main()